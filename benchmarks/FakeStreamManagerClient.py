@@ -0,0 +1,182 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import queue
+import random
+import threading
+import time
+
+from stream_manager import (
+    EventType,
+    NotEnoughMessagesException,
+    ResourceNotFoundException,
+    S3ExportTaskDefinition,
+    Status,
+    StatusContext,
+    StatusLevel,
+    StatusMessage,
+)
+from stream_manager.data import Message, MessageStreamInfo
+from stream_manager.util import Util
+
+
+class _Stream:
+    def __init__(self, definition):
+        self.definition = definition
+        self.messages = []
+        self.condition = threading.Condition()
+
+
+class FakeStreamManagerClient:
+    """ FakeStreamManagerClient is a local stand-in for StreamManagerClient. The S3 export of a stream is simulated by
+    worker threads that "upload" the files over a link of limited bandwidth and write statuses to the status stream"""
+
+    def __init__(self, append_latency=0.0005, upload_latency=0.01, bandwidth=10*1024*1024, upload_workers=4,
+                 failure_rate=0.0, seed=0):
+        # append_latency: time taken by append_message (seconds)
+        # upload_latency: fixed cost of each upload (seconds), bandwidth: shared uplink (bytes per second)
+        # failure_rate: fraction of the uploads that end with a Failure status
+        self.__append_latency = append_latency
+        self.__upload_latency = upload_latency
+        self.__bandwidth = bandwidth
+        self.__upload_workers = upload_workers
+        self.__failure_rate = failure_rate
+        self.__random = random.Random(seed)
+        self.__streams = {}
+        self.__lock = threading.Lock()
+        # the uplink is shared by all the uploads, the transfers are serialized on it
+        self.__link = threading.Lock()
+        self.__tasks = queue.Queue()
+        self.__workers = []
+        self.__closed = threading.Event()
+        # input_url -> time of the append, and the latencies from append to Success
+        self.__appended = {}
+        self.latencies = []
+        self.succeeded = 0
+        self.failed = 0
+        self.uploaded_bytes = 0
+
+    def __stream(self, stream_name):
+        stream = self.__streams.get(stream_name)
+        if stream is None:
+            raise ResourceNotFoundException(f"Stream {stream_name} not found")
+        return stream
+
+    def create_message_stream(self, definition):
+        with self.__lock:
+            self.__streams[definition.name] = _Stream(definition)
+            if definition.export_definition is not None and len(self.__workers) == 0:
+                for i in range(self.__upload_workers):
+                    worker = threading.Thread(target=self.__upload, name=f"FakeExport{i}", daemon=True)
+                    worker.start()
+                    self.__workers.append(worker)
+
+    def delete_message_stream(self, stream_name):
+        with self.__lock:
+            self.__stream(stream_name)
+            del self.__streams[stream_name]
+
+    def list_streams(self):
+        with self.__lock:
+            return list(self.__streams.keys())
+
+    def describe_message_stream(self, stream_name):
+        stream = self.__stream(stream_name)
+        with stream.condition:
+            count = len(stream.messages)
+        return MessageStreamInfo(definition=stream.definition,
+                                 storage_status=MessageStreamInfo.storageStatus(
+                                     oldest_sequence_number=0 if count else None,
+                                     newest_sequence_number=count - 1 if count else None,
+                                     total_bytes=0))
+
+    def append_message(self, stream_name, data):
+        if self.__append_latency > 0:
+            time.sleep(self.__append_latency)
+        stream = self.__stream(stream_name)
+        with stream.condition:
+            sequence_number = len(stream.messages)
+            stream.messages.append(Message(stream_name=stream_name, sequence_number=sequence_number, payload=data))
+            stream.condition.notify_all()
+        export = stream.definition.export_definition
+        if export is not None:
+            task = Util.deserialize_json_bytes_to_obj(data, S3ExportTaskDefinition)
+            status_stream_name = export.s3_task_executor[0].status_config.status_stream_name
+            with self.__lock:
+                self.__appended[task.input_url] = time.monotonic()
+            self.__tasks.put((status_stream_name, task, sequence_number))
+        return sequence_number
+
+    def read_messages(self, stream_name, options=None):
+        stream = self.__stream(stream_name)
+        start = options.desired_start_sequence_number or 0
+        min_count = options.min_message_count or 1
+        max_count = options.max_message_count or min_count
+        deadline = time.monotonic() + (options.read_timeout_millis or 0) / 1000
+        with stream.condition:
+            while len(stream.messages) - start < min_count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self.__closed.is_set():
+                    raise NotEnoughMessagesException("Not enough messages")
+                stream.condition.wait(remaining)
+            return stream.messages[start:start + max_count]
+
+    def __status(self, status_stream_name, task, sequence_number, status):
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=status,
+                                       status_context=StatusContext(s3_export_task_definition=task,
+                                                                    sequence_number=sequence_number),
+                                       message="simulated",
+                                       timestamp_epoch_ms=int(time.time() * 1000))
+        try:
+            self.append_message(status_stream_name, Util.validate_and_serialize_to_json_bytes(status_message))
+        except ResourceNotFoundException:
+            pass
+
+    def __upload(self):
+        while not self.__closed.is_set():
+            try:
+                status_stream_name, task, sequence_number = self.__tasks.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.__status(status_stream_name, task, sequence_number, Status.InProgress)
+            path = task.input_url.partition("file://")[2]
+            try:
+                size = os.stat(path).st_size
+            except FileNotFoundError:
+                size = None
+            with self.__lock:
+                failed = size is None or self.__random.random() < self.__failure_rate
+            time.sleep(self.__upload_latency)
+            if not failed:
+                with self.__link:
+                    time.sleep(size / self.__bandwidth)
+            with self.__lock:
+                appended = self.__appended.pop(task.input_url, None)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.succeeded += 1
+                    self.uploaded_bytes += size
+                    if appended is not None:
+                        self.latencies.append(time.monotonic() - appended)
+            self.__status(status_stream_name, task, sequence_number, Status.Failure if failed else Status.Success)
+
+    def close(self):
+        self.__closed.set()
+        for worker in self.__workers:
+            worker.join()
+        self.__workers = []
@@ -0,0 +1,167 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Runs DirectoryUploader end to end against a FakeStreamManagerClient, on generated folders of files, and reports
+# the throughput, the latencies, the peak RSS and the CPU time. Run it from the root of the repository:
+#   python -m benchmarks.benchmark --files 1000 100000 1000000
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+from benchmarks.FakeStreamManagerClient import FakeStreamManagerClient
+from src.DirectoryUploader import DirectoryUploader
+
+
+def percentile(values, q):
+    if len(values) == 0:
+        return None
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def generate(directory, count, sizes, seed=0):
+    """ Creates count files in directory, with sizes picked from sizes. Returns the total size"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    blocks = {size: b"x" * size for size in sizes}
+    total = 0
+    for i in range(count):
+        size = rng.choice(sizes)
+        with open(os.path.join(directory, f"file-{i:08d}.csv"), "wb") as f:
+            f.write(blocks[size])
+        total += size
+    return total
+
+
+async def run(directory, count, client, timeout, **options):
+    logger = logging.getLogger("benchmark")
+    du = DirectoryUploader(directory + "/*.csv", "benchmark-bucket", "benchmark", 1, logger=logger, client=client,
+                           **options)
+    task = asyncio.create_task(du.Run())
+    start = time.monotonic()
+    try:
+        # done once every file has been uploaded and deleted. The upload tasks are not counted: with bundles or
+        # split files, a task uploads several files or a part of one
+        while True:
+            remaining = len(os.listdir(directory))
+            if remaining == 0:
+                break
+            if time.monotonic() - start > timeout:
+                raise TimeoutError(f"{count - remaining} of {count} files uploaded after {timeout} seconds")
+            if task.done():
+                task.result()
+                raise RuntimeError("DirectoryUploader stopped")
+            await asyncio.sleep(0.05)
+        elapsed = time.monotonic() - start
+        # let the metrics of the last pass be published
+        await asyncio.sleep(1)
+        return elapsed
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        du.Close()
+
+
+def benchmark(count, sizes, workdir=None, timeout=3600, client_options=None, **options):
+    """ Uploads count generated files and returns the measurements as a dict"""
+    root = tempfile.mkdtemp(dir=workdir)
+    try:
+        directory = os.path.join(root, "data")
+        total = generate(directory, count, sizes)
+        metrics_path = os.path.join(root, "metrics.json")
+        client = FakeStreamManagerClient(**(client_options or {}))
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # every file is complete, none is held back as the active file
+        options.setdefault("readiness", "quiescent")
+        options.setdefault("quiescence_period", 0)
+        # a loop of its own, the current event loop of the caller is left as it is
+        loop = asyncio.new_event_loop()
+        try:
+            elapsed = loop.run_until_complete(run(directory, count, client, timeout,
+                                                  ledger_path=os.path.join(root, "ledger.db"), metrics_sink="json",
+                                                  metrics_path=metrics_path, metrics_interval=0.5, **options))
+        finally:
+            loop.close()
+        after = resource.getrusage(resource.RUSAGE_SELF)
+
+        with open(metrics_path) as f:
+            metrics = json.load(f)
+        scans = metrics["counters"].get("scans", 0)
+        cpu = (after.ru_utime - usage.ru_utime) + (after.ru_stime - usage.ru_stime)
+        return {
+            "files": count,
+            "bytes": total,
+            "seconds": round(elapsed, 3),
+            "files_per_second": round(count / elapsed, 1),
+            "upload_latency_p50": percentile(client.latencies, 0.5),
+            "upload_latency_p90": percentile(client.latencies, 0.9),
+            "upload_latency_p99": percentile(client.latencies, 0.99),
+            "tasks": client.succeeded,
+            "failures": client.failed,
+            "scans": scans,
+            "scan_duration_p50": metrics["summaries"].get("scan_duration_seconds", {}).get("p50"),
+            "cpu_seconds": round(cpu, 3),
+            # the CPU time of the whole process (scans, uploads, statuses and the fake client) per scan of the folder
+            "cpu_seconds_per_pass": round(cpu / scans, 4) if scans else None,
+            # ru_maxrss is in KiB on linux
+            "peak_rss_mib": round(after.ru_maxrss / 1024, 1),
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark DirectoryUploader against a simulated stream manager")
+    parser.add_argument("--files", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[128, 4096, 65536],
+                        help="sizes in bytes of the generated files, picked at random")
+    parser.add_argument("--workdir", default=None, help="folder where the files are generated")
+    parser.add_argument("--timeout", type=float, default=3600)
+    parser.add_argument("--append-latency", type=float, default=0.0002)
+    parser.add_argument("--upload-latency", type=float, default=0.001)
+    parser.add_argument("--bandwidth", type=float, default=100*1024*1024, help="bytes per second")
+    parser.add_argument("--upload-workers", type=int, default=8)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--export-streams", type=int, default=1)
+    parser.add_argument("--max-in-flight-tasks", type=int, default=1000)
+    parser.add_argument("--max-concurrent-requests", type=int, default=8)
+    parser.add_argument("--output", default=None, help="JSON file the results are written to")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = []
+    for count in args.files:
+        result = benchmark(count, args.sizes, args.workdir, args.timeout,
+                           client_options=dict(append_latency=args.append_latency, upload_latency=args.upload_latency,
+                                               bandwidth=args.bandwidth, upload_workers=args.upload_workers,
+                                               failure_rate=args.failure_rate),
+                           export_streams=args.export_streams, max_in_flight_tasks=args.max_in_flight_tasks,
+                           max_concurrent_requests=args.max_concurrent_requests)
+        print(json.dumps(result))
+        results.append(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
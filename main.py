@@ -16,59 +16,184 @@
 
 
 
-import sys
-import time
+import argparse
 import asyncio
+import json
 import logging
+import time
 from urllib.parse import urlparse
+from src.Backoff import Backoff
+from src.ConfigSubscription import GreengrassConfigSubscription, reconfigure_arguments
 from src.DirectoryUploader import DirectoryUploader
+from src.FileCompressor import codec_available
+from src.UploadSource import UploadSource
 
 # This example scans a folder for a file pattern and upload the files that match to S3
 # The program monitor the completion of the S3 operation and upon succefull 
 
 
-async def main(logger:logging.Logger, pathname,bucket_name,bucket_path,interval):
+async def main(logger:logging.Logger, pathname,bucket_name,bucket_path,interval,live_configuration=False,**options):
 
     logger.info("==== main ====")
-    
-    while True:
-        du = None
-        try:
-            du = DirectoryUploader(pathname=pathname,bucket_name=bucket_name,bucket_path=bucket_path,interval=interval,logger=logger)
-            await du.Run()
-        except Exception:
-            logger.exception("Exception while running")
-        finally:
-            if du is not None:
-                du.Close()
-        #something very wrong happened. Let's pause for 1 minute and start again
-        time.sleep(60)
+
+    configuration = None
+    if live_configuration:
+        # PathName, BucketName, ObjectKeyPrefix, Interval, Sources and LogLevel are read from the configuration of the
+        # component, and applied while it runs when they change
+        configuration = GreengrassConfigSubscription(logger)
+        arguments = reconfigure_arguments(await asyncio.to_thread(configuration.Current))
+        pathname, bucket_name, bucket_path, interval = (arguments["pathname"], arguments["bucket_name"],
+                                                        arguments["bucket_path"], arguments["interval"])
+        options["sources"] = arguments["sources"]
+        if arguments["log_level"]:
+            logger.setLevel(arguments["log_level"])
+
+    # The uploader is only built again when building it failed (stream manager not ready...). When it stops on an
+    # error, the same uploader is run again so that the streams and the uploads in flight are kept. Both are retried
+    # with an exponential backoff, reset once the uploader has been running for a while.
+    backoff = Backoff(1, 60)
+    du = None
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                if du is None:
+                    du = DirectoryUploader(pathname=pathname,bucket_name=bucket_name,bucket_path=bucket_path,interval=interval,logger=logger,
+                                           configuration=configuration,**options)
+                await du.Run()
+            except Exception:
+                logger.exception("Exception while running")
+            if time.monotonic() - started >= backoff.maximum:
+                backoff.Reset()
+            delay = backoff.Next()
+            logger.info(f"Running again in {delay} seconds")
+            await asyncio.sleep(delay)
+    finally:
+        if du is not None:
+            du.Close()
+        if configuration is not None:
+            configuration.Close()
 
 
 
 # Start up this sample code
 
 if __name__ == "__main__":
-    #args :  pathname, bucket_name, interval, log_level
-    if len(sys.argv) == 6:
-        #Todo: validate arguments.
-        
-        print("PRINTING INCOMING ARGUMENTS")
-        print(sys.argv)
-        pathname = sys.argv[1]
-        bucket_name = sys.argv[2]
-        bucket_path = sys.argv[3]
-        interval = sys.argv[4]
-        log_level = sys.argv[5]
-
-        logging.basicConfig(level=log_level)
-        logger=logging.getLogger()
-
-        logger.info(f'File uploader started with; pathname={pathname}, bucket_name={bucket_name}, bucket_path={bucket_path}, interval={interval}')
-        asyncio.run(main(logger,pathname,bucket_name,bucket_path,int(interval)))
-    else:
-        logging.basicConfig(level=logging.INFO)
-        logger=logging.getLogger()
-        logger.error(f'6 argument required, only {len(sys.argv)} provided.')
-
-
+    #args :  pathname, bucket_name, bucket_path, interval, log_level followed by optional settings. With
+    # --live-configuration true they are read from the configuration of the component instead.
+    parser = argparse.ArgumentParser(description="Upload files matching a pattern to S3 via stream manager")
+    parser.add_argument("pathname", nargs="?")
+    parser.add_argument("bucket_name", nargs="?")
+    parser.add_argument("bucket_path", nargs="?")
+    parser.add_argument("interval", type=int, nargs="?")
+    parser.add_argument("log_level", nargs="?", default="INFO")
+    parser.add_argument("--live-configuration", choices=["true", "false"], default="false")
+    parser.add_argument("--scan-mode", choices=["poll", "inotify"], default="poll")
+    parser.add_argument("--reconcile-interval", type=int, default=300)
+    parser.add_argument("--ledger-path", default=None)
+    parser.add_argument("--max-concurrent-requests", type=int, default=8)
+    parser.add_argument("--status-batch-size", type=int, default=100)
+    parser.add_argument("--status-min-backoff", type=float, default=0.1)
+    parser.add_argument("--status-max-backoff", type=float, default=None)
+    parser.add_argument("--spool-dir", default=None)
+    parser.add_argument("--bundle-format", choices=["none", "tar", "zip"], default="none")
+    parser.add_argument("--bundle-max-bytes", type=int, default=64*1024*1024)
+    parser.add_argument("--bundle-max-files", type=int, default=1000)
+    parser.add_argument("--bundle-max-age", type=int, default=60)
+    parser.add_argument("--bundle-max-file-size", type=int, default=1024*1024)
+    parser.add_argument("--compression", choices=["none", "gzip", "zstd"], default="none")
+    parser.add_argument("--compression-level", type=int, default=None)
+    parser.add_argument("--compression-workers", type=int, default=2)
+    parser.add_argument("--sources", default="[]", help="JSON list of additional sources")
+    parser.add_argument("--max-in-flight-tasks", type=int, default=1000)
+    parser.add_argument("--schedule-policy", choices=["oldest", "smallest", "priority"], default="oldest")
+    parser.add_argument("--readiness", choices=["newest", "quiescent"], default="newest")
+    parser.add_argument("--quiescence-period", type=float, default=5)
+    parser.add_argument("--readiness-check", choices=["none", "lock", "marker", "rename"], default="none")
+    parser.add_argument("--export-streams", type=int, default=1)
+    parser.add_argument("--shard-policy", choices=["hash", "least-loaded"], default="hash")
+    parser.add_argument("--stream-max-size", type=int, default=None)
+    parser.add_argument("--stream-segment-size", type=int, default=None)
+    parser.add_argument("--stream-persistence", choices=["file", "memory"], default=None)
+    parser.add_argument("--stream-flush-on-write", choices=["true", "false"], default=None)
+    parser.add_argument("--metrics-sink", choices=["none", "prometheus", "json", "stream"], default="none")
+    parser.add_argument("--metrics-interval", type=float, default=60)
+    parser.add_argument("--metrics-port", type=int, default=9108)
+    parser.add_argument("--metrics-path", default=None)
+    parser.add_argument("--metrics-stream", default=None)
+    parser.add_argument("--profile", choices=["true", "false"], default="false")
+    parser.add_argument("--profile-path", default=None)
+    parser.add_argument("--profile-interval", type=float, default=0.01)
+    parser.add_argument("--dedup", choices=["none", "delete", "skip"], default="none")
+    parser.add_argument("--dedup-path", default=None)
+    parser.add_argument("--dedup-max-entries", type=int, default=10000)
+    parser.add_argument("--dedup-workers", type=int, default=2)
+    parser.add_argument("--split-size", type=int, default=0, help="files larger than this are split, 0 to disable")
+    parser.add_argument("--split-delimiter", default="\\n", help="record delimiter with escapes, or none")
+    parser.add_argument("--post-upload-action", choices=["delete", "archive", "retain", "truncate"], default="delete")
+    parser.add_argument("--post-upload-path", default="")
+    parser.add_argument("--retention-max-bytes", type=int, default=0, help="0 to keep every file")
+    parser.add_argument("--post-upload-workers", type=int, default=2)
+    args = parser.parse_args()
+    live_configuration = args.live_configuration == "true"
+    if not live_configuration and args.interval is None:
+        parser.error("pathname, bucket_name, bucket_path, interval and log_level are required")
+    if args.compression != "none" and not codec_available(args.compression):
+        parser.error(f"{args.compression} compression requires the zstandard package, run: pip3 install zstandard")
+
+    logging.basicConfig(level=args.log_level)
+    logger=logging.getLogger()
+
+    # additional sources default to the bucket and prefix of the main one
+    sources = [UploadSource.FromConfig(source, args.bucket_name, args.bucket_path) for source in json.loads(args.sources)]
+
+    logger.info(f'File uploader started with; pathname={args.pathname}, bucket_name={args.bucket_name}, bucket_path={args.bucket_path}, interval={args.interval}, scan_mode={args.scan_mode}')
+    asyncio.run(main(logger,args.pathname,args.bucket_name,args.bucket_path,args.interval,
+                     live_configuration=live_configuration,
+                     scan_mode=args.scan_mode,
+                     reconcile_interval=args.reconcile_interval,
+                     ledger_path=args.ledger_path,
+                     max_concurrent_requests=args.max_concurrent_requests,
+                     status_batch_size=args.status_batch_size,
+                     status_min_backoff=args.status_min_backoff,
+                     status_max_backoff=args.status_max_backoff,
+                     spool_dir=args.spool_dir,
+                     bundle_format=None if args.bundle_format == "none" else args.bundle_format,
+                     bundle_max_bytes=args.bundle_max_bytes,
+                     bundle_max_files=args.bundle_max_files,
+                     bundle_max_age=args.bundle_max_age,
+                     bundle_max_file_size=args.bundle_max_file_size,
+                     compression=None if args.compression == "none" else args.compression,
+                     compression_level=args.compression_level,
+                     compression_workers=args.compression_workers,
+                     sources=sources,
+                     max_in_flight_tasks=args.max_in_flight_tasks,
+                     schedule_policy=args.schedule_policy,
+                     readiness=args.readiness,
+                     quiescence_period=args.quiescence_period,
+                     readiness_check=None if args.readiness_check == "none" else args.readiness_check,
+                     export_streams=args.export_streams,
+                     shard_policy=args.shard_policy,
+                     stream_max_size=args.stream_max_size,
+                     stream_segment_size=args.stream_segment_size,
+                     stream_persistence=args.stream_persistence,
+                     stream_flush_on_write=None if args.stream_flush_on_write is None else args.stream_flush_on_write == "true",
+                     metrics_sink=None if args.metrics_sink == "none" else args.metrics_sink,
+                     metrics_interval=args.metrics_interval,
+                     metrics_port=args.metrics_port,
+                     metrics_path=args.metrics_path,
+                     metrics_stream=args.metrics_stream,
+                     profile_path=args.profile_path if args.profile == "true" else None,
+                     profile_interval=args.profile_interval,
+                     dedup=None if args.dedup == "none" else args.dedup,
+                     dedup_path=args.dedup_path,
+                     dedup_max_entries=args.dedup_max_entries,
+                     dedup_workers=args.dedup_workers,
+                     split_size=args.split_size or None,
+                     # escapes such as \n or \x1e are expanded
+                     split_delimiter=None if args.split_delimiter == "none" else
+                         args.split_delimiter.encode().decode("unicode_escape").encode("latin-1"),
+                     post_upload_action=args.post_upload_action,
+                     post_upload_path=args.post_upload_path or None,
+                     retention_max_bytes=args.retention_max_bytes or None,
+                     post_upload_workers=args.post_upload_workers))
@@ -0,0 +1,52 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from stream_manager import (
+    ReadMessagesOptions,
+    StreamManagerClient,
+)
+from stream_manager.data import Message, MessageStreamInfo
+
+
+class AsyncStreamManagerClient:
+    """ AsyncStreamManagerClient runs the blocking StreamManagerClient calls on a bounded thread pool so that they
+    don't block the asyncio event loop, and so that several requests can be in flight at the same time"""
+
+    def __init__(self, client:StreamManagerClient, max_workers=8):
+        # StreamManagerClient multiplexes concurrent requests over its connection, each worker thread only waits
+        # for the response of its own request
+        self.__client = client
+        self.__executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="StreamManagerClient")
+
+    async def __call(self, function, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, functools.partial(function, *args, **kwargs))
+
+    async def append_message(self, stream_name: str, data: bytes) -> int:
+        return await self.__call(self.__client.append_message, stream_name, data)
+
+    async def read_messages(self, stream_name: str, options: Optional[ReadMessagesOptions] = None) -> List[Message]:
+        return await self.__call(self.__client.read_messages, stream_name, options)
+
+    async def describe_message_stream(self, stream_name: str) -> MessageStreamInfo:
+        return await self.__call(self.__client.describe_message_stream, stream_name)
+
+    def close(self):
+        self.__executor.shutdown(wait=False)
+        self.__client.close()
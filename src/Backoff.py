@@ -0,0 +1,30 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+
+class Backoff:
+    """ Backoff returns delays that double from minimum up to maximum seconds, until it is reset"""
+
+    def __init__(self, minimum=1, maximum=60):
+        self.minimum = min(minimum, maximum)
+        self.maximum = maximum
+        self.__delay = self.minimum
+
+    def Next(self):
+        delay = self.__delay
+        self.__delay = min(self.__delay * 2, self.maximum)
+        return delay
+
+    def Reset(self):
+        self.__delay = self.minimum
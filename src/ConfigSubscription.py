@@ -0,0 +1,137 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import json
+import logging
+
+from src.UploadSource import UploadSource
+
+try:
+    from awsiot.greengrasscoreipc.clientv2 import GreengrassCoreIPCClientV2
+except ImportError:
+    GreengrassCoreIPCClientV2 = None
+
+# The configuration keys applied while the component runs, without restarting it. The other keys are passed on the
+# command line, the component is restarted when they change.
+LIVE_KEYS = ("PathName", "BucketName", "ObjectKeyPrefix", "Interval", "Sources", "LogLevel")
+
+
+def reconfigure_arguments(configuration):
+    """ Returns the arguments of DirectoryUploader.Reconfigure for a configuration of the component. Only LIVE_KEYS are
+    read"""
+    configuration = {key: configuration[key] for key in LIVE_KEYS if configuration.get(key) is not None}
+    missing = [key for key in ("PathName", "BucketName", "Interval") if key not in configuration]
+    if len(missing) > 0:
+        raise ValueError(f"The configuration has no {', '.join(missing)}")
+    bucket_name = configuration["BucketName"]
+    bucket_path = configuration.get("ObjectKeyPrefix", "")
+    sources = configuration.get("Sources") or []
+    if isinstance(sources, str):
+        sources = json.loads(sources)
+    return dict(pathname=configuration["PathName"],
+                bucket_name=bucket_name,
+                bucket_path=bucket_path,
+                interval=int(configuration["Interval"]),
+                sources=[UploadSource.FromConfig(source, bucket_name, bucket_path) for source in sources],
+                log_level=configuration.get("LogLevel"))
+
+
+def restart_keys(previous, configuration):
+    """ Returns the keys other than LIVE_KEYS whose value changed between two configurations, they are only applied
+    when the component is restarted"""
+    keys = (set(previous) | set(configuration)) - set(LIVE_KEYS)
+    return sorted(key for key in keys if previous.get(key) != configuration.get(key))
+
+
+class LocalConfigSubscription:
+    """ LocalConfigSubscription is a local stand-in for the configuration updates of Greengrass, the configuration is
+    changed with Update()"""
+
+    def __init__(self, configuration):
+        self.__configuration = dict(configuration)
+        self.__changed = asyncio.Event()
+
+    def Start(self):
+        pass
+
+    def Current(self):
+        return dict(self.__configuration)
+
+    def Update(self, changes):
+        """ Changes some keys of the configuration and notifies the subscriber"""
+        self.__configuration.update(changes)
+        self.__changed.set()
+
+    async def Next(self):
+        """ Waits for the configuration to change and returns the new configuration"""
+        await self.__changed.wait()
+        self.__changed.clear()
+        return self.Current()
+
+    def Close(self):
+        pass
+
+
+class GreengrassConfigSubscription:
+    """ GreengrassConfigSubscription reads the configuration of the component through Greengrass IPC and is notified
+    when it changes"""
+
+    def __init__(self, logger:logging.Logger, settle_time=1):
+        if GreengrassCoreIPCClientV2 is None:
+            raise ValueError("Configuration updates require the awsiotsdk package, run: pip3 install awsiotsdk")
+        self.__logger = logger
+        # a deployment updates the keys one by one, the updates received within settle_time seconds are applied
+        # together
+        self.__settle_time = settle_time
+        self.__client = GreengrassCoreIPCClientV2()
+        self.__changed = None
+        self.__loop = None
+        self.__operation = None
+
+    def Start(self):
+        """ Subscribes to the updates of the configuration, called from the event loop"""
+        if self.__operation is not None:
+            return
+        self.__loop = asyncio.get_running_loop()
+        self.__changed = asyncio.Event()
+        _, self.__operation = self.__client.subscribe_to_configuration_update(key_path=[],
+                                                                               on_stream_event=self.__onUpdate,
+                                                                               on_stream_error=self.__onError)
+
+    def __onUpdate(self, event):
+        # called on a thread of the IPC client
+        self.__loop.call_soon_threadsafe(self.__changed.set)
+
+    def __onError(self, error):
+        self.__logger.error("Error on the configuration update subscription", exc_info=error)
+        # keep the subscription open
+        return False
+
+    def Current(self):
+        """ Returns the configuration of the component, this is a blocking call"""
+        return self.__client.get_configuration(key_path=[]).value
+
+    async def Next(self):
+        """ Waits for the configuration to change and returns the new configuration"""
+        await self.__changed.wait()
+        await asyncio.sleep(self.__settle_time)
+        self.__changed.clear()
+        return await asyncio.to_thread(self.Current)
+
+    def Close(self):
+        if self.__operation is not None:
+            self.__operation.close()
+            self.__operation = None
+        self.__client.close()
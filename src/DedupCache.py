@@ -0,0 +1,113 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import hashlib
+import mmap
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# files are read by chunks of 1 MiB when they can't be mapped in memory
+CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """ Returns the sha256 of the content of a file, as an hex string"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        try:
+            # hashlib releases the GIL while it hashes a large buffer, the mapped file is hashed in one call
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+        except (ValueError, OSError):
+            # empty files can't be mapped, neither can some special files
+            f.seek(0)
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupCache:
+    """ DedupCache remembers the content hashes of the files uploaded under each key prefix, so that files with
+    the same content as a recent upload are not uploaded again"""
+
+    def __init__(self, path, max_entries=10000, workers=2):
+        # The digests of the uploads are kept per key prefix, the max_entries least recently used ones are kept.
+        # The digests of the files are kept along with their inode, size and mtime, so that a file that didn't change
+        # is not read again.
+        self.__db = sqlite3.connect(path)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__db.execute("CREATE TABLE IF NOT EXISTS digests (prefix TEXT NOT NULL, digest TEXT NOT NULL, "
+                          "used REAL NOT NULL, PRIMARY KEY (prefix, digest))")
+        self.__db.execute("CREATE INDEX IF NOT EXISTS digests_used ON digests (prefix, used)")
+        self.__db.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, inode INTEGER NOT NULL, "
+                          "size INTEGER NOT NULL, mtime INTEGER NOT NULL, digest TEXT NOT NULL)")
+        self.__db.commit()
+        self.__max_entries = max_entries
+        self.__adds = {}
+        self.__executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="DedupCache")
+
+    async def Digest(self, path):
+        """ Returns the content hash of a file, it is only computed if the file changed since it was last hashed"""
+        loop = asyncio.get_running_loop()
+        st = await loop.run_in_executor(self.__executor, os.stat, path)
+        row = self.__db.execute("SELECT inode, size, mtime, digest FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[:3] == (st.st_ino, st.st_size, st.st_mtime_ns):
+            return row[3]
+        digest = await loop.run_in_executor(self.__executor, hash_file, path)
+        self.__db.execute("INSERT OR REPLACE INTO files (path, inode, size, mtime, digest) VALUES (?, ?, ?, ?, ?)",
+                          (path, st.st_ino, st.st_size, st.st_mtime_ns, digest))
+        return digest
+
+    def Contains(self, prefix, digest):
+        """ Returns True if a file with this digest was uploaded under prefix recently"""
+        cursor = self.__db.execute("UPDATE digests SET used = ? WHERE prefix = ? AND digest = ?",
+                                   (time.time(), prefix, digest))
+        return cursor.rowcount > 0
+
+    def Add(self, prefix, digest):
+        """ Records the digest of a file that has been uploaded under prefix"""
+        self.__db.execute("INSERT OR REPLACE INTO digests (prefix, digest, used) VALUES (?, ?, ?)",
+                          (prefix, digest, time.time()))
+        # evict the least recently used digests of the prefix. Finding them costs max_entries rows, it is only done
+        # once every tenth of max_entries additions, the cache holds up to 10% more entries in between.
+        adds = self.__adds.get(prefix, 0) + 1
+        self.__adds[prefix] = adds % max(self.__max_entries // 10, 1)
+        if self.__adds[prefix] != 0:
+            return
+        self.__db.execute("DELETE FROM digests WHERE prefix = ? AND digest IN (SELECT digest FROM digests "
+                          "WHERE prefix = ? ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                          (prefix, prefix, self.__max_entries))
+
+    def Forget(self, path):
+        """ Forgets the digest of a file that has been removed"""
+        self.__db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def Prune(self):
+        """ Forgets the digests of the files that no longer exist"""
+        paths = [row[0] for row in self.__db.execute("SELECT path FROM files")]
+        self.__db.executemany("DELETE FROM files WHERE path = ?",
+                              [(path,) for path in paths if not os.path.exists(path)])
+        self.__db.commit()
+
+    def Commit(self):
+        self.__db.commit()
+
+    def Close(self):
+        self.__executor.shutdown(wait=False)
+        self.__db.commit()
+        self.__db.close()
@@ -0,0 +1,119 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+from collections import namedtuple
+
+from src.DirectoryWatcher import match_name
+
+# What the index knows about a file. mtime is in nanoseconds.
+FileInfo = namedtuple("FileInfo", ["inode", "size", "mtime"])
+
+# Paths that appeared (or were replaced by a new inode), changed (same inode, new size or mtime) or disappeared
+# between two scans
+IndexChanges = namedtuple("IndexChanges", ["added", "changed", "removed"])
+
+# The FileInfo of each file is packed in a single int: mtime (offset so that it is positive), size, inode, and the
+# mark of the last scan that saw the file in the lowest bit
+_BITS = 64
+_MASK = (1 << _BITS) - 1
+_MTIME_OFFSET = 1 << 63
+
+
+def _pack(info, mark):
+    return ((info.mtime + _MTIME_OFFSET) << (2 * _BITS + 1)) | (info.size << (_BITS + 1)) | (info.inode << 1) | mark
+
+
+def _unpack(packed):
+    return FileInfo((packed >> 1) & _MASK, (packed >> (_BITS + 1)) & _MASK, (packed >> (2 * _BITS + 1)) - _MTIME_OFFSET)
+
+
+class DirectoryIndex:
+    """ DirectoryIndex keeps track of the files of a folder that match a pattern and reports what changed between scans"""
+
+    def __init__(self, directory, pattern):
+        self.__directory = directory
+        self.__pattern = pattern
+        # With a large backlog the index holds millions of files, each one is a path and a packed int (about 175
+        # bytes per file, 300 with a FileInfo). The index is updated in place so that a scan doesn't build a second
+        # copy of it, and so that the paths it reports are the ones it keeps: the pending files and the schedule
+        # share them instead of holding copies.
+        self.__files = {}
+        self.__mark = 0
+        self.__newest = None
+
+    def Refresh(self):
+        """ Scans the folder once, stat'ing each matching file once, and returns the IndexChanges since the last scan"""
+        files = self.__files
+        mark = self.__mark ^ 1
+        added = []
+        changed = []
+        newest = None
+        newest_key = None
+        with os.scandir(self.__directory) as entries:
+            for entry in entries:
+                if not match_name(entry.name, self.__pattern):
+                    continue
+                try:
+                    # is_file relies on the file type returned by the folder listing and doesn't need a stat
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # the file was removed while we were scanning the folder
+                    continue
+
+                path = entry.path
+                info = FileInfo(stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                previous = files.get(path)
+                if previous is None or _unpack(previous).inode != info.inode:
+                    added.append(path)
+                elif _unpack(previous) != info:
+                    changed.append(path)
+                # assigning to an existing key keeps the path object already in the index
+                files[path] = _pack(info, mark)
+
+                # the most recent file is tracked while scanning so that the files don't need to be sorted
+                key = (info.mtime, path)
+                if newest_key is None or key > newest_key:
+                    newest_key = key
+                    newest = path
+
+        # the files that the scan didn't see still have the mark of the previous scan. When a scan fails half way,
+        # the mark doesn't change and the files removed in the meantime are reported one scan later.
+        removed = [path for path, packed in files.items() if packed & 1 != mark]
+        for path in removed:
+            del files[path]
+        self.__mark = mark
+        self.__newest = newest
+        return IndexChanges(added, changed, removed)
+
+    def Newest(self):
+        """ Returns the most recently modified file seen by the last scan, or None if the folder was empty"""
+        return self.__newest
+
+    def Get(self, path):
+        """ Returns the FileInfo of a file seen by the last scan, or None"""
+        packed = self.__files.get(path)
+        return None if packed is None else _unpack(packed)
+
+    def __iter__(self):
+        # the index is updated by the scans on a worker thread, the paths are copied in one go
+        return iter(list(self.__files))
+
+    def __contains__(self, path):
+        return path in self.__files
+
+    def __len__(self):
+        return len(self.__files)
@@ -13,26 +13,21 @@
 #  limitations under the License.
 
 import asyncio
-import glob
 import os
+import time
+import uuid
 import ntpath
-from urllib.parse import urlparse
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from datetime import datetime
 
 from stream_manager import (
-    ExportDefinition,
-    MessageStreamDefinition,
     ReadMessagesOptions,
     ResourceNotFoundException,
     S3ExportTaskDefinition,
-    S3ExportTaskExecutorConfig,
     Status,
-    StatusConfig,
-    StatusLevel,
     StatusMessage,
-    StrategyOnFull,
     StreamManagerClient,
     StreamManagerException,
     ValidationException,
@@ -40,27 +35,231 @@ from stream_manager import (
 )
 from stream_manager.util import Util
 
+from src.AsyncStreamManagerClient import AsyncStreamManagerClient
+from src.Backoff import Backoff
+from src.ConfigSubscription import reconfigure_arguments, restart_keys
+from src.DirectoryWatcher import DirectoryWatcher
+from src.DedupCache import DedupCache
+from src.ExportStream import ExportStream, HASH, SHARD_POLICIES
+from src.FileBundler import FileBundler
+from src.FileCompressor import FileCompressor
+from src.FileSplitter import FileSplitter
+from src.PostUploadAction import PostUploadAction, DELETE
+from src.MetricsSink import PrometheusSink, JsonFileSink, StreamSink, SINKS, PROMETHEUS, JSON
+from src.ProcessedSet import ProcessedSet
+from src.ReadinessDetector import ReadinessDetector, NEWEST
+from src.SamplingProfiler import SamplingProfiler
+from src.Spool import Spool
+from src.UploadLedger import UploadLedger, SUCCEEDED
+from src.UploadMetrics import UploadMetrics
+from src.UploadScheduler import UploadScheduler, OLDEST_FIRST
+from src.UploadSource import UploadSource
+
 
 class DirectoryUploader:
     """ DirectoryUploader monitors a folder for new files and upload those new files to S2 via stream manager"""
 
-    __stream_name = "DirectoryUploader"
-    __status_stream_name = "DirectoryUploaderStatus"
-    
-    def __init__(self, pathname, bucket_name, bucket_path, interval, logger:logging.Logger ,client:StreamManagerClient=None):
-        self.__pathname = pathname
+    def __init__(self, pathname, bucket_name, bucket_path, interval, logger:logging.Logger ,client:StreamManagerClient=None,
+                 scan_mode="poll", reconcile_interval=300, ledger_path=None, max_concurrent_requests=8,
+                 status_batch_size=100, status_min_backoff=0.1, status_max_backoff=None,
+                 spool_dir=None, bundle_format=None, bundle_max_bytes=64*1024*1024, bundle_max_files=1000,
+                 bundle_max_age=60, bundle_max_file_size=1024*1024,
+                 compression=None, compression_level=None, compression_workers=2, sources=None,
+                 max_in_flight_tasks=1000, schedule_policy=OLDEST_FIRST,
+                 readiness=NEWEST, quiescence_period=5, readiness_check=None,
+                 export_streams=1, shard_policy=HASH, stream_max_size=None, stream_segment_size=None,
+                 stream_persistence=None, stream_flush_on_write=None,
+                 metrics_sink=None, metrics_interval=60, metrics_port=9108, metrics_path=None, metrics_stream=None,
+                 profile_path=None, profile_interval=0.01,
+                 dedup=None, dedup_path=None, dedup_max_entries=10000, dedup_workers=2,
+                 split_size=None, split_delimiter=b"\n", configuration=None,
+                 post_upload_action=DELETE, post_upload_path=None, retention_max_bytes=None, post_upload_workers=2):
+        # pathname, bucket_name and bucket_path describe the main source. Additional sources, each with its own
+        # pattern, bucket, prefix and priority, share the same client, streams and event loop. When a file matches
+        # several sources, the source with the highest priority is used.
+        self.__mainSource = UploadSource(pathname, bucket_name, bucket_path)
+        self.__sources = sorted([self.__mainSource] + list(sources or []), key=lambda source: -source.priority)
+        # the scan and watch tasks of each source while the uploader runs
+        self.__sourceTasks = {}
+        self.__running = False
+        self.__started = False
+        # The sources, the interval and the log level follow the updates of the configuration subscription (see
+        # ConfigSubscription) without stopping the uploader.
+        self.__configuration = configuration
         self.__bucket_name = bucket_name
-        self.__bucket_path = bucket_path.removeprefix("/").removesuffix("/")
-        self.__stream_name = bucket_name + "Stream"
-        self.__status_stream_name = self.__stream_name + "Status"
+        # Files are spread over export_streams streams, each with its own S3 export and status stream, so that
+        # stream manager uploads several files in parallel. A file goes to a stream picked by a hash of its path,
+        # or to the stream with the fewest uploads in flight (shard_policy "least-loaded").
+        if shard_policy not in SHARD_POLICIES:
+            raise ValueError(f"Invalid shard policy {shard_policy}, expected one of {', '.join(SHARD_POLICIES)}")
+        self.__shard_policy = shard_policy
+        self.__streams = [ExportStream(name) for name in ExportStream.Names(bucket_name, max(export_streams, 1))]
         self.__client = client
         if(self.__client == None):
             self.__client = StreamManagerClient() 
+        # the stream manager calls are blocking, they run on a pool of threads so that they don't block the event
+        # loop and so that several task definitions can be appended at the same time
+        self.__max_concurrent_requests = max(max_concurrent_requests, 1)
+        self.__async_client = AsyncStreamManagerClient(self.__client, self.__max_concurrent_requests)
         self.__logger = logger
-        self.__status_interval = max(interval,1)
-        self.__filesProcessed = set()
+        # the status stream is read status_batch_size messages at a time. When it is empty, the reader backs off
+        # exponentially from status_min_backoff up to status_max_backoff seconds (by default the scan interval)
+        self.__status_batch_size = max(status_batch_size, 1)
+        self.__status_max_backoff = max(interval,1) if status_max_backoff is None else status_max_backoff
+        self.__status_min_backoff = min(status_min_backoff, self.__status_max_backoff)
+        # Once uploaded, files are deleted, moved to the post_upload_path folder ("archive"), hard linked into it
+        # ("retain") or truncated. The actions run in batches on a pool of post_upload_workers threads. With
+        # retention_max_bytes, the oldest files of post_upload_path are removed once it holds more than that.
+        self.__uploaded = asyncio.Queue()
+        self.__postUploadAction = PostUploadAction(post_upload_action, post_upload_path, retention_max_bytes)
+        self.__deleteAction = PostUploadAction(DELETE)
+        self.__post_upload_workers = max(post_upload_workers, 1)
+        self.__postUploadPool = ThreadPoolExecutor(max_workers=self.__post_upload_workers, thread_name_prefix="PostUpload")
+
+        # Metrics are always collected. With a metrics_sink they are published every metrics_interval seconds, on
+        # a local Prometheus endpoint (metrics_port), to a JSON file (metrics_path) or to a local stream manager
+        # stream (metrics_stream). With a profile_path, the stacks of the component are sampled every
+        # profile_interval seconds and written to that file in the collapsed stack format.
+        self.__metrics = UploadMetrics()
+        self.__metrics_interval = metrics_interval
+        self.__metricsSink = None
+        if metrics_sink == PROMETHEUS:
+            self.__metricsSink = PrometheusSink(metrics_port)
+        elif metrics_sink == JSON:
+            if not metrics_path:
+                raise ValueError("A metrics file is required to publish the metrics to a JSON file")
+            self.__metricsSink = JsonFileSink(metrics_path)
+        elif metrics_sink is not None:
+            if metrics_sink not in SINKS:
+                raise ValueError(f"Invalid metrics sink {metrics_sink}, expected one of {', '.join(SINKS)}")
+            self.__metricsSink = StreamSink(self.__async_client, metrics_stream or bucket_name + "Metrics")
+        self.__profiler = None if not profile_path else SamplingProfiler(profile_path, profile_interval)
+        # time and size of the files appended to the export streams, until their upload completes. Like the files in
+        # flight in the scheduler, there are at most max_in_flight_tasks of them.
+        self.__appended = {}
+        # files that have been queued for upload, across all sources. The files seen by the scans that still need
+        # to be queued are tracked by each source. With a large backlog there are millions of them, they are kept
+        # as hashes in a compact set rather than as strings.
+        self.__filesProcessed = ProcessedSet()
         self.__interval=interval
+        # New files are not appended as soon as they are found. The scheduler orders them by schedule_policy and
+        # only lets max_in_flight_tasks upload tasks in the export stream until their upload succeeds or fails.
+        self.__scheduler = UploadScheduler(max(max_in_flight_tasks, 1), schedule_policy)
+        self.__dispatchReady = asyncio.Event()
+        # In "newest" mode the newest file of each folder is considered active and held back. In "quiescent" mode a
+        # file is uploaded once its size and mtime have been stable for quiescence_period seconds. readiness_check
+        # adds a lock, ".done" marker or rename-into-place check on top of it.
+        self.__readiness = ReadinessDetector(readiness, quiescence_period, readiness_check)
+
+        # In "poll" mode the folder is scanned every interval seconds. In "inotify" mode new files are picked up
+        # as soon as they are closed or moved into the folder, and the folder is only scanned every
+        # reconcile_interval seconds to catch up with events that might have been missed.
+        if scan_mode not in ("poll", "inotify"):
+            raise ValueError(f"Invalid scan mode {scan_mode}, expected poll or inotify")
+        self.__scan_mode = scan_mode
+        self.__reconcile_interval = max(reconcile_interval, interval)
+        for source in self.__sources:
+            source.scan_interval = interval
+
+        # The spool holds the artifacts built from the watched files until they are uploaded. When bundling is
+        # enabled, files up to bundle_max_file_size bytes are grouped into tar or zip archives, flushed when they
+        # reach bundle_max_bytes, bundle_max_files or are bundle_max_age seconds old.
+        # When compression is enabled, files are compressed into the spool by a pool of compression_workers
+        # processes, and the compressed copy is uploaded under the original key plus the codec extension.
+        # When split_size is set, files larger than split_size bytes are cut into parts of at most split_size bytes
+        # at the split_delimiter record boundaries (any byte without delimiter). The parts are copied into the spool
+        # and uploaded under the key of the file followed by the part number, the file is deleted once every part
+        # has been uploaded.
+        self.__spool = None
+        self.__bundle_format = bundle_format
+        self.__compressor = None
+        self.__splitter = None
+        self.__artifactsPending = set()
+        if (bundle_format or compression or split_size) and not spool_dir:
+            raise ValueError("A spool folder is required to bundle, compress or split files")
+        if split_size:
+            self.__splitter = FileSplitter(split_size, split_delimiter)
+        if compression:
+            self.__compressor = FileCompressor(compression, compression_level, compression_workers)
+        self.__bundleSettings = (bundle_format, bundle_max_bytes, bundle_max_files, bundle_max_age, bundle_max_file_size)
+        if bundle_format:
+            # each source has its own bundles, as their files go to different buckets and prefixes
+            for source in self.__sources:
+                source.bundler = FileBundler(*self.__bundleSettings, self.__compressor)
+        if spool_dir:
+            self.__spool = Spool(spool_dir, logger)
+            self.__spool.Recover()
+
+        # With dedup, the content of each file is hashed by a pool of dedup_workers threads before it is queued. A
+        # file with the same content as one of the last dedup_max_entries files uploaded under the same bucket and
+        # prefix is not uploaded again: it is deleted ("delete") or left in the folder ("skip"). The digests are kept
+        # in dedup_path so that they survive restarts.
+        if dedup not in (None, "delete", "skip"):
+            raise ValueError(f"Invalid dedup mode {dedup}, expected delete or skip")
+        self.__dedup_mode = dedup
+        self.__dedup = None
+        if dedup:
+            if not dedup_path:
+                raise ValueError("A dedup cache file is required to deduplicate files")
+            self.__dedup = DedupCache(dedup_path, dedup_max_entries, dedup_workers)
+            # the files removed while the component was stopped are not reported by the scans
+            self.__dedup.Prune()
+        # prefix and digest of the files queued for upload, recorded in the cache once they are uploaded
+        self.__digests = {}
+        # duplicates left in the folder ("skip"), they are hashed again if their content is replaced
+        self.__skipped = set()
+
+        # The ledger records the files that have been queued, and the position in the status streams, so that
+        # after a restart the streams can be resumed instead of re-uploading every pending file.
+        self.__ledger = None
+        if ledger_path:
+            self.__ledger = UploadLedger(ledger_path)
 
+        existing_streams = self.__client.list_streams()
+        resumed = []
+        for stream in self.__streams:
+            # the ledger is only trusted if stream manager still has both streams. If it lost them (e.g. its data
+            # was wiped), the files and the status position recorded in the ledger no longer mean anything.
+            if self.__ledger is not None and self.__ledger.HasStream(stream.name) and \
+                    stream.name in existing_streams and stream.status_stream_name in existing_streams:
+                stream.status_next_seq = self.__ledger.StatusSequenceNumber(stream.name)
+                resumed.append(stream.name)
+            else:
+                self.__resetStream(stream.name, stream.status_stream_name)
+
+        # the streams left over by a larger export_streams are no longer read, their files will be queued again
+        names = set(stream.name for stream in self.__streams) | set(stream.status_stream_name for stream in self.__streams)
+        for name in existing_streams:
+            if name not in names and ExportStream.IsShard(self.__bucket_name, name) and not name.endswith("Status"):
+                self.__resetStream(name, name + "Status")
+        self.__resume(resumed)
+
+        # when resuming, the streams already exist and keep their messages, their settings are updated if they changed
+        existing_streams = self.__client.list_streams()
+        for stream in self.__streams:
+            # Create the Status Stream.
+            if stream.status_stream_name not in existing_streams:
+                self.__client.create_message_stream(stream.StatusDefinition())
+
+            # Create the message stream with the S3 Export definition.
+            if stream.name not in existing_streams:
+                self.__client.create_message_stream(
+                    stream.Definition(stream_max_size, stream_segment_size, stream_persistence, stream_flush_on_write))
+            else:
+                self.__updateStream(stream.name, stream_max_size, stream_segment_size, stream_persistence,
+                                    stream_flush_on_write)
+        if isinstance(self.__metricsSink, StreamSink) and self.__metricsSink.Definition().name not in existing_streams:
+            self.__client.create_message_stream(self.__metricsSink.Definition())
+
+        if self.__spool is not None:
+            # the files of the artifacts left in the spool are not queued again. The artifacts that are not queued
+            # in the stream (not resumed from the ledger) are appended again.
+            for artifact, manifest in self.__spool.Artifacts():
+                self.__filesProcessed.update(manifest.members)
+                if artifact not in self.__filesProcessed:
+                    self.__artifactsPending.add(artifact)
+
+    def __resetStream(self, stream_name, status_stream_name):
         # Try deleting the stream and the status stream (if they exist) so that we have a fresh start
         # The impact of deleting the streams on startup is that:
         #   - Files might have been queued and their transfer will be cancelled. This is not a problem, the 
@@ -68,160 +267,888 @@ class DirectoryUploader:
         #   - Acknoledgment of file transfert will be missed. The file in question will be transferred again.
 
         try:
-            self.__client.delete_message_stream(stream_name=self.__status_stream_name)
+            self.__client.delete_message_stream(stream_name=status_stream_name)
         except ResourceNotFoundException:
             pass
 
         # Try deleting the stream (if it exists) so that we have a fresh start
         try:
-            self.__client.delete_message_stream(stream_name=self.__stream_name)
+            self.__client.delete_message_stream(stream_name=stream_name)
         except ResourceNotFoundException:
             pass
 
-        exports = ExportDefinition(
-            s3_task_executor=[
-                S3ExportTaskExecutorConfig(
-                    identifier="S3TaskExecutor" + self.__stream_name,  # Required
-                    # Optional. Add an export status stream to add statuses for all S3 upload tasks.
-                    status_config=StatusConfig(
-                        status_level=StatusLevel.INFO,  # Default is INFO level statuses.
-                        # Status Stream should be created before specifying in S3 Export Config.
-                        status_stream_name=self.__status_stream_name,
-                    ),
+        if self.__ledger is not None:
+            self.__ledger.ForgetStream(stream_name)
+            self.__ledger.Commit()
+
+    def __updateStream(self, name, max_size, segment_size, persistence, flush_on_write):
+        try:
+            definition = self.__client.describe_message_stream(name).definition
+            changes = ExportStream.Changes(definition, max_size, segment_size, persistence, flush_on_write)
+            if len(changes) == 0:
+                return
+            self.__logger.info(f"Updating the settings of stream {name}: {', '.join(sorted(changes))}")
+            for key, value in changes.items():
+                setattr(definition, key, value)
+            self.__client.update_message_stream(definition)
+        except StreamManagerException:
+            self.__logger.warning(f"Unable to update the settings of stream {name}, it keeps the ones it was created with",
+                                  exc_info=True)
+
+    def __resume(self, resumed_streams):
+        # Rebuild the state from the ledger. Files that are still queued or in progress in the existing streams are
+        # considered processed so that they are not queued again.
+        if self.__ledger is None:
+            return
+        streams = {stream.name: stream for stream in self.__streams if stream.name in resumed_streams}
+        for stream in self.__streams:
+            if stream.name not in streams:
+                self.__ledger.SetStatusSequenceNumber(stream.name, 0)
+        for entry in self.__ledger.Entries():
+            if entry.stream not in streams:
+                # queued in a stream that is no longer used (e.g. the bucket changed), the file will be queued again
+                self.__ledger.Forget(entry.path)
+            elif entry.state == SUCCEEDED:
+                # the file was uploaded but the component stopped before it could be deleted
+                self.__removeUploadedFile(entry.path)
+                self.__ledger.Forget(entry.path)
+            elif os.path.exists(entry.path):
+                self.__filesProcessed.add(entry.path)
+                self.__scheduler.Started(entry.path)
+                streams[entry.stream].load += 1
+            else:
+                self.__ledger.Forget(entry.path)
+        self.__ledger.Commit()
+        for stream in streams.values():
+            self.__logger.info(f"Resuming stream {stream.name} at status sequence number {stream.status_next_seq}" +
+                               f" with {stream.load} files queued")
+
+    def __removeUploadedFile(self, path, action:PostUploadAction=None):
+        # for an artifact of the spool, the action applies to the files it was built from, and the artifact is
+        # removed. A split file is handled along with its last part. Returns the files the action applied to.
+        action = action or self.__postUploadAction
+        manifest = None if self.__spool is None else self.__spool.Manifest(path)
+        members = [path] if manifest is None else manifest.members
+        if manifest is not None and self.__spool.Shared(path):
+            members = []
+        for file in members:
+            # on linux removing a file that is in use will sucseed. On windows it will generate
+            # an exception
+            try:
+                action.Apply(file)
+            except FileNotFoundError:
+                # the file was already removed, this happens when statuses are processed again after a restart
+                self.__logger.warning(f"Uploaded file {file} no longer exists")
+            for sidecar in self.__readiness.Sidecars(file):
+                try:
+                    os.remove(sidecar)
+                except FileNotFoundError:
+                    pass
+        if manifest is not None:
+            self.__spool.Release(path)
+        return members
+
+    async def __queueFile(self, file, source:UploadSource=None):
+        # the file is marked as processed before it is appended, so that it isn't queued twice while the append is
+        # in flight
+        self.__markProcessed(file)
+        original = file
+        queued = None
+        try:
+            # Append a S3 Task definition and print the sequence number
+            head, tail = ntpath.split(file)
+            source = source or self.__sourceOf(file)
+            bucket = source.bucket_name
+            
+            # Create folder structure in the cloud
+            key = source.Key(file)
+
+            # artifacts of the spool are uploaded where their manifest says
+            manifest = None if self.__spool is None else self.__spool.Manifest(file)
+            if manifest is not None:
+                bucket = manifest.bucket
+                key = manifest.key
+            elif self.__compressor is not None:
+                key = key + self.__compressor.Extension()
+                file = await self.__compressFile(file, bucket, key)
+            
+            # Print for logging
+            self.__logger.debug("TAIL VALUE: " + tail)
+            self.__logger.debug("FINAL KEY VALUE: " + key)
+            
+            s3_export_task_definition = S3ExportTaskDefinition(input_url="file://"+file,
+                                                            bucket=bucket,
+                                                            key=key)
+            payload = None
+            try:
+                payload = Util.validate_and_serialize_to_json_bytes(s3_export_task_definition)
+            except ValidationException:
+                # if validation failed, file will not be sent to S3 and we will not retry unitil
+                # component is re-started
+                self.__logger.warning(f'Validation failed for file: {file},' +
+                                    f' buckt: {bucket}, key: {key}. File not sent to S3')
+
+            if(payload != None):
+                # the stream is charged before the append, so that concurrent appends go to different streams
+                stream = self.__pickStream(file)
+                stream.load += 1
+                start = time.monotonic()
+                try:
+                    sequence_number = await self.__async_client.append_message(stream.name, payload)
+                except Exception:
+                    stream.load -= 1
+                    self.__metrics.Count("append_failures")
+                    raise
+                now = time.monotonic()
+                self.__metrics.Observe("append_latency_seconds", now - start)
+                self.__metrics.Count("appends")
+                self.__appended[file] = (now, self.__fileSize(file, source))
+                # the task counts against max_in_flight_tasks until its upload succeeds or fails
+                queued = file
+                self.__scheduler.Started(file)
+                self.__logger.debug(
+                    "Successfully appended S3 Task Definition to stream with sequence number %d",
+                    sequence_number,
                 )
-            ]
-        )
-
-        # Create the Status Stream.
-        self.__client.create_message_stream(
-            MessageStreamDefinition(name=self.__status_stream_name,
-                                    strategy_on_full=StrategyOnFull.OverwriteOldestData)
-        )
-
-        # Create the message stream with the S3 Export definition.
-        self.__client.create_message_stream(
-            MessageStreamDefinition(name=self.__stream_name,
-                                    strategy_on_full=StrategyOnFull.OverwriteOldestData,
-                                    export_definition=exports
-            )
-        )
+                if self.__ledger is not None:
+                    self.__ledger.Queued(file, stream.name, sequence_number)
+        except Exception:
+            self.__logger.exception(f"Exception while queuing file {file}")
+            self.__retryFile(file)
+        finally:
+            if queued != original:
+                # the room taken by the file is now held by its compressed copy, or nothing was queued
+                self.__finished(original)
+
+    def __pickStream(self, file):
+        if len(self.__streams) == 1:
+            return self.__streams[0]
+        if self.__shard_policy == HASH:
+            return self.__streams[ExportStream.Shard(file, len(self.__streams))]
+        return min(self.__streams, key=lambda stream: stream.load)
+
+    async def __compressFile(self, file, bucket, key):
+        # returns the path of the compressed copy in the spool, the original file is deleted along with it once
+        # it has been uploaded
+        name = f"{uuid.uuid4().hex[:8]}-{os.path.basename(file)}{self.__compressor.Extension()}"
+        size = await self.__compressor.Compress(file, self.__spool.TemporaryPath(name))
+        self.__logger.debug(f"Compressed {file} to {size} bytes")
+        artifact = await asyncio.to_thread(self.__spool.Publish, name, bucket, key, [file])
+        self.__markProcessed(artifact)
+        return artifact
+
+    def __owns(self, source:UploadSource, file):
+        # a file that also matches a source with a higher priority is left to that source
+        return file not in self.__filesProcessed and self.__sourceOf(file) is source and \
+            not self.__readiness.IsSidecar(file)
+
+    def __schedule(self, files, source:UploadSource):
+        # the files leave source.pending once scheduled, they come back to it if their upload has to be retried
+        for file in files:
+            source.pending.discard(file)
+            info = source.index.Get(file)
+            if info is not None:
+                size, mtime = info.size, info.mtime
+            else:
+                # reported by the watcher before the next scan
+                try:
+                    st = os.stat(file)
+                except FileNotFoundError:
+                    continue
+                size, mtime = st.st_size, st.st_mtime_ns
+            self.__scheduler.Push(file, source, size, mtime, source.priority)
+
+    def __finished(self, file):
+        # room was freed in the export stream, let the dispatcher append the next files
+        if self.__scheduler.Finished(file):
+            self.__dispatchReady.set()
+
+    async def __dispatchFiles(self):
+        # appends the scheduled files, in the order of the policy, as long as there is room in the export stream
+        await self.__queueFiles(self.__scheduler.Take())
+
+    async def __dispatch(self):
+        self.__logger.info("==== __dispatch start ====")
+        while True:
+            await self.__dispatchReady.wait()
+            self.__dispatchReady.clear()
+            try:
+                await self.__dispatchFiles()
+            except Exception:
+                self.__logger.exception("Exception while dispatching files")
+
+    async def __queueFiles(self, files):
+        # files is a list of (file, source). Appends are pipelined: up to max_concurrent_requests task definitions
+        # are in flight at the same time
+        in_flight = set()
+
+        async def submit(coroutine):
+            nonlocal in_flight
+            if len(in_flight) >= self.__max_concurrent_requests:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            in_flight.add(asyncio.create_task(coroutine))
+
+        try:
+            for file, source in files:
+                if file in self.__filesProcessed:
+                    # queued by the watcher in the meantime
+                    self.__finished(file)
+                    continue
+                if self.__dedup is not None and source is not None:
+                    # the artifacts of the spool (source is None) are built from files that were already hashed
+                    await submit(self.__dedupFile(file, source))
+                    continue
+                upload = self.__upload(file, source)
+                if upload is not None:
+                    await submit(upload)
+            if len(in_flight) > 0:
+                await asyncio.wait(in_flight)
+        finally:
+            self.__commit()
+
+    def __upload(self, file, source:UploadSource):
+        # returns the coroutine that appends the file, its parts or the bundle it completes. Returns None when the
+        # file was added to a bundle that isn't full yet.
+        if source is not None and self.__splitter is not None and not self.__spool.Owns(file):
+            size = self.__fileSize(file, source)
+            if size is not None and self.__splitter.Eligible(size):
+                # the room taken by the file is held by its parts once they are appended
+                self.__markProcessed(file)
+                self.__finished(file)
+                return self.__splitFile(file, source)
+        if source is not None and source.bundler is not None and not self.__spool.Owns(file):
+            size = self.__fileSize(file, source)
+            if size is not None and source.bundler.Eligible(size):
+                # the file takes room in the export stream once its bundle is appended
+                self.__markProcessed(file)
+                self.__finished(file)
+                if source.bundler.Add(file, size):
+                    return self.__flushBundle(source, source.bundler.Take())
+                return None
+        return self.__queueFile(file, source)
+
+    async def __dedupFile(self, file, source:UploadSource):
+        # the file is marked as processed while it is hashed, so that it isn't queued twice
+        self.__markProcessed(file)
+        prefix = source.bucket_name + "/" + source.bucket_path
+        try:
+            digest = await self.__dedup.Digest(file)
+        except Exception:
+            self.__logger.exception(f"Exception while hashing file {file}")
+            self.__finished(file)
+            self.__retryFile(file)
+            return
+        if not self.__dedup.Contains(prefix, digest):
+            self.__digests[file] = (prefix, digest)
+            upload = self.__upload(file, source)
+            if upload is not None:
+                await upload
+            return
+        self.__logger.info(f"File {file} has the same content as a file already uploaded to {prefix}, not uploading it")
+        self.__metrics.Count("duplicates")
+        self.__finished(file)
+        if self.__dedup_mode == "delete":
+            try:
+                # a duplicate is deleted, whatever the post-upload action
+                await asyncio.to_thread(self.__removeUploadedFile, file, self.__deleteAction)
+                self.__dedup.Forget(file)
+            except OSError:
+                self.__logger.exception(f"Unable to remove duplicate file {file}")
+        else:
+            # the file stays processed, it is left in the folder and only hashed again if it changes
+            self.__skipped.add(file)
+
+    def __commit(self):
+        if self.__ledger is not None:
+            self.__ledger.Commit()
+        if self.__dedup is not None:
+            self.__dedup.Commit()
+
+    def __sourceOf(self, file):
+        # sources are sorted by priority, the first one that matches wins
+        for source in self.__sources:
+            if source.Matches(file):
+                return source
+        return self.__sources[0]
+
+    def __fileSize(self, file, source:UploadSource):
+        info = None if source is None else source.index.Get(file)
+        if info is not None:
+            return info.size
+        try:
+            return os.stat(file).st_size
+        except FileNotFoundError:
+            return None
+
+    async def __splitFile(self, file, source:UploadSource):
+        try:
+            # the file is read and the parts are written on a worker thread
+            parts = await asyncio.to_thread(self.__writeParts, source, file)
+        except Exception:
+            self.__logger.exception(f"Exception while splitting {file}")
+            self.__retryFile(file)
+            return
+        if parts is None:
+            # no record boundary to cut the file at
+            await self.__queueFile(file, source)
+            return
+        self.__metrics.Count("split_files")
+        self.__metrics.Count("split_parts", len(parts))
+        # each part is appended as its own task, a failed part is appended again on its own. The parts go through
+        # the scheduler like any file, so that a large file doesn't take more than max_in_flight_tasks tasks. They
+        # keep the place of the file in the schedule.
+        info = source.index.Get(file)
+        mtime = 0 if info is None else info.mtime
+        for part, size in parts:
+            self.__scheduler.Push(part, None, size, mtime, source.priority)
+        await self.__dispatchFiles()
+
+    def __writeParts(self, source:UploadSource, file):
+        ranges = self.__splitter.Ranges(file)
+        if len(ranges) == 1:
+            return None
+        name = self.__splitter.NewName(file)
+        key = source.Key(file)
+        names = [FileSplitter.PartName(name, index) for index in range(len(ranges))]
+        try:
+            for part, (start, end) in zip(names, ranges):
+                self.__splitter.Write(file, self.__spool.TemporaryPath(part), start, end)
+        except Exception:
+            for part in names:
+                try:
+                    os.remove(self.__spool.TemporaryPath(part))
+                except FileNotFoundError:
+                    pass
+            raise
+        self.__logger.info(f"Split {file} into {len(names)} parts")
+        parts = [(part, FileSplitter.PartName(key, index)) for index, part in enumerate(names)]
+        paths = self.__spool.PublishParts(name, parts, source.bucket_name, [file])
+        # the path and the size of each part
+        return [(path, end - start) for path, (start, end) in zip(paths, ranges)]
+
+    async def __flushBundle(self, source:UploadSource, members):
+        name = source.bundler.NewName()
+        key = source.Key(name)
+        try:
+            # the archive is written on a worker thread, streaming the content of the files
+            artifact = await asyncio.to_thread(self.__writeBundle, source, name, key, members)
+        except Exception:
+            self.__logger.exception(f"Exception while bundling {len(members)} files into {name}")
+            for member in members:
+                self.__retryFile(member)
+            return
+        if artifact is not None:
+            await self.__queueFile(artifact)
+
+    def __writeBundle(self, source:UploadSource, name, key, members):
+        path = self.__spool.TemporaryPath(name)
+        written = source.bundler.Write(path, members)
+        if len(written) == 0:
+            # all the files disappeared before they could be bundled
+            os.remove(path)
+            return None
+        self.__logger.info(f"Bundled {len(written)} files into {name}")
+        return self.__spool.Publish(name, source.bucket_name, key, written)
+
+    async def __flushBundles(self):
+        # flush the current bundle once it is bundle_max_age seconds old, even if no new file arrives
+        self.__logger.info("==== __flushBundles start ====")
+        while True:
+            await asyncio.sleep(1)
+            for source in self.__sources:
+                if source.bundler.Due():
+                    try:
+                        await self.__flushBundle(source, source.bundler.Take())
+                    finally:
+                        if self.__ledger is not None:
+                            self.__ledger.Commit()
+
+    def __markProcessed(self, file):
+        self.__filesProcessed.add(file)
+        for source in self.__sources:
+            source.pending.discard(file)
+        self.__artifactsPending.discard(file)
+
+    def __released(self, members):
+        # the files of a bundle or of a split file stay processed until the post-upload action applied to them.
+        # Truncated files are left in the folder, the data appended to them once truncated is uploaded again.
+        self.__filesProcessed.difference_update(members)
+        if self.__postUploadAction.KeepsFiles():
+            for file in members:
+                source = self.__sourceOf(file)
+                if self.__owns(source, file) and file in source.index:
+                    source.pending.add(file)
+
+    def __retryFile(self, file):
+        # the file will be queued again by the next scan, unless it no longer exists
+        self.__filesProcessed.discard(file)
+        if self.__spool is not None and self.__spool.Owns(file):
+            self.__artifactsPending.add(file)
+            return
+        for source in self.__sources:
+            if file in source.index:
+                source.pending.add(file)
+                return
+
+    async def __waitForRescan(self, source:UploadSource):
+        # sleep until the next scan is due, or until the watcher asks for an early reconciliation
+        try:
+            await asyncio.wait_for(source.rescan.wait(), source.scan_interval)
+        except asyncio.TimeoutError:
+            pass
+        source.rescan.clear()
 
     async def __scan(self, under_test=False):
-        self.__logger.info("==== __scan  start ====")
+        # each source is scanned by its own task, so that a large folder doesn't delay the scans of the others
+        await asyncio.gather(*(self.__scanSource(source, under_test) for source in self.__sources))
+
+    async def __scanSource(self, source:UploadSource, under_test=False):
+        self.__logger.info(f"==== __scan {source.pathname} start ====")
+        # the scan is retried with an exponential backoff while the folder can't be scanned
+        backoff = Backoff(1, 60)
         keep_looping = True
         while keep_looping:
             try:
-                base_dir = os.path.dirname(self.__pathname)
+                base_dir = source.directory
                 if ntpath.isdir(base_dir) and os.access(base_dir, os.R_OK|os.W_OK|os.X_OK):
-                    self.__logger.info(f"Scanning folder {self.__pathname} for change ====")
-                    files = glob.glob(self.__pathname)
-                    files.sort(key=os.path.getmtime)
-                    if(len(files) > 0):
-                        #remove most recent file as it is considerred the active file
-                        self.__logger.info(f'The current active file is : {files.pop()}')
-                    fileset = set(files) - self.__filesProcessed
+                    self.__logger.debug(f"Scanning folder {source.pathname} for change ====")
+                    start = time.monotonic()
+                    # listing a large folder takes a while, it is done outside of the event loop
+                    changes = await asyncio.to_thread(source.index.Refresh)
+
+                    # only the differences with the previous scan are applied, so that a pass doesn't cost more
+                    # than the number of files that changed
+                    self.__filesProcessed.difference_update(changes.removed)
+                    source.pending.difference_update(changes.removed)
+                    for file in changes.removed:
+                        self.__scheduler.Discard(file)
+                        self.__readiness.Forget(file)
+                        self.__digests.pop(file, None)
+                        if self.__dedup is not None:
+                            self.__dedup.Forget(file)
+                        self.__skipped.discard(file)
+                    # a skipped duplicate whose content was replaced (new inode or rewritten in place) is hashed again
+                    replaced = [file for file in changes.added + changes.changed if file in self.__skipped]
+                    for file in replaced:
+                        self.__skipped.discard(file)
+                        self.__filesProcessed.discard(file)
+                        self.__dedup.Forget(file)
+                    source.pending.update(file for file in changes.added if self.__owns(source, file))
+                    source.pending.update(file for file in replaced if self.__owns(source, file))
+                    # files written to again once uploaded, e.g. appended to after a truncation
+                    source.pending.update(file for file in changes.changed if source.index.Get(file).size > 0 and
+                                          self.__owns(source, file) and not self.__scheduler.Scheduled(file))
+
+                    # the most recent file is considerred the active file
+                    active = None
+                    if self.__readiness.HoldsNewest():
+                        active = source.index.Newest()
+                    if active is not None:
+                        self.__logger.debug(f'The current active file is : {active}')
+                    # only the files that are still waiting to be ready are checked again, the scheduled ones have
+                    # left source.pending
+                    candidates = [file for file in source.pending if file != active]
+                    fileset = await asyncio.to_thread(self.__readyFiles, source, candidates)
+                    # files might have been queued, uploaded and removed by the dispatcher in the meantime
+                    fileset = [file for file in fileset if file in source.pending]
                     
                     if(len(fileset) == 0):
-                        self.__logger.info('No new files to transfer')
+                        self.__logger.debug('No new files to transfer')
                     
-                    for file in fileset:
-
-                        # Append a S3 Task definition and print the sequence number
-                        head, tail = ntpath.split(file)
-                        
-                        # Create folder structure in the cloud
-                        key = self.__bucket_path+"/"+tail
-                        
-                        # Print for logging
-                        self.__logger.debug("TAIL VALUE: " + tail)
-                        self.__logger.debug("FINAL KEY VALUE: " + key)
-                        
-                        s3_export_task_definition = S3ExportTaskDefinition(input_url="file://"+file,
-                                                                        bucket=self.__bucket_name,
-                                                                        key=key)
-                        payload = None
-                        try:
-                            payload = Util.validate_and_serialize_to_json_bytes(s3_export_task_definition)
-                        except ValidationException:
-                            # if validation failed, file will not be sent to S3 and we will not retry unitil
-                            # component is re-started
-                            self.__logger.warning(f'Validation failed for file: {file},' +
-                                                f' buckt: {self.__bucket_name}, key: {tail}. File not sent to S3')
-
-                        if(payload != None):
-                            self.__logger.info(
-                                "Successfully appended S3 Task Definition to stream with sequence number %d",
-                                self.__client.append_message(self.__stream_name, payload),
-                            )
-                    # we could compute the new self.__filesProcessed as self.__filesProcessed.union(fileset)
-                    # but that would mean an ever growing set
-                    # instead we compute it as set(files) which is the list of files at the begining of this iteration
-                    # minus the current active file
-                    self.__filesProcessed =  set(files)
-                    await asyncio.sleep(self.__interval)
+                    self.__schedule(fileset, source)
+                    # artifacts of the spool that failed to upload (or were left by a restart) are appended again,
+                    # before the new files
+                    for artifact in self.__artifactsPending:
+                        self.__scheduler.Push(artifact, None, 0, 0, self.__sources[0].priority)
+                    await self.__dispatchFiles()
+                    self.__metrics.Observe("scan_duration_seconds", time.monotonic() - start)
+                    self.__metrics.Count("scans")
+                    self.__metrics.Count("files_found", len(changes.added))
+                    backoff.Reset()
+                    await self.__waitForRescan(source)
                 else:
                     self.__logger.error(f"The path {base_dir} is not a directory, does not exists or greengrass user doesn't have sufficient (rwx) access.")
-                    #let wait 1 minute before retrying
                     if not under_test:
-                        await asyncio.sleep(60)
+                        await asyncio.sleep(backoff.Next())
             except Exception:
                 self.__logger.exception("Exception while scanning folder")
+                if not under_test:
+                    await asyncio.sleep(backoff.Next())
             keep_looping= not under_test
 
 
+    def __readyFiles(self, source:UploadSource, files):
+        # the checks might open the files, they run on a worker thread
+        ready = []
+        for file in files:
+            info = source.index.Get(file)
+            if info is None or (info.size == 0 and self.__postUploadAction.KeepsFiles()):
+                # files truncated after their upload are left in the folder, they are not uploaded again
+                continue
+            if self.__readiness.Ready(file, info.size, info.mtime):
+                ready.append(file)
+        return ready
+
+    async def __watch(self, source:UploadSource=None):
+        source = source or self.__sources[0]
+        self.__logger.info(f"==== __watch {source.pathname} start ====")
+        base_dir = source.directory
+        backoff = Backoff(1, 60)
+        while True:
+            watcher = DirectoryWatcher(base_dir, source.pattern, self.__logger)
+            try:
+                watcher.Start()
+                source.scan_interval = self.__reconcile_interval
+                # files written while the folder was not watched are picked up by a reconciliation scan
+                source.rescan.set()
+                backoff.Reset()
+                while not watcher.IsLost():
+                    files = []
+                    for file in await watcher.GetBatch(self.__max_concurrent_requests):
+                        if file is None:
+                            # events were lost, let the reconciliation scan catch up
+                            source.rescan.set()
+                        elif file not in self.__filesProcessed and self.__sourceOf(file) is source and \
+                                not self.__readiness.IsSidecar(file) and os.path.isfile(file):
+                            # the file was closed or moved into place, it is complete unless the readiness check
+                            # says otherwise. In that case it is left to the reconciliation scan.
+                            if self.__readiness.Checked(file):
+                                files.append(file)
+                    self.__schedule(files, source)
+                    await self.__dispatchFiles()
+            except OSError:
+                # fall back to polling until the folder can be watched again
+                self.__logger.exception(f"Unable to watch folder {base_dir}, falling back to polling every {self.__interval} seconds")
+                source.scan_interval = self.__interval
+                source.rescan.set()
+                await asyncio.sleep(backoff.Next())
+            finally:
+                watcher.Close()
+
     async def __processStatus(self,under_test=False):
-        # Read the statuses from the export status stream
+        # Read the statuses from the export status streams
         self.__logger.info("==== __processStatus start ====")
-        next_seq = 0
+        backoff = self.__status_min_backoff
+        keep_looping = True
+        while keep_looping:
+            try:
+                # the status streams are read at the same time, the reads run on the pool of the async client
+                results = await asyncio.gather(*(self.__readStatus(stream) for stream in self.__streams),
+                                               return_exceptions=True)
+                errors = [result for result in results if isinstance(result, Exception)]
+                for error in errors:
+                    self.__logger.error("Exception while processing status", exc_info=error)
+                if len(errors) > 0:
+                    backoff = self.__status_max_backoff
+                elif any(results):
+                    # there might be more statuses waiting, read the next batch right away
+                    backoff = 0
+                else:
+                    backoff = self.__nextBackoff(backoff)
+            finally:
+                self.__commit()
+            if under_test:
+                await self.__postUpload(under_test=True)
+            self.__logger.debug(f"Sleeping for {backoff} seconds")
+            await asyncio.sleep(backoff)
+            keep_looping= not under_test
+
+    async def __readStatus(self, stream:ExportStream):
+        # returns the number of statuses read from the status stream of an export stream
+        self.__logger.debug(f"Reading messages from status stream {stream.status_stream_name}")
+        try:
+            # read_timeout_millis=0 returns immediately, the stream is drained batch after batch while it has
+            # data and we only back off when it is empty
+            messages_list = await self.__async_client.read_messages( stream.status_stream_name,
+                                                         ReadMessagesOptions(desired_start_sequence_number=stream.status_next_seq,
+                                                                            min_message_count=1,
+                                                                            max_message_count=self.__status_batch_size,
+                                                                            read_timeout_millis=0))
+        except NotEnoughMessagesException:
+            # ingore this exception, it doesn't mean something went wrong. The stream is empty.
+            return 0
+        try:
+            for message in messages_list:
+                self.__processStatusMessage(stream, message)
+                stream.status_next_seq = message.sequence_number + 1
+        finally:
+            if self.__ledger is not None:
+                self.__ledger.SetStatusSequenceNumber(stream.name, stream.status_next_seq)
+        return len(messages_list)
+
+    def __processStatusMessage(self, stream:ExportStream, message):
+        # Deserialize the status message first.
+        status_message = Util.deserialize_json_bytes_to_obj(message.payload, StatusMessage)
+        file_url = status_message.status_context.s3_export_task_definition.input_url
+        file = file_url.partition("file://")[2]
+
+        # Check the status of the status message. If the status is "Success",
+        # the file was successfully uploaded to S3.
+        # If the status was either "Failure" or "Cancelled", the server was unable to upload
+        # the file to S3. We will print the message for why the upload to S3 failed from the
+        # status message. If the status was "InProgress", the status indicates that the server
+        # has started uploading the S3 task.
+        if status_message.status == Status.Success:
+            self.__logger.info(f'Successfully uploaded file at path {file_url} to S3.')
+            stream.load = max(stream.load - 1, 0)
+            self.__finished(file)
+            self.__metrics.Count("uploads")
+            appended = self.__appended.pop(file, None)
+            if appended is not None:
+                latency = time.monotonic() - appended[0]
+                self.__logger.debug(f"Uploaded {file} {latency:.3f} seconds after it was queued")
+                self.__metrics.Observe("upload_latency_seconds", latency)
+                self.__metrics.Count("uploaded_bytes", appended[1] or 0)
+            if self.__ledger is not None:
+                # if the file can't be removed, the ledger makes sure it won't be uploaded again
+                self.__ledger.Succeeded(file)
+            if self.__dedup is not None:
+                self.__recordDigests(file)
+            # the post-upload action is applied by __postUpload, outside of the event loop
+            self.__uploaded.put_nowait(file)
+        elif status_message.status == Status.InProgress:
+            self.__logger.debug('File upload is in Progress.')
+            if self.__ledger is not None:
+                self.__ledger.InProgress(file)
+        elif status_message.status == Status.Failure or status_message.status == Status.Canceled:
+            self.__logger.error(
+                f'Unable to upload file at path {file_url} to S3. Message: {status_message.message}')
+            
+            # remove the file from the list of files already processed and let it be tried again.
+            stream.load = max(stream.load - 1, 0)
+            self.__metrics.Count("upload_failures" if status_message.status == Status.Failure else "upload_cancels")
+            self.__appended.pop(file, None)
+            # the file is hashed again when it is queued again, an artifact keeps the digests of its files
+            self.__digests.pop(file, None)
+            self.__finished(file)
+            self.__retryFile(file)
+            if self.__ledger is not None:
+                self.__ledger.Forget(file)
+
+    def __recordDigests(self, file):
+        # the content of the file, or of the files an artifact was built from, is now in the bucket
+        manifest = None if self.__spool is None else self.__spool.Manifest(file)
+        for member in ([file] if manifest is None else manifest.members):
+            digest = self.__digests.pop(member, None)
+            if digest is not None:
+                self.__dedup.Add(*digest)
+            self.__dedup.Forget(member)
+
+    async def __reportMetrics(self, under_test=False):
+        # publish the metrics every metrics_interval seconds
+        self.__logger.info("==== __reportMetrics start ====")
+        keep_looping = True
+        while keep_looping:
+            if not under_test:
+                await asyncio.sleep(self.__metrics_interval)
+            try:
+                self.__metrics.Gauge("files_seen", sum(len(source.index) for source in self.__sources))
+                self.__metrics.Gauge("pending_files", sum(len(source.pending) for source in self.__sources))
+                self.__metrics.Gauge("scheduled_files", len(self.__scheduler))
+                self.__metrics.Gauge("in_flight_tasks", self.__scheduler.InFlight())
+                self.__metrics.Gauge("pending_post_upload_actions", self.__uploaded.qsize())
+                self.__metrics.Rate("uploaded_bytes_per_second", "uploaded_bytes")
+                self.__metrics.Gauge("status_lag", await self.__statusLag())
+                if self.__metricsSink is not None:
+                    await self.__metricsSink.Publish(self.__metrics)
+                if self.__profiler is not None:
+                    await asyncio.to_thread(self.__profiler.Write)
+            except Exception:
+                self.__logger.exception("Exception while reporting metrics")
+            keep_looping= not under_test
+
+    async def __statusLag(self):
+        # number of statuses written by stream manager that haven't been processed yet
+        lag = 0
+        for stream in self.__streams:
+            info = await self.__async_client.describe_message_stream(stream.status_stream_name)
+            newest = info.storage_status.newest_sequence_number
+            if newest is not None:
+                lag += max(newest + 1 - stream.status_next_seq, 0)
+        return lag
+
+    def __nextBackoff(self, backoff):
+        # exponential backoff between status_min_backoff and status_max_backoff while the status stream is empty
+        return min(max(backoff * 2, self.__status_min_backoff), self.__status_max_backoff)
+
+    async def __postUpload(self, under_test=False):
+        # Apply the post-upload action to the uploaded files in batches, spread over the post-upload workers
+        self.__logger.info("==== __postUpload start ====")
+        loop = asyncio.get_running_loop()
         keep_looping = True
         while keep_looping:
+            if under_test and self.__uploaded.empty():
+                return
+            batch = [await self.__uploaded.get()]
+            while len(batch) < self.__status_batch_size and not self.__uploaded.empty():
+                batch.append(self.__uploaded.get_nowait())
             try:
-                self.__logger.info("Reading messages from status stream")
-                messages_list = self.__client.read_messages( self.__status_stream_name,
-                                                             ReadMessagesOptions(desired_start_sequence_number=next_seq,
-                                                                                min_message_count=1,
-                                                                                max_message_count=5,
-                                                                                read_timeout_millis=1000))
-                for message in messages_list:
-                    # Deserialize the status message first.
-                    status_message = Util.deserialize_json_bytes_to_obj(message.payload, StatusMessage)
-                    file_url = status_message.status_context.s3_export_task_definition.input_url
-
-                    # Check the status of the status message. If the status is "Success",
-                    # the file was successfully uploaded to S3.
-                    # If the status was either "Failure" or "Cancelled", the server was unable to upload
-                    # the file to S3. We will print the message for why the upload to S3 failed from the
-                    # status message. If the status was "InProgress", the status indicates that the server
-                    # has started uploading the S3 task.
-                    if status_message.status == Status.Success:
-                        self.__logger.info(f'Successfully uploaded file at path {file_url} to S3.')
-                        p = urlparse(file_url)
-                        final_path = os.path.abspath(os.path.join(p.netloc, p.path))
-                        # on linux removing a file that is in use will sucseed. On windows it will generate
-                        # an exception
-                        os.remove(final_path)
-                    elif status_message.status == Status.InProgress:
-                        self.__logger.info('File upload is in Progress.')
-                    elif status_message.status == Status.Failure or status_message.status == Status.Canceled:
-                        self.__logger.error(
-                            f'Unable to upload file at path {file_url} to S3. Message: {status_message.message}')
-                        
-                        # remove the file from the list of files already processed and let it be tried again.
-                        self.__filesProcessed.remove(file_url.partition("file://")[2])
-
-                    next_seq = message.sequence_number + 1
-            except NotEnoughMessagesException:
-                # ingore this exception, it doesn't mean something went wrong.
-                pass
+                # the parts of a split file go to the same worker, so that the file is handled with the last one
+                chunks = [[] for _ in range(self.__post_upload_workers)]
+                for file in batch:
+                    manifest = None if self.__spool is None else self.__spool.Manifest(file)
+                    group = file if manifest is None or manifest.group is None else manifest.group
+                    chunks[hash(group) % len(chunks)].append(file)
+                chunks = [chunk for chunk in chunks if len(chunk) > 0]
+                results = await asyncio.gather(*(loop.run_in_executor(self.__postUploadPool, self.__removeUploadedFiles, chunk)
+                                                 for chunk in chunks))
+                for chunk, removed in zip(chunks, results):
+                    for file, members in zip(chunk, removed):
+                        if members is not None:
+                            self.__filesProcessed.discard(file)
+                            self.__released(members)
+                            if self.__ledger is not None:
+                                self.__ledger.Forget(file)
+                if self.__ledger is not None:
+                    self.__ledger.Commit()
             except Exception:
-                self.__logger.exception("Exception while processing status")
-            self.__logger.info(f"Sleeping for {self.__status_interval} seconds")
-            await asyncio.sleep(self.__status_interval)
+                self.__logger.exception("Exception while applying the post-upload action")
             keep_looping= not under_test
 
+    def __removeUploadedFiles(self, paths):
+        # returns, for each path, the files the action applied to, or None if it failed
+        removed = []
+        for path in paths:
+            try:
+                removed.append(self.__removeUploadedFile(os.path.abspath(path)))
+            except OSError:
+                # the ledger still has the file as uploaded, the action will be tried again on restart
+                self.__logger.exception(f"Unable to apply the post-upload action to {path}")
+                removed.append(None)
+        return removed
+
+    def Reconfigure(self, pathname=None, bucket_name=None, bucket_path=None, interval=None, sources=None,
+                    log_level=None):
+        """ Applies a new configuration while the uploader runs. The arguments left to None are not changed. The
+        streams, the uploads in flight and the state of the sources whose pathname didn't change are kept."""
+        main = self.__mainSource
+        wanted = UploadSource(main.pathname if pathname is None else pathname,
+                              main.bucket_name if bucket_name is None else bucket_name,
+                              main.bucket_path if bucket_path is None else bucket_path)
+        others = {source.pathname: source for source in self.__sources if source is not main}
+        if sources is None:
+            sources = list(others.values())
+
+        # a source that is still configured keeps its index, its pending files and its tasks
+        added = []
+        if wanted.pathname == main.pathname:
+            main.Update(wanted)
+        else:
+            main = wanted
+            added.append(main)
+        kept = [main]
+        for source in sources:
+            current = others.pop(source.pathname, None)
+            if current is None:
+                added.append(source)
+                kept.append(source)
+            else:
+                current.Update(source)
+                kept.append(current)
+        removed = list(others.values())
+        if main is not self.__mainSource:
+            removed.append(self.__mainSource)
+
+        priorities = [(source.pathname, source.priority) for source in self.__sources]
+        for source in removed:
+            self.__stopSource(source)
+        self.__mainSource = main
+        self.__sources = sorted(kept, key=lambda source: -source.priority)
+        if priorities != [(source.pathname, source.priority) for source in self.__sources]:
+            # the files of the folders already indexed might now belong to another source, the pending files of
+            # each source are picked again from its index
+            for source in self.__sources:
+                source.pending = set(file for file in source.index
+                                     if self.__owns(source, file) and not self.__scheduler.Scheduled(file))
+        if interval is not None and interval != self.__interval:
+            self.__interval = interval
+            self.__reconcile_interval = max(self.__reconcile_interval, interval)
+            for source in self.__sources:
+                source.scan_interval = interval if self.__scan_mode == "poll" else self.__reconcile_interval
+                # the current wait was computed with the previous interval
+                source.rescan.set()
+        for source in added:
+            source.scan_interval = self.__interval
+            if self.__bundle_format:
+                source.bundler = FileBundler(*self.__bundleSettings, self.__compressor)
+            if self.__running:
+                self.__startSource(source)
+        if log_level:
+            self.__logger.setLevel(log_level)
+        if len(added) > 0 or len(removed) > 0:
+            self.__logger.info(f"Reconfigured: {len(added)} sources added, {len(removed)} sources removed")
+        self.__dispatchReady.set()
+
+    def __startSource(self, source:UploadSource):
+        # each source is scanned by its own task, so that a large folder doesn't delay the scans of the others
+        tasks = [asyncio.create_task(self.__scanSource(source))]
+        if self.__scan_mode == "inotify":
+            tasks.append(asyncio.create_task(self.__watch(source)))
+        self.__sourceTasks[source] = tasks
+
+    def __stopSource(self, source:UploadSource):
+        for task in self.__sourceTasks.pop(source, []):
+            task.cancel()
+        self.__scheduler.DiscardSource(source)
+        if source.bundler is not None:
+            # the files of the bundle in progress are picked up again by the sources that still match them
+            self.__filesProcessed.difference_update(source.bundler.Take())
+
+    async def __followConfiguration(self):
+        self.__logger.info("==== __followConfiguration start ====")
+        # the configuration might have changed while the uploader was not running
+        configuration = await asyncio.to_thread(self.__configuration.Current)
+        while True:
+            try:
+                self.Reconfigure(**reconfigure_arguments(configuration))
+            except Exception:
+                self.__logger.exception("Unable to apply the configuration, keeping the current one")
+            previous = configuration
+            configuration = await self.__configuration.Next()
+            keys = restart_keys(previous, configuration)
+            if len(keys) > 0:
+                self.__logger.warning(f"{', '.join(keys)} changed, the new values are applied when the component restarts")
+
     async def Run(self):
-        tasks = [asyncio.create_task(self.__scan()),asyncio.create_task(self.__processStatus())]
-        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        tasks = [asyncio.create_task(self.__processStatus()),
+                 asyncio.create_task(self.__postUpload()),asyncio.create_task(self.__dispatch())]
+        if self.__bundle_format:
+            tasks.append(asyncio.create_task(self.__flushBundles()))
+        if self.__metricsSink is not None or self.__profiler is not None:
+            # Run is called again after a failure, the sink and the profiler are only started once
+            if self.__metricsSink is not None and not self.__started:
+                self.__metricsSink.Start()
+            if self.__profiler is not None and not self.__started:
+                self.__profiler.Start()
+            tasks.append(asyncio.create_task(self.__reportMetrics()))
+        if self.__configuration is not None:
+            self.__configuration.Start()
+            tasks.append(asyncio.create_task(self.__followConfiguration()))
+        self.__started = True
+        self.__running = True
+        for source in self.__sources:
+            self.__startSource(source)
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # the other tasks must not keep running once the uploader is stopped or closed
+            self.__running = False
+            for source in list(self.__sourceTasks):
+                tasks.extend(self.__sourceTasks.pop(source))
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     def Close(self):
-        self.__client.close()
+        if self.__metricsSink is not None:
+            self.__metricsSink.Close()
+        if self.__profiler is not None:
+            self.__profiler.Close()
+        self.__async_client.close()
+        self.__postUploadPool.shutdown(wait=False)
+        if self.__compressor is not None:
+            self.__compressor.Close()
+        if self.__ledger is not None:
+            self.__ledger.Close()
+        if self.__dedup is not None:
+            self.__dedup.Close()
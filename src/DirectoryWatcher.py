@@ -0,0 +1,132 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import fnmatch
+import os
+import struct
+import logging
+
+# inotify constants, see /usr/include/linux/inotify.h
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def match_name(name, pattern):
+    """ Returns True if a file name matches a glob pattern, following glob.glob rules for hidden files"""
+    # glob.glob does not return files starting with a dot unless the pattern explicitly starts with a dot
+    if name.startswith(".") and not pattern.startswith("."):
+        return False
+    return fnmatch.fnmatch(name, pattern)
+
+
+class DirectoryWatcher:
+    """ DirectoryWatcher uses Linux inotify to report files that have been closed after writing, or moved into a folder"""
+
+    def __init__(self, directory, pattern, logger:logging.Logger):
+        self.__directory = directory
+        self.__pattern = pattern
+        self.__logger = logger
+        self.__fd = -1
+        self.__loop = None
+        self.__queue = asyncio.Queue()
+        # Set when the watch was removed (folder deleted or unmounted) and needs to be re-established
+        self.__lost = False
+
+    def Start(self):
+        """ Starts watching the directory. Raises OSError if inotify is not available or the directory can't be watched"""
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, "libc not found, inotify is not available on this platform")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available on this platform")
+
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        wd = libc.inotify_add_watch(fd, os.fsencode(self.__directory), IN_CLOSE_WRITE | IN_MOVED_TO | IN_ONLYDIR)
+        if wd < 0:
+            err = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(err, os.strerror(err), self.__directory)
+
+        self.__fd = fd
+        self.__loop = asyncio.get_running_loop()
+        self.__loop.add_reader(self.__fd, self.__readEvents)
+        self.__logger.info(f"Watching folder {self.__directory} for files matching {self.__pattern}")
+
+    def __readEvents(self):
+        while True:
+            try:
+                buffer = os.read(self.__fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            except OSError:
+                self.__logger.exception("Exception while reading inotify events")
+                self.__lost = True
+                self.__queue.put_nowait(None)
+                return
+
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(buffer):
+                wd, mask, cookie, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = buffer[offset:offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    self.__logger.warning(f"inotify queue overflow on {self.__directory}, events were lost")
+                    self.__queue.put_nowait(None)
+                elif mask & IN_IGNORED:
+                    # the folder has been deleted or unmounted, the watch is no longer valid
+                    self.__logger.warning(f"inotify watch on {self.__directory} was removed")
+                    self.__lost = True
+                    self.__queue.put_nowait(None)
+                elif name:
+                    filename = os.fsdecode(name)
+                    if match_name(filename, self.__pattern):
+                        self.__queue.put_nowait(os.path.join(self.__directory, filename))
+
+    async def Get(self):
+        """ Waits for the next matching file. Returns None when events were lost and a reconciliation scan is needed"""
+        return await self.__queue.get()
+
+    async def GetBatch(self, max_count):
+        """ Waits for the next matching file and returns it along with the files already reported, up to max_count"""
+        batch = [await self.__queue.get()]
+        while len(batch) < max_count and not self.__queue.empty():
+            batch.append(self.__queue.get_nowait())
+        return batch
+
+    def IsLost(self):
+        """ Returns True if the watch is no longer valid and needs to be re-established"""
+        return self.__lost
+
+    def Close(self):
+        if self.__fd >= 0:
+            if self.__loop is not None and not self.__loop.is_closed():
+                self.__loop.remove_reader(self.__fd)
+            os.close(self.__fd)
+            self.__fd = -1
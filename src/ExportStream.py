@@ -0,0 +1,106 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import re
+import zlib
+
+from stream_manager import (
+    ExportDefinition,
+    MessageStreamDefinition,
+    Persistence,
+    S3ExportTaskExecutorConfig,
+    StatusConfig,
+    StatusLevel,
+    StrategyOnFull,
+)
+
+HASH = "hash"
+LEAST_LOADED = "least-loaded"
+SHARD_POLICIES = (HASH, LEAST_LOADED)
+
+PERSISTENCE = {"file": Persistence.File, "memory": Persistence.Memory}
+
+
+class ExportStream:
+    """ ExportStream is a stream whose S3 upload tasks are exported by stream manager, along with its status stream"""
+
+    def __init__(self, name):
+        self.name = name
+        self.status_stream_name = name + "Status"
+        # position in the status stream, and number of tasks appended whose upload is not complete
+        self.status_next_seq = 0
+        self.load = 0
+
+    @staticmethod
+    def Names(bucket_name, count):
+        """ Returns the names of count export streams. The first one is the stream used before sharding was added"""
+        base = bucket_name + "Stream"
+        return [base] + [f"{base}{i}" for i in range(1, count)]
+
+    @staticmethod
+    def IsShard(bucket_name, stream_name):
+        """ Returns True if stream_name is an export stream, or its status stream, created for bucket_name"""
+        return re.fullmatch(re.escape(bucket_name + "Stream") + r"\d*(Status)?", stream_name) is not None
+
+    @staticmethod
+    def Shard(file, count):
+        """ Returns the index of the stream a file goes to when files are spread by hash"""
+        # crc32 is stable across restarts, unlike hash() of a str
+        return zlib.crc32(file.encode()) % count
+
+    def StatusDefinition(self):
+        return MessageStreamDefinition(name=self.status_stream_name,
+                                       strategy_on_full=StrategyOnFull.OverwriteOldestData)
+
+    def Definition(self, max_size=None, segment_size=None, persistence=None, flush_on_write=None):
+        """ Returns the definition of the stream, with its S3 export. The settings left to None use the stream manager
+        defaults"""
+        exports = ExportDefinition(
+            s3_task_executor=[
+                S3ExportTaskExecutorConfig(
+                    identifier="S3TaskExecutor" + self.name,  # Required
+                    # Optional. Add an export status stream to add statuses for all S3 upload tasks.
+                    status_config=StatusConfig(
+                        status_level=StatusLevel.INFO,  # Default is INFO level statuses.
+                        # Status Stream should be created before specifying in S3 Export Config.
+                        status_stream_name=self.status_stream_name,
+                    ),
+                )
+            ]
+        )
+        # Exported tasks are not removed from the stream, only overwriting the oldest data reclaims its space. The
+        # tasks that are not uploaded yet are bounded by max_in_flight_tasks, far below what the stream holds.
+        definition = MessageStreamDefinition(name=self.name,
+                                             strategy_on_full=StrategyOnFull.OverwriteOldestData,
+                                             persistence=None if persistence is None else PERSISTENCE[persistence],
+                                             flush_on_write=flush_on_write,
+                                             export_definition=exports)
+        if max_size is not None:
+            definition.max_size = max_size
+        if segment_size is not None:
+            definition.stream_segment_size = segment_size
+        return definition
+
+    @staticmethod
+    def Changes(current, max_size=None, segment_size=None, persistence=None, flush_on_write=None):
+        """ Returns the settings of Definition that the current definition of an existing stream doesn't have, as a
+        dict of MessageStreamDefinition attributes. The settings left to None keep the value of the stream"""
+        wanted = {
+            "strategy_on_full": StrategyOnFull.OverwriteOldestData,
+            "max_size": max_size,
+            "stream_segment_size": segment_size,
+            "persistence": None if persistence is None else PERSISTENCE[persistence],
+            "flush_on_write": flush_on_write,
+        }
+        return {key: value for key, value in wanted.items() if value is not None and getattr(current, key) != value}
@@ -0,0 +1,96 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import itertools
+import os
+import tarfile
+import time
+import zipfile
+from datetime import datetime
+
+BUNDLE_FORMATS = ("tar", "zip")
+
+
+class FileBundler:
+    """ FileBundler groups small files into tar or zip archives so that they are uploaded as a single object"""
+
+    def __init__(self, bundle_format="tar", max_bytes=64*1024*1024, max_files=1000, max_age=60, max_file_size=1024*1024,
+                 compressor=None):
+        if bundle_format not in BUNDLE_FORMATS:
+            raise ValueError(f"Invalid bundle format {bundle_format}, expected one of {', '.join(BUNDLE_FORMATS)}")
+        self.__format = bundle_format
+        self.__max_bytes = max_bytes
+        self.__max_files = max(max_files, 1)
+        self.__max_age = max_age
+        self.__max_file_size = max_file_size
+        # tar bundles are compressed with the codec of the compressor (bundle.tar.gz), zip bundles are deflated
+        self.__compressor = compressor
+        self.__counter = itertools.count()
+        self.__members = []
+        self.__size = 0
+        self.__opened = None
+
+    def Eligible(self, size):
+        """ Returns True if a file of this size should be bundled rather than uploaded on its own"""
+        return size <= self.__max_file_size
+
+    def Add(self, path, size):
+        """ Adds a file to the current bundle. Returns True if the bundle is full and should be flushed"""
+        if len(self.__members) == 0:
+            self.__opened = time.monotonic()
+        self.__members.append(path)
+        self.__size += size
+        return self.__size >= self.__max_bytes or len(self.__members) >= self.__max_files
+
+    def Due(self):
+        """ Returns True if the current bundle has been open for longer than max_age seconds"""
+        return len(self.__members) > 0 and time.monotonic() - self.__opened >= self.__max_age
+
+    def Take(self):
+        """ Returns the members of the current bundle and starts a new one"""
+        members = self.__members
+        self.__members = []
+        self.__size = 0
+        return members
+
+    def NewName(self):
+        # unique across restarts thanks to the timestamp, and within a run thanks to the counter
+        extension = self.__format
+        if self.__compressor is not None and self.__format == "tar":
+            extension += self.__compressor.Extension()
+        return f"bundle-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{next(self.__counter):06d}.{extension}"
+
+    def Write(self, path, members):
+        """ Writes the members into an archive at path, streaming their content. Returns the members that were written.
+        Members that no longer exist are skipped."""
+        written = []
+        if self.__format == "zip":
+            compression = zipfile.ZIP_STORED if self.__compressor is None else zipfile.ZIP_DEFLATED
+            with zipfile.ZipFile(path, "w", compression=compression, allowZip64=True) as archive:
+                for member in members:
+                    try:
+                        archive.write(member, arcname=os.path.basename(member))
+                        written.append(member)
+                    except FileNotFoundError:
+                        pass
+        else:
+            stream = open(path, "wb") if self.__compressor is None else self.__compressor.Writer(path)
+            with stream, tarfile.open(fileobj=stream, mode="w|", format=tarfile.PAX_FORMAT) as archive:
+                for member in members:
+                    try:
+                        archive.add(member, arcname=os.path.basename(member), recursive=False)
+                        written.append(member)
+                    except FileNotFoundError:
+                        pass
+        return written
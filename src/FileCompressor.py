@@ -0,0 +1,84 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import gzip
+import multiprocessing
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# extension added to the file name (and to the object key) for each codec
+CODECS = {"gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+CHUNK_SIZE = 1024*1024
+
+
+def codec_available(codec):
+    """ Returns True if the package the codec needs is installed"""
+    return codec != "zstd" or zstandard is not None
+
+
+def open_compressed(path, codec, level):
+    """ Opens a binary file for writing, compressing what is written to it"""
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=level).stream_writer(open(path, "wb"))
+    return gzip.GzipFile(path, "wb", compresslevel=level)
+
+
+def compress_file(source, destination, codec, level):
+    """ Compresses source into destination one chunk at a time and returns the compressed size. Runs in a worker
+    process, it needs to be a module level function."""
+    with open(source, "rb") as input, open_compressed(destination, codec, level) as output:
+        shutil.copyfileobj(input, output, CHUNK_SIZE)
+    with open(destination, "rb") as output:
+        return output.seek(0, 2)
+
+
+class FileCompressor:
+    """ FileCompressor compresses files with gzip or zstd on a pool of processes so that several cores are used"""
+
+    def __init__(self, codec="gzip", level=None, workers=2):
+        if codec not in CODECS:
+            raise ValueError(f"Invalid compression codec {codec}, expected one of {', '.join(CODECS)}")
+        if not codec_available(codec):
+            raise ValueError("zstd compression requires the zstandard package, run: pip3 install zstandard")
+        self.__codec = codec
+        self.__level = DEFAULT_LEVELS[codec] if level is None else level
+        self.__workers = max(workers, 1)
+        self.__pool = None
+
+    def Extension(self):
+        return CODECS[self.__codec]
+
+    def Writer(self, path):
+        """ Opens a compressed stream, used to compress bundles while they are written"""
+        return open_compressed(path, self.__codec, self.__level)
+
+    async def Compress(self, source, destination):
+        """ Compresses source into destination on the process pool and returns the compressed size"""
+        if self.__pool is None:
+            # spawn rather than fork: the stream manager client runs a thread that must not be forked
+            self.__pool = ProcessPoolExecutor(max_workers=self.__workers, mp_context=multiprocessing.get_context("spawn"))
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__pool, compress_file, source, destination, self.__codec, self.__level)
+
+    def Close(self):
+        if self.__pool is not None:
+            self.__pool.shutdown(wait=False)
+            self.__pool = None
@@ -0,0 +1,108 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import errno
+import mmap
+import os
+import uuid
+
+# parts are copied by chunks of 64 MiB by the kernel, or read and written by chunks of 1 MiB when it can't
+COPY_CHUNK_SIZE = 64*1024*1024
+CHUNK_SIZE = 1024*1024
+
+
+def split_ranges(path, part_size, delimiter=b"\n"):
+    """ Returns the (start, end) byte ranges of the parts of a file. Each part ends with the delimiter and is at most
+    part_size bytes, unless a single record is larger. Without a delimiter the file is cut every part_size bytes."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= part_size:
+            return [(0, size)]
+        ranges = []
+        start = 0
+        # only the pages around the cut points are read from the mapped file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            while size - start > part_size:
+                if not delimiter:
+                    end = start + part_size
+                else:
+                    # the last record that fits in the part, or the end of the first record when it doesn't fit
+                    end = mapped.rfind(delimiter, start, start + part_size)
+                    if end < 0:
+                        end = mapped.find(delimiter, start + part_size)
+                    if end < 0:
+                        break
+                    end += len(delimiter)
+                    if end >= size:
+                        break
+                ranges.append((start, end))
+                start = end
+        ranges.append((start, size))
+        return ranges
+
+
+def copy_range(source, destination, start, end):
+    """ Copies the bytes start to end of source into destination. The copy is done by the kernel when it can (and
+    shares the blocks of the file on file systems that support it), the data isn't copied into Python memory."""
+    with open(source, "rb") as input, open(destination, "wb") as output:
+        offset = start
+        while offset < end:
+            try:
+                copied = os.copy_file_range(input.fileno(), output.fileno(), min(end - offset, COPY_CHUNK_SIZE), offset)
+            except AttributeError:
+                # copy_file_range is only available on linux
+                break
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                    raise
+                break
+            if copied == 0:
+                raise OSError(f"{source} is shorter than expected, {offset} bytes read out of {end}")
+            offset += copied
+        input.seek(offset)
+        while offset < end:
+            chunk = input.read(min(end - offset, CHUNK_SIZE))
+            if len(chunk) == 0:
+                raise OSError(f"{source} is shorter than expected, {offset} bytes read out of {end}")
+            output.write(chunk)
+            offset += len(chunk)
+
+
+class FileSplitter:
+    """ FileSplitter cuts large files into parts at record boundaries, so that the parts are uploaded in parallel and
+    a failed upload only sends one part again"""
+
+    def __init__(self, part_size=256*1024*1024, delimiter=b"\n"):
+        if part_size <= 0:
+            raise ValueError(f"Invalid part size {part_size}, expected a positive number of bytes")
+        self.__part_size = part_size
+        self.__delimiter = delimiter
+
+    def Eligible(self, size):
+        """ Returns True if a file of this size should be split rather than uploaded on its own"""
+        return size > self.__part_size
+
+    def Ranges(self, path):
+        return split_ranges(path, self.__part_size, self.__delimiter)
+
+    def Write(self, path, destination, start, end):
+        copy_range(path, destination, start, end)
+
+    def NewName(self, path):
+        # the parts of the file are named after it, unique across runs thanks to the random prefix
+        return f"{uuid.uuid4().hex[:8]}-{os.path.basename(path)}"
+
+    @staticmethod
+    def PartName(name, index):
+        return f"{name}.part{index:05d}"
@@ -0,0 +1,123 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from stream_manager import MessageStreamDefinition, StrategyOnFull
+
+from src.AsyncStreamManagerClient import AsyncStreamManagerClient
+from src.UploadMetrics import UploadMetrics
+
+# The sinks publish the metrics every metrics interval: Start() is called once, Publish() with the metrics every
+# interval and Close() when the uploader stops.
+
+PROMETHEUS = "prometheus"
+JSON = "json"
+STREAM = "stream"
+SINKS = (PROMETHEUS, JSON, STREAM)
+
+
+class PrometheusSink:
+    """ PrometheusSink serves the metrics in the Prometheus text format on http://host:port/metrics"""
+
+    def __init__(self, port=9108, host="127.0.0.1"):
+        self.__address = (host, port)
+        self.__text = b""
+        self.__server = None
+
+    def Start(self):
+        # the attributes of the sink are private, the handler reads the text through this function
+        def current():
+            return self.__text
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = current()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # the scrapes are not logged
+                pass
+
+        self.__server = ThreadingHTTPServer(self.__address, Handler)
+        threading.Thread(target=self.__server.serve_forever, name="PrometheusSink", daemon=True).start()
+
+    def Port(self):
+        return self.__server.server_address[1]
+
+    async def Publish(self, metrics:UploadMetrics):
+        # the scrapes are served from the text of the last publication
+        self.__text = metrics.Prometheus().encode()
+
+    def Close(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+
+class JsonFileSink:
+    """ JsonFileSink writes the last snapshot of the metrics to a JSON file"""
+
+    def __init__(self, path):
+        self.__path = path
+
+    def Start(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.__path)), exist_ok=True)
+
+    async def Publish(self, metrics:UploadMetrics):
+        await asyncio.to_thread(self.__write, json.dumps(metrics.Snapshot()))
+
+    def __write(self, text):
+        # replaced atomically so that a reader never sees a partial file
+        tmp = self.__path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, self.__path)
+
+    def Close(self):
+        pass
+
+
+class StreamSink:
+    """ StreamSink appends the snapshots of the metrics to a local stream manager stream"""
+
+    def __init__(self, client:AsyncStreamManagerClient, stream_name):
+        self.__client = client
+        self.__stream_name = stream_name
+
+    def Definition(self):
+        # the snapshots are only kept until they are read, the oldest ones are dropped when the stream is full
+        return MessageStreamDefinition(name=self.__stream_name, max_size=16*1024*1024,
+                                       strategy_on_full=StrategyOnFull.OverwriteOldestData)
+
+    def Start(self):
+        pass
+
+    async def Publish(self, metrics:UploadMetrics):
+        await self.__client.append_message(self.__stream_name, json.dumps(metrics.Snapshot()).encode())
+
+    def Close(self):
+        pass
@@ -0,0 +1,132 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import heapq
+import os
+import shutil
+import threading
+import uuid
+
+# What is done with a file once it has been uploaded
+DELETE = "delete"
+ARCHIVE = "archive"
+RETAIN = "retain"
+TRUNCATE = "truncate"
+ACTIONS = (DELETE, ARCHIVE, RETAIN, TRUNCATE)
+
+
+class RetentionWindow:
+    """ RetentionWindow keeps the total size of the files of a folder under max_bytes, removing the oldest files
+    (by mtime) first"""
+
+    def __init__(self, directory, max_bytes):
+        self.__directory = directory
+        self.__max_bytes = max_bytes
+        # heap of (mtime, path, size) of the files in the folder
+        self.__heap = []
+        self.__size = 0
+        # the files are added by the post-upload workers
+        self.__lock = threading.Lock()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    self.__heap.append((stat.st_mtime_ns, entry.path, stat.st_size))
+                    self.__size += stat.st_size
+        heapq.heapify(self.__heap)
+        self.__evict()
+
+    def Add(self, path):
+        """ Adds a file of the folder, and removes the oldest files if the folder is over max_bytes. Returns the paths
+        of the files removed"""
+        stat = os.stat(path)
+        with self.__lock:
+            heapq.heappush(self.__heap, (stat.st_mtime_ns, path, stat.st_size))
+            self.__size += stat.st_size
+            return self.__evict()
+
+    def Size(self):
+        return self.__size
+
+    def __evict(self):
+        evicted = []
+        while self.__size > self.__max_bytes and len(self.__heap) > 0:
+            mtime, path, size = heapq.heappop(self.__heap)
+            self.__size -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            evicted.append(path)
+        return evicted
+
+
+class PostUploadAction:
+    """ PostUploadAction applies what is done with the files once they have been uploaded: they are deleted, moved to
+    an archive folder, hard linked into a retention folder or truncated"""
+
+    def __init__(self, action=DELETE, directory=None, max_bytes=None):
+        # archive moves the files to directory, across file systems if needed. retain hard links them into directory,
+        # which must be on the file system of the watched folders, so that the data isn't copied. With max_bytes,
+        # the oldest files of directory are removed once it holds more than max_bytes. truncate empties the files
+        # and leaves them in place.
+        if action not in ACTIONS:
+            raise ValueError(f"Invalid post-upload action {action}, expected one of {', '.join(ACTIONS)}")
+        if action in (ARCHIVE, RETAIN):
+            if not directory:
+                raise ValueError(f"A folder is required to {action} the uploaded files")
+            os.makedirs(directory, exist_ok=True)
+        self.__action = action
+        self.__directory = None if directory is None else os.path.abspath(directory)
+        self.__window = None
+        if action in (ARCHIVE, RETAIN) and max_bytes:
+            self.__window = RetentionWindow(self.__directory, max_bytes)
+
+    def KeepsFiles(self):
+        """ Returns True if the uploaded files are left in the watched folder"""
+        return self.__action == TRUNCATE
+
+    def Apply(self, path):
+        """ Applies the action to an uploaded file, this is a blocking call"""
+        if self.__action == DELETE:
+            os.remove(path)
+        elif self.__action == TRUNCATE:
+            os.truncate(path, 0)
+        else:
+            destination = self.__link(path)
+            os.remove(path)
+            if self.__window is not None:
+                self.__window.Add(destination)
+
+    def __link(self, path):
+        # the file keeps its name, unless a file of the same name is already in the folder. Hard links never replace
+        # an existing file.
+        name = os.path.basename(path)
+        while True:
+            destination = os.path.join(self.__directory, name)
+            try:
+                os.link(path, destination)
+                return destination
+            except FileExistsError:
+                name = f"{uuid.uuid4().hex[:8]}-{os.path.basename(path)}"
+            except OSError:
+                if self.__action == RETAIN:
+                    # a hard link can't cross file systems
+                    raise
+                # the archive is on another file system, the file is copied
+                if os.path.exists(destination):
+                    name = f"{uuid.uuid4().hex[:8]}-{os.path.basename(path)}"
+                    continue
+                shutil.copy2(path, destination)
+                return destination
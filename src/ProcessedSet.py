@@ -0,0 +1,128 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import zlib
+from array import array
+from bisect import bisect_left
+
+_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+class ProcessedSet:
+    """ ProcessedSet is a compact set of file paths, it supports the same operations as a python set of paths"""
+
+    def __init__(self, compact_threshold=4096):
+        # Paths are stored as a 64 bit hash and a 32 bit check (12 bytes per path instead of a string and a set
+        # slot). Most of them are in sorted arrays, the recent changes are kept in a small dict and a small set and
+        # merged into the arrays once they grow over compact_threshold or an eighth of the arrays, so that adding and
+        # removing a path is O(1). The hashes are only kept in memory, hash() doesn't need to be stable across
+        # restarts.
+        # Two paths with the same hash are told apart by their check, a crc32 that doesn't depend on hash(). A path
+        # whose hash is taken by another path is kept as is in __collisions. Only two paths with the same hash and the
+        # same check are mistaken for each other, about one chance in 2**96 per pair of paths.
+        self.__base = array("Q")
+        self.__checks = array("I")
+        self.__added = {}
+        self.__removed = set()
+        self.__collisions = set()
+        self.__compact_threshold = compact_threshold
+
+    @staticmethod
+    def __key(path):
+        return hash(path) & _MASK, zlib.crc32(os.fsencode(path))
+
+    def __check(self, key):
+        # the check of the path stored under key, or None
+        check = self.__added.get(key)
+        if check is not None or key in self.__removed:
+            return check
+        i = bisect_left(self.__base, key)
+        if i < len(self.__base) and self.__base[i] == key:
+            return self.__checks[i]
+        return None
+
+    def add(self, path):
+        if len(self.__collisions) > 0 and path in self.__collisions:
+            return
+        key, check = self.__key(path)
+        current = self.__check(key)
+        if current is None:
+            # a path removed from the arrays stays in __removed until they are compacted
+            self.__added[key] = check
+            self.__compactIfNeeded()
+        elif current != check:
+            self.__collisions.add(path)
+
+    def discard(self, path):
+        if path in self.__collisions:
+            self.__collisions.discard(path)
+            return
+        key, check = self.__key(path)
+        if self.__check(key) != check:
+            return
+        if key in self.__added:
+            del self.__added[key]
+        else:
+            self.__removed.add(key)
+            self.__compactIfNeeded()
+
+    def update(self, paths):
+        for path in paths:
+            self.add(path)
+
+    def difference_update(self, paths):
+        for path in paths:
+            self.discard(path)
+
+    def __contains__(self, path):
+        key, check = self.__key(path)
+        if self.__check(key) == check:
+            return True
+        return len(self.__collisions) > 0 and path in self.__collisions
+
+    def __len__(self):
+        return len(self.__base) - len(self.__removed) + len(self.__added) + len(self.__collisions)
+
+    def __compactIfNeeded(self):
+        if len(self.__added) + len(self.__removed) > max(self.__compact_threshold, len(self.__base) // 8):
+            self.Compact()
+
+    def Compact(self):
+        """ Merges the recent changes into the sorted arrays"""
+        base = self.__base
+        checks = self.__checks
+        # the position of each change in the arrays, a path added is inserted before the one removed at the same
+        # position. The arrays are copied a slice at a time between two changes.
+        changes = [(bisect_left(base, key), 0, key, check) for key, check in self.__added.items()]
+        changes.extend((bisect_left(base, key), 1, key, 0) for key in self.__removed)
+        changes.sort()
+        merged_base = array("Q")
+        merged_checks = array("I")
+        start = 0
+        for position, removal, key, check in changes:
+            merged_base.extend(base[start:position])
+            merged_checks.extend(checks[start:position])
+            if removal:
+                start = position + 1
+            else:
+                start = position
+                merged_base.append(key)
+                merged_checks.append(check)
+        merged_base.extend(base[start:])
+        merged_checks.extend(checks[start:])
+        self.__base = merged_base
+        self.__checks = merged_checks
+        self.__added = {}
+        self.__removed = set()
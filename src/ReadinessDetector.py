@@ -0,0 +1,113 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import time
+
+# fcntl is only available on unix, the lock check can't be used without it
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+NEWEST = "newest"
+QUIESCENT = "quiescent"
+MODES = (NEWEST, QUIESCENT)
+
+LOCK = "lock"
+MARKER = "marker"
+RENAME = "rename"
+CHECKS = (LOCK, MARKER, RENAME)
+
+MARKER_SUFFIX = ".done"
+
+
+class ReadinessDetector:
+    """ ReadinessDetector decides when a file is complete and can be uploaded"""
+
+    def __init__(self, mode=NEWEST, quiescence_period=5, check=None):
+        if mode not in MODES:
+            raise ValueError(f"Invalid readiness mode {mode}, expected one of {', '.join(MODES)}")
+        if check is not None and check not in CHECKS:
+            raise ValueError(f"Invalid readiness check {check}, expected one of {', '.join(CHECKS)}")
+        if check == LOCK and fcntl is None:
+            raise ValueError("The lock readiness check is not available on this platform")
+        self.__mode = mode
+        self.__period_ns = int(quiescence_period * 1e9)
+        self.__check = check
+        # (size, mtime) of the files that are not complete yet, and when that was first observed
+        self.__observed = {}
+
+    def HoldsNewest(self):
+        """ Returns True if the newest file of a folder is considered active and never uploaded"""
+        # with the rename convention, a file only gets its final name once it is complete
+        return self.__mode == NEWEST and self.__check != RENAME
+
+    def IsSidecar(self, file):
+        """ Returns True if the file is a marker of another file, it is never uploaded"""
+        return self.__check == MARKER and file.endswith(MARKER_SUFFIX)
+
+    def Sidecars(self, file):
+        """ Returns the files to remove along with an uploaded file"""
+        return [file + MARKER_SUFFIX] if self.__check == MARKER else []
+
+    def Ready(self, file, size, mtime, now=None):
+        """ Returns True if the file, of the given size and mtime (in ns), is complete"""
+        if self.__check == RENAME:
+            return True
+        if self.__mode == QUIESCENT and not self.__quiescent(file, size, mtime, now):
+            return False
+        return self.Checked(file)
+
+    def Checked(self, file):
+        """ Returns True if the file passes the readiness check, for files known to be closed by their producer"""
+        if self.__check == MARKER:
+            return os.path.exists(file + MARKER_SUFFIX)
+        if self.__check == LOCK:
+            return self.__unlocked(file)
+        return True
+
+    def Forget(self, file):
+        self.__observed.pop(file, None)
+
+    def __quiescent(self, file, size, mtime, now):
+        now = time.time_ns() if now is None else now
+        # a file that hasn't been modified for quiescence_period is complete. When the mtime is ahead of the local
+        # clock (e.g. a network file system), its size and mtime must not change for quiescence_period instead.
+        if now - mtime >= self.__period_ns:
+            self.__observed.pop(file, None)
+            return True
+        observed = self.__observed.get(file)
+        if observed is None or observed[0] != (size, mtime):
+            self.__observed[file] = ((size, mtime), now)
+            return False
+        if now - observed[1] >= self.__period_ns:
+            self.__observed.pop(file, None)
+            return True
+        return False
+
+    def __unlocked(self, file):
+        # the producer holds a lock (flock) on the file while it writes it
+        try:
+            fd = os.open(file, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            return True
+        except BlockingIOError:
+            return False
+        finally:
+            os.close(fd)
@@ -0,0 +1,76 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import sys
+import threading
+from collections import Counter
+
+
+class SamplingProfiler:
+    """ SamplingProfiler periodically samples the stacks of all the threads and writes them in the collapsed stack
+    format used by flame graph tools"""
+
+    def __init__(self, path, interval=0.01, max_depth=64):
+        self.__path = path
+        self.__interval = interval
+        self.__max_depth = max_depth
+        self.__stacks = Counter()
+        self.__lock = threading.Lock()
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def Start(self):
+        self.__thread = threading.Thread(target=self.__run, name="SamplingProfiler", daemon=True)
+        self.__thread.start()
+
+    def __run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self.__stop.wait(self.__interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            samples = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames = []
+                while frame is not None and len(frames) < self.__max_depth:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                frames.append(names.get(ident, str(ident)))
+                samples.append(";".join(reversed(frames)))
+            with self.__lock:
+                self.__stacks.update(samples)
+
+    def Samples(self):
+        with self.__lock:
+            return sum(self.__stacks.values())
+
+    def Write(self):
+        """ Writes the stacks sampled so far, one line per stack with the number of samples"""
+        with self.__lock:
+            lines = [f"{stack} {count}\n" for stack, count in self.__stacks.most_common()]
+        tmp = self.__path + ".tmp"
+        with open(tmp, "w") as f:
+            f.writelines(lines)
+        os.replace(tmp, self.__path)
+
+    def Close(self):
+        self.__stop.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+            self.Write()
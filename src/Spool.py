@@ -0,0 +1,144 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+import logging
+from collections import Counter, namedtuple
+
+# Where an artifact is uploaded, and the watched files it was built from. The members are deleted once the
+# artifact has been uploaded. The parts of a split file belong to the same group, the file is deleted once all
+# the parts have been uploaded.
+Manifest = namedtuple("Manifest", ["bucket", "key", "members", "group"], defaults=[None])
+
+MANIFEST_SUFFIX = ".manifest"
+TEMPORARY_SUFFIX = ".tmp"
+GROUP_SUFFIX = ".parts"
+
+
+class Spool:
+    """ Spool holds the artifacts built from the watched files (bundles, compressed files...) until they are uploaded"""
+
+    def __init__(self, directory, logger:logging.Logger):
+        self.__directory = os.path.abspath(directory)
+        self.__logger = logger
+        self.__manifests = {}
+        # number of artifacts of each group that have not been released yet
+        self.__groups = Counter()
+        os.makedirs(self.__directory, exist_ok=True)
+
+    def TemporaryPath(self, name):
+        """ Returns the path where an artifact is written before it is published"""
+        return os.path.join(self.__directory, name + TEMPORARY_SUFFIX)
+
+    def Publish(self, name, bucket, key, members, group=None):
+        """ Publishes an artifact written at TemporaryPath(name) and returns its path"""
+        path = os.path.join(self.__directory, name)
+        manifest = Manifest(bucket, key, list(members), group)
+        # the manifest is written first: an artifact without a temporary suffix always has a manifest
+        with open(path + MANIFEST_SUFFIX + TEMPORARY_SUFFIX, "w") as f:
+            json.dump(manifest._asdict(), f)
+        os.replace(path + MANIFEST_SUFFIX + TEMPORARY_SUFFIX, path + MANIFEST_SUFFIX)
+        os.replace(self.TemporaryPath(name), path)
+        self.__manifests[path] = manifest
+        if group is not None:
+            self.__groups[group] += 1
+        return path
+
+    def PublishParts(self, group, parts, bucket, members):
+        """ Publishes the parts of a split file, written at TemporaryPath(name) for each (name, key) of parts, and
+        returns their paths. After a restart, the parts are only recovered if they were all published."""
+        paths = []
+        try:
+            for name, key in parts:
+                paths.append(self.Publish(name, bucket, key, members, group))
+            # the marker is written last, Recover removes the parts of a group without marker
+            marker = os.path.join(self.__directory, group + GROUP_SUFFIX)
+            open(marker + TEMPORARY_SUFFIX, "w").close()
+            os.replace(marker + TEMPORARY_SUFFIX, marker)
+        except Exception:
+            for path in paths:
+                self.Release(path)
+            raise
+        return paths
+
+    def Shared(self, path):
+        """ Returns True if the members of an artifact are also the members of other parts not released yet"""
+        manifest = self.__manifests.get(path)
+        return manifest is not None and manifest.group is not None and self.__groups[manifest.group] > 1
+
+    def Owns(self, path):
+        return path in self.__manifests
+
+    def Manifest(self, path):
+        """ Returns the Manifest of an artifact, or None if the path is not an artifact of the spool"""
+        return self.__manifests.get(path)
+
+    def Artifacts(self):
+        return list(self.__manifests.items())
+
+    def Release(self, path):
+        """ Removes an artifact and its manifest once it has been uploaded"""
+        filenames = [path, path + MANIFEST_SUFFIX]
+        manifest = self.__manifests.pop(path, None)
+        if manifest is not None and manifest.group is not None:
+            self.__groups[manifest.group] -= 1
+            if self.__groups[manifest.group] <= 0:
+                # the last part of the group
+                del self.__groups[manifest.group]
+                filenames.append(os.path.join(self.__directory, manifest.group + GROUP_SUFFIX))
+        for filename in filenames:
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+    def Recover(self):
+        """ Loads the artifacts left by a previous run and cleans up the ones that were not completely written"""
+        self.__manifests = {}
+        self.__groups = Counter()
+        groups = set()
+        for name in os.listdir(self.__directory):
+            path = os.path.join(self.__directory, name)
+            if name.endswith(TEMPORARY_SUFFIX):
+                os.remove(path)
+            elif name.endswith(GROUP_SUFFIX):
+                groups.add(name[:-len(GROUP_SUFFIX)])
+            elif name.endswith(MANIFEST_SUFFIX):
+                artifact = path[:-len(MANIFEST_SUFFIX)]
+                if not os.path.exists(artifact):
+                    # the component stopped before the artifact was published, or after it was released
+                    os.remove(path)
+                    continue
+                with open(path) as f:
+                    self.__manifests[artifact] = Manifest(**json.load(f))
+        for artifact, manifest in list(self.__manifests.items()):
+            if manifest.group is None:
+                continue
+            if manifest.group not in groups:
+                # the component stopped while the file was split, it will be split again
+                self.__logger.warning(f"Removing {artifact} from the spool, not all the parts were published")
+                del self.__manifests[artifact]
+                os.remove(artifact)
+                os.remove(artifact + MANIFEST_SUFFIX)
+            else:
+                self.__groups[manifest.group] += 1
+        for group in groups - set(self.__groups):
+            os.remove(os.path.join(self.__directory, group + GROUP_SUFFIX))
+        for name in os.listdir(self.__directory):
+            path = os.path.join(self.__directory, name)
+            if not name.endswith((MANIFEST_SUFFIX, GROUP_SUFFIX)) and path not in self.__manifests:
+                self.__logger.warning(f"Removing {path} from the spool, it has no manifest")
+                os.remove(path)
+        return self.Artifacts()
@@ -0,0 +1,87 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import sqlite3
+import time
+from collections import namedtuple
+
+QUEUED = "queued"
+IN_PROGRESS = "in_progress"
+SUCCEEDED = "succeeded"
+
+# A file tracked by the ledger, with the export stream it was appended to and its sequence number in that stream
+LedgerEntry = namedtuple("LedgerEntry", ["path", "state", "stream", "sequence_number"])
+
+
+class UploadLedger:
+    """ UploadLedger persists the state of the uploads in a local SQLite database so that it survives restarts"""
+
+    def __init__(self, path):
+        self.__db = sqlite3.connect(path)
+        # WAL with synchronous=NORMAL is crash safe (a crash can only lose the last transactions, never corrupt the
+        # database) and avoids a fsync on every commit
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+        self.__db.execute("CREATE TABLE IF NOT EXISTS files ("
+                          "path TEXT PRIMARY KEY, state TEXT NOT NULL, stream TEXT, sequence_number INTEGER, "
+                          "updated REAL)")
+        self.__db.execute("CREATE TABLE IF NOT EXISTS streams ("
+                          "name TEXT PRIMARY KEY, status_sequence_number INTEGER NOT NULL)")
+        self.__db.commit()
+
+    def HasStream(self, stream):
+        """ Returns True if the ledger has been tracking the given export stream"""
+        return self.StatusSequenceNumber(stream) is not None
+
+    def StatusSequenceNumber(self, stream):
+        """ Returns the next sequence number to read from the status stream of an export stream, or None if unknown"""
+        row = self.__db.execute("SELECT status_sequence_number FROM streams WHERE name = ?", (stream,)).fetchone()
+        return None if row is None else row[0]
+
+    def SetStatusSequenceNumber(self, stream, sequence_number):
+        self.__db.execute("INSERT OR REPLACE INTO streams (name, status_sequence_number) VALUES (?, ?)",
+                          (stream, sequence_number))
+
+    def ForgetStream(self, stream):
+        """ Forgets an export stream and all the files that were appended to it"""
+        self.__db.execute("DELETE FROM files WHERE stream = ?", (stream,))
+        self.__db.execute("DELETE FROM streams WHERE name = ?", (stream,))
+
+    def Entries(self):
+        """ Returns all the files tracked by the ledger"""
+        return [LedgerEntry(*row) for row in
+                self.__db.execute("SELECT path, state, stream, sequence_number FROM files")]
+
+    def Queued(self, path, stream, sequence_number):
+        self.__db.execute("INSERT OR REPLACE INTO files (path, state, stream, sequence_number, updated) "
+                          "VALUES (?, ?, ?, ?, ?)", (path, QUEUED, stream, sequence_number, time.time()))
+
+    def InProgress(self, path):
+        self.__setState(path, IN_PROGRESS)
+
+    def Succeeded(self, path):
+        self.__setState(path, SUCCEEDED)
+
+    def Forget(self, path):
+        self.__db.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def __setState(self, path, state):
+        self.__db.execute("UPDATE files SET state = ?, updated = ? WHERE path = ?", (state, time.time(), path))
+
+    def Commit(self):
+        self.__db.commit()
+
+    def Close(self):
+        self.__db.commit()
+        self.__db.close()
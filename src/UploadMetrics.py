@@ -0,0 +1,100 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import time
+from collections import deque
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _Summary:
+    # count and sum of all the observations, percentiles of the most recent ones
+    def __init__(self, window):
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=window)
+
+    def Observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+
+    def Quantiles(self):
+        samples = sorted(self.samples)
+        if len(samples) == 0:
+            return {q: None for q in QUANTILES}
+        return {q: samples[min(int(q * len(samples)), len(samples) - 1)] for q in QUANTILES}
+
+
+class UploadMetrics:
+    """ UploadMetrics holds the counters, gauges and latency summaries of the uploader"""
+
+    def __init__(self, prefix="file_uploader", window=1024):
+        self.__prefix = prefix
+        self.__window = window
+        self.__counters = {}
+        self.__gauges = {}
+        self.__summaries = {}
+        self.__rates = {}
+
+    def Count(self, name, value=1):
+        self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def Gauge(self, name, value):
+        self.__gauges[name] = value
+
+    def Observe(self, name, value):
+        """ Records a sample, such as a latency in seconds"""
+        summary = self.__summaries.get(name)
+        if summary is None:
+            summary = self.__summaries[name] = _Summary(self.__window)
+        summary.Observe(value)
+
+    def Rate(self, name, counter, now=None):
+        """ Sets the gauge name to the rate per second of a counter since the previous call"""
+        now = time.monotonic() if now is None else now
+        value = self.__counters.get(counter, 0)
+        previous = self.__rates.get(counter)
+        self.__rates[counter] = (now, value)
+        if previous is not None and now > previous[0]:
+            self.__gauges[name] = (value - previous[1]) / (now - previous[0])
+
+    def Snapshot(self):
+        """ Returns the metrics as a dict that can be serialized to JSON"""
+        return {
+            "timestamp": time.time(),
+            "counters": dict(self.__counters),
+            "gauges": dict(self.__gauges),
+            "summaries": {name: {"count": summary.count, "sum": summary.sum,
+                                 **{f"p{int(q * 100)}": value for q, value in summary.Quantiles().items()}}
+                          for name, summary in self.__summaries.items()},
+        }
+
+    def Prometheus(self):
+        """ Returns the metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, value in sorted(self.__counters.items()):
+            lines.append(f"# TYPE {self.__prefix}_{name}_total counter")
+            lines.append(f"{self.__prefix}_{name}_total {value}")
+        for name, value in sorted(self.__gauges.items()):
+            lines.append(f"# TYPE {self.__prefix}_{name} gauge")
+            lines.append(f"{self.__prefix}_{name} {value}")
+        for name, summary in sorted(self.__summaries.items()):
+            lines.append(f"# TYPE {self.__prefix}_{name} summary")
+            for q, value in summary.Quantiles().items():
+                if value is not None:
+                    lines.append(f'{self.__prefix}_{name}{{quantile="{q}"}} {value}')
+            lines.append(f"{self.__prefix}_{name}_sum {summary.sum}")
+            lines.append(f"{self.__prefix}_{name}_count {summary.count}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,139 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import heapq
+import itertools
+
+from src.ProcessedSet import ProcessedSet
+
+# ordering policies of the files waiting to be uploaded
+OLDEST_FIRST = "oldest"
+SMALLEST_FIRST = "smallest"
+PRIORITY = "priority"
+POLICIES = (OLDEST_FIRST, SMALLEST_FIRST, PRIORITY)
+
+# keeps the packed sort keys positive for priorities down to -2**31
+_PRIORITY_BIAS = 1 << 31
+_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+class UploadScheduler:
+    """ UploadScheduler orders the files waiting to be uploaded and limits the number of upload tasks in the export stream"""
+
+    def __init__(self, max_in_flight=1000, policy=OLDEST_FIRST):
+        if policy not in POLICIES:
+            raise ValueError(f"Invalid schedule policy {policy}, expected one of {', '.join(POLICIES)}")
+        self.__max_in_flight = max_in_flight
+        self.__policy = policy
+        # heap of (sort key, file, source). With a large backlog most files wait here, so each entry is kept small:
+        # the sort key and the push order are packed in a single int, and the files still scheduled are a compact
+        # set of hashes. Discarded files stay in the heap until they are popped, the entries that are still valid
+        # are the ones whose file is in __queued. A file discarded and pushed again (e.g. under another source) has
+        # several entries: __discarded holds the files that might have an out of date entry, and __current the push
+        # order of the valid entry of those pushed again.
+        self.__heap = []
+        self.__queued = ProcessedSet()
+        self.__discarded = ProcessedSet()
+        self.__current = {}
+        # files (or spool artifacts) appended to the export stream whose upload is not complete yet. There are at
+        # most max_in_flight of them.
+        self.__in_flight = set()
+        self.__counter = itertools.count()
+
+    def __key(self, size, mtime, priority):
+        # files pushed with the same key are taken in the order they were pushed (e.g. the parts of a file)
+        mtime = max(mtime, 0)
+        if self.__policy == SMALLEST_FIRST:
+            key = (size << 64) | mtime
+        elif self.__policy == PRIORITY:
+            # files of the sources with the highest priority first, oldest first within a priority
+            key = ((_PRIORITY_BIAS - priority) << 64) | mtime
+        else:
+            key = mtime
+        return (key << 64) | next(self.__counter)
+
+    def Push(self, file, source, size, mtime, priority=0):
+        """ Schedules a file. Returns False if the file is already scheduled or in flight"""
+        if file in self.__queued or file in self.__in_flight:
+            return False
+        self.__queued.add(file)
+        key = self.__key(size, mtime, priority)
+        if file in self.__discarded:
+            self.__discarded.discard(file)
+            self.__current[file] = key & _MASK
+        heapq.heappush(self.__heap, (key, file, source))
+        return True
+
+    def __valid(self, entry):
+        key, file, source = entry
+        return file in self.__queued and self.__current.get(file, key & _MASK) == key & _MASK
+
+    def Discard(self, file):
+        """ Removes a file that is no longer on disk from the schedule"""
+        if file not in self.__queued:
+            return
+        self.__queued.discard(file)
+        self.__discarded.add(file)
+        if len(self.__heap) > 2 * len(self.__queued) + 1024:
+            # drop the discarded entries once they make most of the heap
+            self.__heap = [entry for entry in self.__heap if self.__valid(entry)]
+            heapq.heapify(self.__heap)
+            self.__discarded = ProcessedSet()
+            self.__current = {}
+
+    def DiscardSource(self, source):
+        """ Removes the files of a source that is no longer monitored from the schedule"""
+        for entry in self.__heap:
+            if entry[2] is source and self.__valid(entry):
+                self.__queued.discard(entry[1])
+                self.__discarded.add(entry[1])
+
+    def Scheduled(self, file):
+        """ Returns True if the file is waiting to be uploaded or in flight"""
+        return file in self.__queued or file in self.__in_flight
+
+    def Take(self):
+        """ Returns the next (file, source) to upload, as many as the export stream has room for. The files returned
+        are counted as in flight until Finished is called"""
+        taken = []
+        while len(self.__heap) > 0 and len(self.__in_flight) < self.__max_in_flight:
+            entry = heapq.heappop(self.__heap)
+            key, file, source = entry
+            if not self.__valid(entry):
+                # discarded, or an out of date entry of a file discarded and pushed again
+                continue
+            if self.__current.pop(file, None) is not None:
+                # the out of date entries are still in the heap
+                self.__discarded.add(file)
+            self.__queued.discard(file)
+            self.__in_flight.add(file)
+            taken.append((file, source))
+        return taken
+
+    def Started(self, file):
+        """ Counts a task appended to the export stream without being scheduled (bundles, resumed files)"""
+        self.__in_flight.add(file)
+
+    def Finished(self, file):
+        """ Frees the room held by a file once its upload succeeded or failed. Returns False if it wasn't in flight"""
+        if file not in self.__in_flight:
+            return False
+        self.__in_flight.discard(file)
+        return True
+
+    def InFlight(self):
+        return len(self.__in_flight)
+
+    def __len__(self):
+        return len(self.__queued)
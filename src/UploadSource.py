@@ -0,0 +1,75 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import ntpath
+import os
+
+from src.DirectoryIndex import DirectoryIndex
+from src.DirectoryWatcher import match_name
+
+
+class UploadSource:
+    """ UploadSource is a file pattern to monitor, with the bucket and prefix where its files are uploaded"""
+
+    def __init__(self, pathname, bucket_name, bucket_path, priority=0):
+        self.pathname = pathname
+        self.bucket_name = bucket_name
+        self.bucket_path = bucket_path.removeprefix("/").removesuffix("/")
+        self.priority = priority
+        self.directory, self.pattern = os.path.split(pathname)
+
+        # state of the scans of this source: the files seen in the folder, and the ones that still need to be queued
+        self.index = DirectoryIndex(self.directory, self.pattern)
+        self.pending = set()
+        self.scan_interval = None
+        self.__rescan = None
+        self.bundler = None
+
+    @property
+    def rescan(self):
+        """ Event set to scan the folder before scan_interval is over"""
+        # created on first use, by the scan running in the event loop: before python 3.10 an Event is bound to the
+        # loop that is current when it is created, and sources can be created before asyncio.run
+        if self.__rescan is None:
+            self.__rescan = asyncio.Event()
+        return self.__rescan
+
+    @staticmethod
+    def FromConfig(config, bucket_name, bucket_path):
+        """ Creates a source from a configuration entry such as
+        {"PathName": "/var/log/app/*.log", "BucketName": "bucket", "ObjectKeyPrefix": "logs", "Priority": 1}.
+        BucketName and ObjectKeyPrefix default to the ones of the component."""
+        if "PathName" not in config:
+            raise ValueError(f"PathName is missing in source {config}")
+        return UploadSource(config["PathName"],
+                            config.get("BucketName", bucket_name),
+                            config.get("ObjectKeyPrefix", bucket_path),
+                            int(config.get("Priority", 0)))
+
+    def Update(self, source):
+        """ Takes the bucket, prefix and priority of another source with the same pathname, keeping the state of the
+        scans"""
+        self.bucket_name = source.bucket_name
+        self.bucket_path = source.bucket_path
+        self.priority = source.priority
+
+    def Matches(self, file):
+        directory, name = os.path.split(file)
+        return directory == self.directory and match_name(name, self.pattern)
+
+    def Key(self, file):
+        """ Returns the object key of a file: ObjectKeyPrefix/originalfilename"""
+        head, tail = ntpath.split(file)
+        return self.bucket_path+"/"+tail
@@ -0,0 +1,67 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+import unittest.mock
+import asyncio
+import time
+
+from src.AsyncStreamManagerClient import AsyncStreamManagerClient
+
+
+class TestAsyncStreamManagerClient(unittest.TestCase):
+
+    def test_concurrent_appends(self):
+        # each append blocks for 200ms, 8 appends on 8 workers should complete in about 200ms
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.side_effect = lambda stream_name, data: time.sleep(0.2) or len(data)
+        client = AsyncStreamManagerClient(mock_client, max_workers=8)
+
+        async def append():
+            ticks = 0
+            async def tick():
+                # the event loop keeps running while the appends are blocked
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+            ticker = asyncio.create_task(tick())
+            start = time.monotonic()
+            results = await asyncio.gather(*(client.append_message("stream", b"x" * i) for i in range(8)))
+            elapsed = time.monotonic() - start
+            ticker.cancel()
+            return results, elapsed, ticks
+
+        loop = asyncio.get_event_loop()
+        results, elapsed, ticks = loop.run_until_complete(append())
+        self.assertEqual(results, list(range(8)))
+        self.assertLess(elapsed, 1.0)
+        self.assertGreater(ticks, 5)
+        client.close()
+        mock_client.close.assert_called_once()
+
+    def test_read_messages(self):
+        mock_client = unittest.mock.MagicMock()
+        mock_client.read_messages.return_value = ["message"]
+        client = AsyncStreamManagerClient(mock_client)
+        loop = asyncio.get_event_loop()
+        self.assertEqual(loop.run_until_complete(client.read_messages("stream", None)), ["message"])
+        mock_client.read_messages.assert_called_once_with("stream", None)
+        mock_client.describe_message_stream.return_value = "info"
+        self.assertEqual(loop.run_until_complete(client.describe_message_stream("stream")), "info")
+        client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+
+from src.Backoff import Backoff
+
+
+class TestBackoff(unittest.TestCase):
+
+    def test_backoff(self):
+        backoff = Backoff(1, 10)
+        self.assertEqual([backoff.Next() for _ in range(6)], [1, 2, 4, 8, 10, 10])
+        backoff.Reset()
+        self.assertEqual(backoff.Next(), 1)
+        # the minimum is bounded by the maximum
+        self.assertEqual(Backoff(5, 2).Next(), 2)
@@ -0,0 +1,82 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import tempfile
+import time
+import unittest
+
+from stream_manager import (
+    ExportDefinition,
+    MessageStreamDefinition,
+    NotEnoughMessagesException,
+    ReadMessagesOptions,
+    S3ExportTaskDefinition,
+    S3ExportTaskExecutorConfig,
+    Status,
+    StatusConfig,
+    StatusMessage,
+)
+from stream_manager.util import Util
+
+from benchmarks.FakeStreamManagerClient import FakeStreamManagerClient
+from benchmarks.benchmark import benchmark
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_fake_client(self):
+        tmpdir = tempfile.mkdtemp()
+        f = open(tmpdir+"/test1.csv", "w")
+        f.write("test file 1!")
+        f.close()
+
+        client = FakeStreamManagerClient(append_latency=0, upload_latency=0, failure_rate=0)
+        client.create_message_stream(MessageStreamDefinition(name="Status"))
+        exports = ExportDefinition(s3_task_executor=[S3ExportTaskExecutorConfig(
+            identifier="S3TaskExecutor", status_config=StatusConfig(status_stream_name="Status"))])
+        client.create_message_stream(MessageStreamDefinition(name="Stream", export_definition=exports))
+        self.assertEqual(sorted(client.list_streams()), ["Status", "Stream"])
+
+        task = S3ExportTaskDefinition(input_url="file://"+tmpdir+"/test1.csv", bucket="bucket", key="test1.csv")
+        self.assertEqual(client.append_message("Stream", Util.validate_and_serialize_to_json_bytes(task)), 0)
+        # InProgress then Success
+        messages = client.read_messages("Status", ReadMessagesOptions(desired_start_sequence_number=0,
+                                                                      min_message_count=2, read_timeout_millis=5000))
+        statuses = [Util.deserialize_json_bytes_to_obj(message.payload, StatusMessage).status for message in messages]
+        self.assertEqual(statuses, [Status.InProgress, Status.Success])
+        self.assertEqual(client.uploaded_bytes, len("test file 1!"))
+        self.assertEqual(client.describe_message_stream("Status").storage_status.newest_sequence_number, 1)
+        with self.assertRaises(NotEnoughMessagesException):
+            client.read_messages("Status", ReadMessagesOptions(desired_start_sequence_number=2, read_timeout_millis=0))
+        client.close()
+
+    def test_benchmark(self):
+        result = benchmark(200, [100, 1000], client_options=dict(append_latency=0, upload_latency=0), timeout=60)
+        self.assertEqual(result["files"], 200)
+        self.assertGreater(result["files_per_second"], 0)
+        self.assertIsNotNone(result["upload_latency_p99"])
+        self.assertGreater(result["scans"], 0)
+        self.assertGreater(result["peak_rss_mib"], 0)
+
+        # with bundles, a task uploads several files
+        spool = tempfile.mkdtemp()
+        result = benchmark(200, [100], client_options=dict(append_latency=0, upload_latency=0), timeout=60,
+                           spool_dir=spool, bundle_format="tar", bundle_max_files=50, bundle_max_age=0)
+        self.assertEqual(result["files"], 200)
+        self.assertLess(result["tasks"], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import unittest
+
+from src.ConfigSubscription import LocalConfigSubscription, reconfigure_arguments, restart_keys
+
+
+class TestConfigSubscription(unittest.TestCase):
+
+    def test_reconfigure_arguments(self):
+        arguments = reconfigure_arguments({"PathName": "/data/*.csv", "BucketName": "bucket", "ObjectKeyPrefix": "/prefix/",
+                                           "Interval": "5", "LogLevel": "DEBUG",
+                                           "Sources": [{"PathName": "/logs/*.log", "Priority": 1}]})
+        self.assertEqual(arguments["pathname"], "/data/*.csv")
+        self.assertEqual(arguments["interval"], 5)
+        self.assertEqual(arguments["log_level"], "DEBUG")
+        self.assertEqual(len(arguments["sources"]), 1)
+        # additional sources default to the bucket and prefix of the component
+        self.assertEqual(arguments["sources"][0].bucket_name, "bucket")
+        self.assertEqual(arguments["sources"][0].bucket_path, "prefix")
+        # Sources might be a JSON string
+        arguments = reconfigure_arguments({"PathName": "/data/*.csv", "BucketName": "bucket", "Interval": 1,
+                                           "Sources": '[{"PathName": "/logs/*.log"}]'})
+        self.assertEqual(arguments["sources"][0].pathname, "/logs/*.log")
+        self.assertEqual(arguments["bucket_path"], "")
+        with self.assertRaises(ValueError):
+            reconfigure_arguments({"PathName": "/data/*.csv", "Interval": 1})
+
+    def test_restart_keys(self):
+        previous = {"PathName": "/data/*.csv", "Interval": "1", "ScanMode": "poll", "ExportStreams": "1"}
+        configuration = {"PathName": "/logs/*.log", "Interval": "5", "ScanMode": "watch", "ExportStreams": "1",
+                         "DedupMode": "skip"}
+        # the keys applied while the component runs are left out
+        self.assertEqual(restart_keys(previous, configuration), ["DedupMode", "ScanMode"])
+        self.assertEqual(restart_keys(previous, previous), [])
+
+    def test_local_subscription(self):
+        subscription = LocalConfigSubscription({"PathName": "/data/*.csv", "Interval": "1"})
+
+        async def follow():
+            subscription.Start()
+            task = asyncio.create_task(subscription.Next())
+            await asyncio.sleep(0)
+            self.assertFalse(task.done())
+            subscription.Update({"Interval": "5"})
+            return await task
+
+        loop = asyncio.get_event_loop()
+        self.assertEqual(loop.run_until_complete(follow()), {"PathName": "/data/*.csv", "Interval": "5"})
+        self.assertEqual(subscription.Current()["Interval"], "5")
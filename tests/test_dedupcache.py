@@ -0,0 +1,100 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+import unittest.mock
+
+from src import DedupCache as dedup_cache
+from src.DedupCache import DedupCache, hash_file
+
+
+class TestDedupCache(unittest.TestCase):
+
+    def test_hash_file(self):
+        tmpdir = tempfile.mkdtemp()
+        with open(tmpdir+"/test1.csv", "wb") as f:
+            f.write(b"test file 1!" * 1000)
+        open(tmpdir+"/empty.csv", "wb").close()
+        self.assertEqual(hash_file(tmpdir+"/test1.csv"), hashlib.sha256(b"test file 1!" * 1000).hexdigest())
+        # empty files can't be mapped, they are read instead
+        self.assertEqual(hash_file(tmpdir+"/empty.csv"), hashlib.sha256(b"").hexdigest())
+
+    def test_digest_reused(self):
+        tmpdir = tempfile.mkdtemp()
+        filename = tmpdir+"/test1.csv"
+        with open(filename, "w") as f:
+            f.write("test file 1!")
+        cache = DedupCache(tmpdir+"/dedup.db")
+        loop = asyncio.get_event_loop()
+        with unittest.mock.patch.object(dedup_cache, "hash_file", wraps=hash_file) as hash_mock:
+            digest = loop.run_until_complete(cache.Digest(filename))
+            self.assertEqual(loop.run_until_complete(cache.Digest(filename)), digest)
+            # the file didn't change, it is only read once
+            self.assertEqual(hash_mock.call_count, 1)
+            with open(filename, "w") as f:
+                f.write("test file 2!")
+            os.utime(filename, ns=(1, 1))
+            self.assertNotEqual(loop.run_until_complete(cache.Digest(filename)), digest)
+            self.assertEqual(hash_mock.call_count, 2)
+        cache.Close()
+
+    def test_persistence(self):
+        tmpdir = tempfile.mkdtemp()
+        cache = DedupCache(tmpdir+"/dedup.db")
+        cache.Add("bucket/a", "digest1")
+        self.assertTrue(cache.Contains("bucket/a", "digest1"))
+        # the digests are kept per prefix
+        self.assertFalse(cache.Contains("bucket/b", "digest1"))
+        cache.Close()
+
+        cache = DedupCache(tmpdir+"/dedup.db")
+        self.assertTrue(cache.Contains("bucket/a", "digest1"))
+        cache.Close()
+
+    def test_eviction(self):
+        tmpdir = tempfile.mkdtemp()
+        cache = DedupCache(tmpdir+"/dedup.db", max_entries=10)
+        for i in range(10):
+            cache.Add("bucket", f"digest{i}")
+            time.sleep(0.001)
+        # digest0 was looked up again, digest1 is now the least recently used
+        self.assertTrue(cache.Contains("bucket", "digest0"))
+        cache.Add("bucket", "digest10")
+        self.assertFalse(cache.Contains("bucket", "digest1"))
+        for i in [0] + list(range(2, 11)):
+            self.assertTrue(cache.Contains("bucket", f"digest{i}"))
+        cache.Close()
+
+    def test_prune(self):
+        tmpdir = tempfile.mkdtemp()
+        for name in ["test1.csv", "test2.csv"]:
+            with open(tmpdir+"/"+name, "w") as f:
+                f.write(name)
+        cache = DedupCache(tmpdir+"/dedup.db")
+        loop = asyncio.get_event_loop()
+        for name in ["test1.csv", "test2.csv"]:
+            loop.run_until_complete(cache.Digest(tmpdir+"/"+name))
+        # removed while the component was stopped
+        os.remove(tmpdir+"/test1.csv")
+        cache.Prune()
+        cache.Close()
+        db = sqlite3.connect(tmpdir+"/dedup.db")
+        self.assertEqual(db.execute("SELECT path FROM files").fetchall(), [(tmpdir+"/test2.csv",)])
+        db.close()
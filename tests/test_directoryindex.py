@@ -0,0 +1,87 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+import tempfile
+import os
+
+from src.DirectoryIndex import DirectoryIndex
+
+
+def write(filename, content, mtime=None):
+    f = open(filename, "a")
+    f.write(content)
+    f.close()
+    if mtime is not None:
+        os.utime(filename, (mtime, mtime))
+
+
+class TestDirectoryIndex(unittest.TestCase):
+
+    def test_refresh(self):
+        tmpdir = tempfile.mkdtemp()
+        index = DirectoryIndex(tmpdir, "*.csv")
+        changes = index.Refresh()
+        self.assertEqual(changes, ([], [], []))
+        self.assertIsNone(index.Newest())
+
+        write(tmpdir+"/test1.csv", "test file 1!", mtime=1000)
+        write(tmpdir+"/test2.csv", "test file 2!", mtime=2000)
+        write(tmpdir+"/test3.txt", "not matching", mtime=3000)
+        write(tmpdir+"/.test4.csv", "hidden", mtime=4000)
+        os.mkdir(tmpdir+"/folder.csv")
+        changes = index.Refresh()
+        self.assertEqual(sorted(changes.added), [tmpdir+"/test1.csv", tmpdir+"/test2.csv"])
+        self.assertEqual(index.Newest(), tmpdir+"/test2.csv")
+        self.assertEqual(len(index), 2)
+
+        # nothing changed, nothing to report
+        self.assertEqual(index.Refresh(), ([], [], []))
+
+        write(tmpdir+"/test1.csv", " more data", mtime=5000)
+        os.remove(tmpdir+"/test2.csv")
+        changes = index.Refresh()
+        self.assertEqual(changes, ([], [tmpdir+"/test1.csv"], [tmpdir+"/test2.csv"]))
+        self.assertEqual(index.Newest(), tmpdir+"/test1.csv")
+        self.assertEqual(index.Get(tmpdir+"/test1.csv").size, len("test file 1! more data"))
+        self.assertNotIn(tmpdir+"/test2.csv", index)
+
+    def test_replaced_file(self):
+        # a file replaced by another one with the same name is reported as a new file
+        tmpdir = tempfile.mkdtemp()
+        index = DirectoryIndex(tmpdir, "*.csv")
+        write(tmpdir+"/test1.csv", "test file 1!")
+        write(tmpdir+"/test1.tmp", "test file 1 again!")
+        index.Refresh()
+        os.replace(tmpdir+"/test1.tmp", tmpdir+"/test1.csv")
+        changes = index.Refresh()
+        self.assertEqual(changes.added, [tmpdir+"/test1.csv"])
+
+    def test_file_info(self):
+        # the size, mtime and inode of the files are packed, mtimes before 1970 included
+        tmpdir = tempfile.mkdtemp()
+        index = DirectoryIndex(tmpdir, "*.csv")
+        write(tmpdir+"/test1.csv", "test file 1!", mtime=-1000)
+        write(tmpdir+"/test2.csv", "test file 2!" * 1000, mtime=2**33)
+        index.Refresh()
+        for name in ["test1.csv", "test2.csv"]:
+            stat = os.stat(tmpdir+"/"+name)
+            self.assertEqual(index.Get(tmpdir+"/"+name), (stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        self.assertEqual(index.Get(tmpdir+"/test1.csv").mtime, -1000 * 10**9)
+        self.assertIsNone(index.Get(tmpdir+"/test3.csv"))
+        self.assertEqual(sorted(index), [tmpdir+"/test1.csv", tmpdir+"/test2.csv"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,10 +18,18 @@ import unittest.mock
 import tempfile
 import logging
 import asyncio
+import gzip
+import json
 import os
+import sqlite3
+import sys
 
+from src.ConfigSubscription import LocalConfigSubscription
 from src.DirectoryUploader import DirectoryUploader
+from src.ExportStream import ExportStream
+from src.UploadSource import UploadSource
 from stream_manager import (
+    NotEnoughMessagesException,
     StatusMessage,
     S3ExportTaskDefinition,
     EventType,
@@ -29,7 +37,7 @@ from stream_manager import (
     Status,
     StatusContext,
 )
-from stream_manager.data import Message
+from stream_manager.data import Message, MessageStreamInfo
 from stream_manager.util import Util
 
 
@@ -97,6 +105,741 @@ class TestDirectoryUploader(unittest.TestCase):
         loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
         self.assertFalse(os.path.exists(filename))
 
+    def test_ProcessStatus_drain(self):
+        # statuses are read in large batches back to back, and files are removed in batches
+        tmpdir = tempfile.mkdtemp()
+        batches = []
+        for batch in range(3):
+            messages = []
+            for i in range(10):
+                filename = tmpdir+f"/test{batch}-{i}.csv"
+                f = open(filename, "a")
+                f.write("test file!")
+                f.close()
+                task_def = S3ExportTaskDefinition(input_url="file://"+filename,bucket="bucket",key="key")
+                status_message = StatusMessage(event_type=EventType.S3Task,
+                                               status_level=StatusLevel.INFO,
+                                               status=Status.Success,
+                                               status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=i),
+                                               message="message",
+                                               timestamp_epoch_ms=1)
+                messages.append(Message(payload=Util.validate_and_serialize_to_json_bytes(status_message),
+                                        sequence_number=batch*10+i))
+            batches.append(messages)
+
+        mock_client = unittest.mock.MagicMock()
+        mock_client.read_messages.side_effect = batches + [NotEnoughMessagesException()]
+
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,status_batch_size=10)
+        loop = asyncio.get_event_loop()
+        for _ in range(4):
+            loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        self.assertEqual(os.listdir(tmpdir), [])
+        starts = [call.args[1].desired_start_sequence_number for call in mock_client.read_messages.call_args_list]
+        self.assertEqual(starts, [0, 10, 20, 30])
+        self.assertEqual(mock_client.read_messages.call_args_list[0].args[1].max_message_count, 10)
+
+    def test_post_upload_action(self):
+        tmpdir = tempfile.mkdtemp()
+        os.mkdir(tmpdir+"/data")
+        messages = []
+        for i in range(4):
+            filename = tmpdir+f"/data/test{i}.csv"
+            f = open(filename, "a")
+            f.write("test file!")
+            f.close()
+            os.utime(filename, (1000+i, 1000+i))
+            task_def = S3ExportTaskDefinition(input_url="file://"+filename,bucket="bucket",key="key")
+            status_message = StatusMessage(event_type=EventType.S3Task,
+                                           status_level=StatusLevel.INFO,
+                                           status=Status.Success,
+                                           status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=i),
+                                           message="message",
+                                           timestamp_epoch_ms=1)
+            messages.append(Message(payload=Util.validate_and_serialize_to_json_bytes(status_message),sequence_number=i))
+        mock_client = unittest.mock.MagicMock()
+        mock_client.read_messages.return_value = messages[:3]
+
+        # the uploaded files are hard linked into the retention folder, which keeps the newest 20 bytes
+        du = DirectoryUploader(tmpdir+"/data/*.csv","test-bucket","",1,logger=logger,client=mock_client,
+                               post_upload_action="retain",post_upload_path=tmpdir+"/retention",retention_max_bytes=20,
+                               post_upload_workers=2)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        self.assertEqual(os.listdir(tmpdir+"/data"), ["test3.csv"])
+        self.assertEqual(sorted(os.listdir(tmpdir+"/retention")), ["test1.csv", "test2.csv"])
+        du.Close()
+
+        # truncated files are left in place and not uploaded again
+        mock_client.read_messages.return_value = messages[3:]
+        du = DirectoryUploader(tmpdir+"/data/*.csv","test-bucket","",1,logger=logger,client=mock_client,
+                               post_upload_action="truncate",readiness="quiescent",quiescence_period=0)
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        self.assertEqual(os.listdir(tmpdir+"/data"), ["test3.csv"])
+        self.assertEqual(os.path.getsize(tmpdir+"/data/test3.csv"), 0)
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.append_message.assert_not_called()
+        du.Close()
+
+    def test_truncate_append(self):
+        tmpdir = tempfile.mkdtemp()
+        os.mkdir(tmpdir+"/data")
+        def write(content, mtime):
+            f = open(tmpdir+"/data/test.log", "a")
+            f.write(content)
+            f.close()
+            os.utime(tmpdir+"/data/test.log", (mtime, mtime))
+        write("first lines", 1000)
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/data/*.log","test-bucket","",1,logger=logger,client=mock_client,
+                               post_upload_action="truncate",readiness="quiescent",quiescence_period=0)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.append_message.assert_called_once()
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=Status.Success,
+                                       status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                       message="message",
+                                       timestamp_epoch_ms=1)
+        mock_client.read_messages.return_value = [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message),sequence_number=0)]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        self.assertEqual(os.path.getsize(tmpdir+"/data/test.log"), 0)
+        mock_client.read_messages.side_effect = NotEnoughMessagesException()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.append_message.assert_called_once()
+
+        # the lines appended once the file was truncated are uploaded
+        write("next lines", 2000)
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(mock_client.append_message.call_count, 2)
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        self.assertEqual(task_def.input_url, "file://"+tmpdir+"/data/test.log")
+        du.Close()
+
+    def test_bundle(self):
+        tmpdir = tempfile.mkdtemp()
+        os.mkdir(tmpdir+"/data")
+        for i in range(6):
+            f = open(tmpdir+f"/data/test{i}.csv", "a")
+            f.write(f"test file {i}!")
+            f.close()
+            os.utime(tmpdir+f"/data/test{i}.csv", (1000+i, 1000+i))
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/data/*.csv","test-bucket","prefix",1,logger=logger,client=mock_client,
+                               spool_dir=tmpdir+"/spool",bundle_format="tar",bundle_max_files=5)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+
+        # the 5 files that are not active are uploaded as a single bundle
+        mock_client.append_message.assert_called_once()
+        stream_name, payload = mock_client.append_message.call_args.args
+        task_def = Util.deserialize_json_bytes_to_obj(payload, S3ExportTaskDefinition)
+        self.assertTrue(task_def.key.startswith("prefix/bundle-"))
+        bundle = task_def.input_url.partition("file://")[2]
+        self.assertTrue(os.path.exists(bundle))
+
+        # once the bundle is uploaded, the bundle and the files it contains are deleted
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=Status.Success,
+                                       status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                       message="message",
+                                       timestamp_epoch_ms=1)
+        mock_client.read_messages.return_value = [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message))]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        self.assertEqual(os.listdir(tmpdir+"/data"), ["test5.csv"])
+        self.assertEqual(os.listdir(tmpdir+"/spool"), [])
+
+    def test_compress(self):
+        tmpdir = tempfile.mkdtemp()
+        os.mkdir(tmpdir+"/data")
+        for i in range(2):
+            f = open(tmpdir+f"/data/test{i}.csv", "a")
+            f.write(f"test file {i}!")
+            f.close()
+            os.utime(tmpdir+f"/data/test{i}.csv", (1000+i, 1000+i))
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/data/*.csv","test-bucket","prefix",1,logger=logger,client=mock_client,
+                               spool_dir=tmpdir+"/spool",compression="gzip",compression_workers=1)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+
+        # the compressed copy is uploaded under the original key plus the extension
+        mock_client.append_message.assert_called_once()
+        stream_name, payload = mock_client.append_message.call_args.args
+        task_def = Util.deserialize_json_bytes_to_obj(payload, S3ExportTaskDefinition)
+        self.assertEqual(task_def.key, "prefix/test0.csv.gz")
+        compressed = task_def.input_url.partition("file://")[2]
+        with gzip.open(compressed) as f:
+            self.assertEqual(f.read(), b"test file 0!")
+
+        # once uploaded, both the compressed copy and the original are deleted
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=Status.Success,
+                                       status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                       message="message",
+                                       timestamp_epoch_ms=1)
+        mock_client.read_messages.return_value = [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message))]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        du.Close()
+        self.assertEqual(os.listdir(tmpdir+"/data"), ["test1.csv"])
+        self.assertEqual(os.listdir(tmpdir+"/spool"), [])
+
+    def test_split(self):
+        tmpdir = tempfile.mkdtemp()
+        os.mkdir(tmpdir+"/data")
+        content = "".join(f"record {i:04d}\n" for i in range(100))
+        f = open(tmpdir+"/data/test1.csv", "a")
+        f.write(content)
+        f.close()
+        os.utime(tmpdir+"/data/test1.csv", (1000, 1000))
+        open(tmpdir+"/data/test2.csv", "a").close()
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/data/*.csv","test-bucket","prefix",1,logger=logger,client=mock_client,
+                               spool_dir=tmpdir+"/spool",split_size=500)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+
+        # each part is uploaded under a numbered key, the parts put together are the file
+        task_defs = sorted((Util.deserialize_json_bytes_to_obj(call.args[1], S3ExportTaskDefinition)
+                            for call in mock_client.append_message.call_args_list), key=lambda task_def: task_def.key)
+        self.assertEqual([task_def.key for task_def in task_defs],
+                         ["prefix/test1.csv.part00000", "prefix/test1.csv.part00001", "prefix/test1.csv.part00002"])
+        parts = []
+        for task_def in task_defs:
+            with open(task_def.input_url.partition("file://")[2]) as f:
+                parts.append(f.read())
+        self.assertEqual("".join(parts), content)
+
+        def status(task_def, status, sequence_number):
+            status_message = StatusMessage(event_type=EventType.S3Task,
+                                           status_level=StatusLevel.INFO,
+                                           status=status,
+                                           status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                           message="message",
+                                           timestamp_epoch_ms=1)
+            return Message(payload=Util.validate_and_serialize_to_json_bytes(status_message),sequence_number=sequence_number)
+
+        # only the part that failed is appended again, the file is kept until every part is uploaded
+        mock_client.read_messages.return_value = [status(task_defs[0], Status.Success, 0), status(task_defs[1], Status.Failure, 1),
+                                                  status(task_defs[2], Status.Success, 2)]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        self.assertEqual(sorted(os.listdir(tmpdir+"/data")), ["test1.csv", "test2.csv"])
+        mock_client.append_message.reset_mock()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.append_message.assert_called_once()
+        self.assertEqual(mock_client.append_message.call_args.args[1], Util.validate_and_serialize_to_json_bytes(task_defs[1]))
+
+        mock_client.read_messages.return_value = [status(task_defs[1], Status.Success, 3)]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        du.Close()
+        self.assertEqual(os.listdir(tmpdir+"/data"), ["test2.csv"])
+        self.assertEqual(os.listdir(tmpdir+"/spool"), [])
+
+    def test_split_in_flight(self):
+        tmpdir = tempfile.mkdtemp()
+        f = open(tmpdir+"/test1.csv", "a")
+        f.write("".join(f"record {i:04d}\n" for i in range(100)))
+        f.close()
+        os.utime(tmpdir+"/test1.csv", (1000, 1000))
+        open(tmpdir+"/test2.csv", "a").close()
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        # the parts of a file don't take more room in the export stream than max_in_flight_tasks
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,
+                               spool_dir=tmpdir+"/spool",split_size=300,max_in_flight_tasks=2)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(mock_client.append_message.call_count, 2)
+        self.assertEqual(du._DirectoryUploader__scheduler.InFlight(), 2)
+
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args_list[0].args[1], S3ExportTaskDefinition)
+        self.assertEqual(task_def.key, "/test1.csv.part00000")
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=Status.Success,
+                                       status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                       message="message",
+                                       timestamp_epoch_ms=1)
+        mock_client.read_messages.return_value = [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message),sequence_number=0)]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        loop.run_until_complete(du._DirectoryUploader__dispatchFiles())
+        self.assertEqual(mock_client.append_message.call_count, 3)
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        self.assertEqual(task_def.key, "/test1.csv.part00002")
+        du.Close()
+
+    def test_resume_from_ledger(self):
+        tmpdir = tempfile.mkdtemp()
+        ledger_path = tmpdir+"/ledger.db"
+        for name in ["test1.csv", "test2.csv", "test3.csv"]:
+            f = open(tmpdir+"/"+name, "a")
+            f.write("test file!")
+            f.close()
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        # first start: the streams are created from scratch and the files are queued
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,ledger_path=ledger_path)
+        mock_client.delete_message_stream.assert_called()
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(mock_client.append_message.call_count, 2)
+        du.Close()
+
+        # restart: the streams are kept and the files already queued are not queued again. The settings that
+        # changed are applied to the existing stream
+        mock_client = unittest.mock.MagicMock()
+        mock_client.list_streams.return_value = ["test-bucketStream", "test-bucketStreamStatus"]
+        mock_client.describe_message_stream.return_value = MessageStreamInfo(
+            definition=ExportStream("test-bucketStream").Definition())
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,ledger_path=ledger_path,
+                               stream_max_size=1024*1024*1024)
+        mock_client.delete_message_stream.assert_not_called()
+        mock_client.create_message_stream.assert_not_called()
+        mock_client.update_message_stream.assert_called_once()
+        definition = mock_client.update_message_stream.call_args.args[0]
+        self.assertEqual(definition.name, "test-bucketStream")
+        self.assertEqual(definition.max_size, 1024*1024*1024)
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.append_message.assert_not_called()
+        du.Close()
+
+        # restart after stream manager lost its streams: the ledger is reset and the files are queued again
+        mock_client = unittest.mock.MagicMock()
+        mock_client.list_streams.return_value = []
+        mock_client.append_message.return_value = 123
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,ledger_path=ledger_path)
+        mock_client.delete_message_stream.assert_called()
+        self.assertEqual(mock_client.create_message_stream.call_count, 2)
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(mock_client.append_message.call_count, 2)
+        du.Close()
+
+    def test_sources(self):
+        tmpdir = tempfile.mkdtemp()
+        os.mkdir(tmpdir+"/logs")
+        # the newest file of each source is its active file
+        for name, mtime in [("test1.csv", 1000), ("test2.csv", 2000), ("test1.log", 1000), ("test2.log", 1000),
+                            ("test3.log", 2000), ("test1.txt", 3000)]:
+            f = open(tmpdir+"/logs/"+name, "a")
+            f.write(name)
+            f.close()
+            os.utime(tmpdir+"/logs/"+name, (mtime, mtime))
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        # test1.csv and test1.log also match the last source, which has the highest priority
+        sources = [UploadSource(tmpdir+"/logs/*.csv","csv-bucket","csv",priority=1),
+                   UploadSource(tmpdir+"/logs/test1.*","test-bucket","first",priority=2)]
+        du = DirectoryUploader(tmpdir+"/logs/*.log","test-bucket","logs",1,logger=logger,client=mock_client,
+                               sources=sources)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+
+        uploads = {}
+        for call in mock_client.append_message.call_args_list:
+            task_def = Util.deserialize_json_bytes_to_obj(call.args[1], S3ExportTaskDefinition)
+            uploads[os.path.basename(task_def.input_url)] = (task_def.bucket, task_def.key)
+        self.assertEqual(uploads, {"test1.csv": ("test-bucket", "first/test1.csv"),
+                                   "test1.log": ("test-bucket", "first/test1.log"),
+                                   "test2.log": ("test-bucket", "logs/test2.log")})
+
+    def test_max_in_flight(self):
+        tmpdir = tempfile.mkdtemp()
+        for i, size in enumerate([400, 100, 300, 200, 500]):
+            f = open(tmpdir+f"/test{i}.csv", "a")
+            f.write("x" * size)
+            f.close()
+            os.utime(tmpdir+f"/test{i}.csv", (1000+i, 1000+i))
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,
+                               max_in_flight_tasks=2,schedule_policy="smallest")
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+
+        def uploaded():
+            return [os.path.basename(Util.deserialize_json_bytes_to_obj(call.args[1], S3ExportTaskDefinition).input_url)
+                    for call in mock_client.append_message.call_args_list]
+
+        # only the 2 smallest files are queued, test4.csv is the active file
+        self.assertEqual(uploaded(), ["test1.csv", "test3.csv"])
+        # the scheduled files are not checked again by the next scans, only the active file is still pending
+        self.assertEqual(du._DirectoryUploader__mainSource.pending, {tmpdir+"/test4.csv"})
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(len(uploaded()), 2)
+
+        # once an upload completes, the next file is queued
+        task_def = S3ExportTaskDefinition(input_url="file://"+tmpdir+"/test1.csv",bucket="test-bucket",key="/test1.csv")
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=Status.Success,
+                                       status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                       message="message",
+                                       timestamp_epoch_ms=1)
+        mock_client.read_messages.return_value = [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message))]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        loop.run_until_complete(du._DirectoryUploader__dispatchFiles())
+        self.assertEqual(uploaded(), ["test1.csv", "test3.csv", "test2.csv"])
+
+    def test_run_stops_tasks(self):
+        tmpdir = tempfile.mkdtemp()
+        mock_client = unittest.mock.MagicMock()
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,scan_mode="inotify")
+
+        async def run():
+            task = asyncio.create_task(du.Run())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            # the scan, watch, status, post-upload and dispatch tasks don't outlive Run
+            return [other for other in asyncio.all_tasks() if other is not asyncio.current_task()]
+
+        loop = asyncio.get_event_loop()
+        self.assertEqual(loop.run_until_complete(run()), [])
+        du.Close()
+
+    def test_quiescent(self):
+        tmpdir = tempfile.mkdtemp()
+        for name in ["test1.csv", "test2.csv", "test3.csv"]:
+            f = open(tmpdir+"/"+name, "a")
+            f.write(name)
+            f.close()
+        # test1.csv and test2.csv are complete, test3.csv is still being written
+        os.utime(tmpdir+"/test1.csv", (1000, 1000))
+        os.utime(tmpdir+"/test2.csv", (2000, 2000))
+        open(tmpdir+"/test2.csv.done", "w").close()
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/*","test-bucket","",1,logger=logger,client=mock_client,
+                               readiness="quiescent",quiescence_period=60,readiness_check="marker")
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+
+        # test2.csv is uploaded although it is the newest complete file, its marker is not
+        mock_client.append_message.assert_called_once()
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        self.assertEqual(task_def.input_url, "file://"+tmpdir+"/test2.csv")
+
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=Status.Success,
+                                       status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                       message="message",
+                                       timestamp_epoch_ms=1)
+        mock_client.read_messages.return_value = [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message))]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        self.assertEqual(sorted(os.listdir(tmpdir)), ["test1.csv", "test3.csv"])
+
+    def test_uploaded_during_readiness_checks(self):
+        tmpdir = tempfile.mkdtemp()
+        for name in ["test1.csv", "test2.csv"]:
+            f = open(tmpdir+"/"+name, "a")
+            f.write(name)
+            f.close()
+        os.utime(tmpdir+"/test1.csv", (1000, 1000))
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client)
+        ready_files = du._DirectoryUploader__readyFiles
+
+        def queued_by_watcher(source, files):
+            # while the checks run, the watcher queues the file, it is uploaded and removed
+            ready = ready_files(source, files)
+            for file in ready:
+                du._DirectoryUploader__markProcessed(file)
+                du._DirectoryUploader__filesProcessed.discard(file)
+                os.remove(file)
+            return ready
+
+        du._DirectoryUploader__readyFiles = queued_by_watcher
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.append_message.assert_not_called()
+
+    def test_export_streams(self):
+        tmpdir = tempfile.mkdtemp()
+        for i in range(4):
+            f = open(tmpdir+f"/test{i}.csv", "a")
+            f.write(f"test file {i}!")
+            f.close()
+            os.utime(tmpdir+f"/test{i}.csv", (1000+i, 1000+i))
+        mock_client = unittest.mock.MagicMock()
+        mock_client.list_streams.return_value = ["test-bucketStream5", "test-bucketStream5Status"]
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,
+                               export_streams=3,shard_policy="least-loaded",stream_persistence="memory")
+        created = [call.args[0] for call in mock_client.create_message_stream.call_args_list]
+        self.assertEqual(sorted(definition.name for definition in created),
+                         ["test-bucketStream", "test-bucketStream1", "test-bucketStream1Status", "test-bucketStream2",
+                          "test-bucketStream2Status", "test-bucketStreamStatus"])
+        # the stream left over by a previous configuration is deleted
+        deleted = [call.kwargs["stream_name"] for call in mock_client.delete_message_stream.call_args_list]
+        self.assertIn("test-bucketStream5", deleted)
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        streams = [call.args[0] for call in mock_client.append_message.call_args_list]
+        self.assertEqual(sorted(streams), ["test-bucketStream", "test-bucketStream1", "test-bucketStream2"])
+
+        # the statuses of all the status streams are read
+        def read_messages(stream_name, options):
+            file = tmpdir+"/test"+str(streams.index(stream_name.removesuffix("Status")))+".csv"
+            task_def = S3ExportTaskDefinition(input_url="file://"+file,bucket="test-bucket",key="key")
+            status_message = StatusMessage(event_type=EventType.S3Task,
+                                           status_level=StatusLevel.INFO,
+                                           status=Status.Success,
+                                           status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                           message="message",
+                                           timestamp_epoch_ms=1)
+            return [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message),sequence_number=0)]
+        mock_client.read_messages.side_effect = read_messages
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        self.assertEqual(os.listdir(tmpdir), ["test3.csv"])
+
+    def test_metrics(self):
+        tmpdir = tempfile.mkdtemp()
+        for i in range(2):
+            f = open(tmpdir+f"/test{i}.csv", "a")
+            f.write(f"test file {i}!")
+            f.close()
+            os.utime(tmpdir+f"/test{i}.csv", (1000+i, 1000+i))
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+        mock_client.describe_message_stream.return_value = MessageStreamInfo(
+            storage_status=MessageStreamInfo.storageStatus(oldest_sequence_number=0, newest_sequence_number=4))
+
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,
+                               metrics_sink="json",metrics_path=tmpdir+"/metrics.json")
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+
+        task_def = S3ExportTaskDefinition(input_url="file://"+tmpdir+"/test0.csv",bucket="test-bucket",key="/test0.csv")
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=Status.Success,
+                                       status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                       message="message",
+                                       timestamp_epoch_ms=1)
+        mock_client.read_messages.return_value = [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message),sequence_number=0)]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        loop.run_until_complete(du._DirectoryUploader__reportMetrics(under_test=True))
+
+        with open(tmpdir+"/metrics.json") as f:
+            metrics = json.load(f)
+        self.assertEqual(metrics["counters"]["appends"], 1)
+        self.assertEqual(metrics["counters"]["uploads"], 1)
+        self.assertEqual(metrics["counters"]["uploaded_bytes"], len("test file 0!"))
+        self.assertEqual(metrics["counters"]["files_found"], 2)
+        self.assertEqual(metrics["summaries"]["upload_latency_seconds"]["count"], 1)
+        self.assertEqual(metrics["summaries"]["scan_duration_seconds"]["count"], 1)
+        self.assertEqual(metrics["gauges"]["files_seen"], 2)
+        # statuses 1 to 4 are not processed yet
+        self.assertEqual(metrics["gauges"]["status_lag"], 4)
+
+    def test_dedup(self):
+        tmpdir = tempfile.mkdtemp()
+        os.mkdir(tmpdir+"/data")
+        def write(name, content, mtime):
+            f = open(tmpdir+"/data/"+name, "a")
+            f.write(content)
+            f.close()
+            os.utime(tmpdir+"/data/"+name, (mtime, mtime))
+        write("test1.csv", "snapshot", 1000)
+        write("test2.csv", "other", 2000)
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/data/*.csv","test-bucket","",1,logger=logger,client=mock_client,
+                               dedup="delete",dedup_path=tmpdir+"/dedup.db")
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.append_message.assert_called_once()
+
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=Status.Success,
+                                       status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                       message="message",
+                                       timestamp_epoch_ms=1)
+        mock_client.read_messages.return_value = [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message),sequence_number=0)]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+        self.assertEqual(os.listdir(tmpdir+"/data"), ["test2.csv"])
+
+        # the producer writes the same snapshot again, it is deleted without being uploaded
+        write("test3.csv", "snapshot", 3000)
+        write("test4.csv", "new", 4000)
+        mock_client.read_messages.side_effect = NotEnoughMessagesException()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(mock_client.append_message.call_count, 2)
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        self.assertEqual(task_def.input_url, "file://"+tmpdir+"/data/test2.csv")
+        self.assertEqual(sorted(os.listdir(tmpdir+"/data")), ["test2.csv", "test4.csv"])
+
+        # the digests of the files removed from the folder are forgotten
+        db = sqlite3.connect(tmpdir+"/dedup.db")
+        self.assertEqual(db.execute("SELECT path FROM files").fetchall(), [(tmpdir+"/data/test2.csv",)])
+        os.remove(tmpdir+"/data/test2.csv")
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(db.execute("SELECT path FROM files").fetchall(), [])
+        db.close()
+        du.Close()
+
+    def test_dedup_skip(self):
+        tmpdir = tempfile.mkdtemp()
+        os.mkdir(tmpdir+"/data")
+        def write(name, content, mtime, mode="a"):
+            f = open(tmpdir+"/data/"+name, mode)
+            f.write(content)
+            f.close()
+            os.utime(tmpdir+"/data/"+name, (mtime, mtime))
+        write("test1.csv", "snapshot", 1000)
+        write("test2.csv", "other", 2000)
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/data/*.csv","test-bucket","",1,logger=logger,client=mock_client,
+                               dedup="skip",dedup_path=tmpdir+"/dedup.db")
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.append_message.assert_called_once()
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        status_message = StatusMessage(event_type=EventType.S3Task,
+                                       status_level=StatusLevel.INFO,
+                                       status=Status.Success,
+                                       status_context=StatusContext(s3_export_task_definition=task_def,sequence_number=123),
+                                       message="message",
+                                       timestamp_epoch_ms=1)
+        mock_client.read_messages.return_value = [Message(payload=Util.validate_and_serialize_to_json_bytes(status_message),sequence_number=0)]
+        loop.run_until_complete(du._DirectoryUploader__processStatus(under_test=True))
+
+        # the duplicate is left in the folder without being uploaded, and it is not hashed again
+        write("test3.csv", "snapshot", 3000)
+        write("test4.csv", "new", 4000)
+        mock_client.read_messages.side_effect = NotEnoughMessagesException()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(mock_client.append_message.call_count, 2)
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        self.assertEqual(task_def.input_url, "file://"+tmpdir+"/data/test2.csv")
+        self.assertIn("test3.csv", os.listdir(tmpdir+"/data"))
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(mock_client.append_message.call_count, 2)
+
+        # once rewritten with a new content, the duplicate is uploaded
+        write("test3.csv", "new snapshot", 3500, mode="w")
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        self.assertEqual(mock_client.append_message.call_count, 3)
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        self.assertEqual(task_def.input_url, "file://"+tmpdir+"/data/test3.csv")
+        du.Close()
+
+    def test_reconfigure(self):
+        tmpdir = tempfile.mkdtemp()
+        for folder in ["data", "logs"]:
+            os.mkdir(tmpdir+"/"+folder)
+            for i in range(2):
+                f = open(tmpdir+f"/{folder}/test{i}.csv", "a")
+                f.write(f"test file {i}!")
+                f.close()
+                os.utime(tmpdir+f"/{folder}/test{i}.csv", (1000+i, 1000+i))
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+
+        du = DirectoryUploader(tmpdir+"/data/*.csv","test-bucket","prefix",1,logger=logger,client=mock_client)
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.append_message.assert_called_once()
+        mock_client.reset_mock()
+
+        # a new source and a new prefix are applied without touching the streams or the files already queued
+        du.Reconfigure(bucket_path="other", interval=2, sources=[UploadSource(tmpdir+"/logs/*.csv", "logs-bucket", "logs")])
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        mock_client.delete_message_stream.assert_not_called()
+        mock_client.create_message_stream.assert_not_called()
+        task_defs = [Util.deserialize_json_bytes_to_obj(call.args[1], S3ExportTaskDefinition)
+                     for call in mock_client.append_message.call_args_list]
+        self.assertEqual([(task_def.bucket, task_def.key) for task_def in task_defs], [("logs-bucket", "logs/test0.csv")])
+
+        # the main source keeps its state when only its prefix changes
+        f = open(tmpdir+"/data/test2.csv", "a")
+        f.write("test file 2!")
+        f.close()
+        os.utime(tmpdir+"/data/test2.csv", (1002, 1002))
+        mock_client.reset_mock()
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        self.assertEqual(task_def.key, "other/test1.csv")
+        mock_client.append_message.assert_called_once()
+
+        # the pending files of the main source go to a new source with a higher priority
+        f = open(tmpdir+"/data/test3.csv", "a")
+        f.write("test file 3!")
+        f.close()
+        os.utime(tmpdir+"/data/test3.csv", (1003, 1003))
+        mock_client.reset_mock()
+        du.Reconfigure(sources=[UploadSource(tmpdir+"/logs/*.csv", "logs-bucket", "logs"),
+                                UploadSource(tmpdir+"/data/test[23].csv", "high-bucket", "high", priority=1)])
+        self.assertEqual(du._DirectoryUploader__mainSource.pending, set())
+        loop.run_until_complete(du._DirectoryUploader__scan(under_test=True))
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        self.assertEqual((task_def.bucket, task_def.key), ("high-bucket", "high/test2.csv"))
+        mock_client.append_message.assert_called_once()
+
+    def test_live_configuration(self):
+        tmpdir = tempfile.mkdtemp()
+        for folder in ["data", "logs"]:
+            os.mkdir(tmpdir+"/"+folder)
+        mock_client = unittest.mock.MagicMock()
+        mock_client.append_message.return_value = 123
+        mock_client.read_messages.side_effect = NotEnoughMessagesException()
+        configuration = LocalConfigSubscription({"PathName": tmpdir+"/data/*.csv", "BucketName": "test-bucket",
+                                                 "ObjectKeyPrefix": "", "Interval": "1", "LogLevel": "DEBUG"})
+        du = DirectoryUploader(tmpdir+"/data/*.csv","test-bucket","",1,logger=logger,client=mock_client,
+                               configuration=configuration)
+
+        async def run():
+            task = asyncio.create_task(du.Run())
+            await asyncio.sleep(0.1)
+            # the uploader follows the new PathName without being restarted, ScanMode needs a restart
+            configuration.Update({"PathName": tmpdir+"/logs/*.csv", "Interval": "1", "ScanMode": "watch"})
+            for i in range(2):
+                f = open(tmpdir+f"/logs/test{i}.csv", "a")
+                f.write(f"test file {i}!")
+                f.close()
+                os.utime(tmpdir+f"/logs/test{i}.csv", (1000+i, 1000+i))
+            for _ in range(50):
+                if mock_client.append_message.called:
+                    break
+                await asyncio.sleep(0.1)
+            self.assertFalse(task.done())
+            task.cancel()
+
+        loop = asyncio.get_event_loop()
+        with self.assertLogs(logger, logging.WARNING) as logs:
+            loop.run_until_complete(run())
+        self.assertTrue(any("ScanMode changed" in line for line in logs.output))
+        mock_client.append_message.assert_called_once()
+        task_def = Util.deserialize_json_bytes_to_obj(mock_client.append_message.call_args.args[1], S3ExportTaskDefinition)
+        self.assertEqual(task_def.input_url, "file://"+tmpdir+"/logs/test0.csv")
+        du.Close()
+
     def test_scan_dirnotexist(self):
         fakedir = "/does/not/exists/*.cvs"
         mock_client = unittest.mock.MagicMock()
@@ -115,6 +858,33 @@ class TestDirectoryUploader(unittest.TestCase):
         mock_error.assert_called_once()
 
 
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is only available on linux")
+    def test_watch(self):
+        tmpdir = tempfile.mkdtemp()
+        mock_client = unittest.mock.MagicMock()
+        append_mock = unittest.mock.MagicMock()
+        append_mock.return_value = 123
+        mock_client.append_message = append_mock
+
+        du = DirectoryUploader(tmpdir+"/*.csv","test-bucket","",1,logger=logger,client=mock_client,scan_mode="inotify")
+
+        async def watch():
+            task = asyncio.create_task(du._DirectoryUploader__watch())
+            await asyncio.sleep(0.1)
+            # with inotify, a single file is uploaded as soon as it is closed
+            f = open(tmpdir+"/test1.csv", "a")
+            f.write("test file 1!")
+            f.close()
+            for _ in range(50):
+                if append_mock.called:
+                    break
+                await asyncio.sleep(0.1)
+            task.cancel()
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(watch())
+        append_mock.assert_called_once()
+
     def test_wrongpath(self):
         # testing what happens if the wildchar is not in the file name.
         # this should get caught as an invalid directory
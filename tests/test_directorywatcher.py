@@ -0,0 +1,72 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+import tempfile
+import logging
+import asyncio
+import os
+import sys
+
+from src.DirectoryWatcher import DirectoryWatcher, match_name
+
+
+class TestDirectoryWatcher(unittest.TestCase):
+
+    def test_match_name(self):
+        self.assertTrue(match_name("test1.csv", "*.csv"))
+        self.assertFalse(match_name("test1.txt", "*.csv"))
+        # hidden files are only matched when the pattern starts with a dot, like glob.glob
+        self.assertFalse(match_name(".test1.csv", "*.csv"))
+        self.assertTrue(match_name(".test1.csv", ".*.csv"))
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is only available on linux")
+    def test_watch(self):
+        tmpdir = tempfile.mkdtemp()
+
+        async def watch():
+            watcher = DirectoryWatcher(tmpdir, "*.csv", logger)
+            watcher.Start()
+            try:
+                for name in ["ignored.txt", ".hidden.csv", "test1.csv", "moved.tmp"]:
+                    f = open(tmpdir + "/" + name, "a")
+                    f.write("test file!")
+                    f.close()
+                os.rename(tmpdir + "/moved.tmp", tmpdir + "/moved.csv")
+                return [await asyncio.wait_for(watcher.Get(), 5), await asyncio.wait_for(watcher.Get(), 5)]
+            finally:
+                watcher.Close()
+
+        loop = asyncio.get_event_loop()
+        files = loop.run_until_complete(watch())
+        self.assertEqual(files, [tmpdir + "/test1.csv", tmpdir + "/moved.csv"])
+
+    def test_watch_dirnotexist(self):
+        async def watch():
+            watcher = DirectoryWatcher("/does/not/exists", "*.csv", logger)
+            try:
+                watcher.Start()
+            finally:
+                watcher.Close()
+
+        loop = asyncio.get_event_loop()
+        with self.assertRaises(OSError):
+            loop.run_until_complete(watch())
+
+
+logging.basicConfig(level=logging.DEBUG)
+logger=logging.getLogger()
+
+if __name__ == '__main__':
+    unittest.main()
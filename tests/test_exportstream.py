@@ -0,0 +1,66 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+
+from stream_manager import Persistence, StrategyOnFull
+
+from src.ExportStream import ExportStream
+
+
+class TestExportStream(unittest.TestCase):
+
+    def test_names(self):
+        self.assertEqual(ExportStream.Names("bucket", 1), ["bucketStream"])
+        self.assertEqual(ExportStream.Names("bucket", 3), ["bucketStream", "bucketStream1", "bucketStream2"])
+        self.assertTrue(ExportStream.IsShard("bucket", "bucketStream"))
+        self.assertTrue(ExportStream.IsShard("bucket", "bucketStream12Status"))
+        self.assertFalse(ExportStream.IsShard("bucket", "otherbucketStream"))
+        self.assertFalse(ExportStream.IsShard("bucket", "bucketStreamX"))
+
+    def test_shard(self):
+        shards = [ExportStream.Shard(f"/data/test{i}.csv", 4) for i in range(100)]
+        self.assertEqual(shards, [ExportStream.Shard(f"/data/test{i}.csv", 4) for i in range(100)])
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+
+    def test_definition(self):
+        stream = ExportStream("bucketStream1")
+        definition = stream.Definition()
+        self.assertEqual(definition.name, "bucketStream1")
+        self.assertEqual(definition.strategy_on_full, StrategyOnFull.OverwriteOldestData)
+        self.assertEqual(definition.max_size, 256*1024*1024)
+        self.assertIsNone(definition.persistence)
+        executor = definition.export_definition.s3_task_executor[0]
+        self.assertEqual(executor.status_config.status_stream_name, "bucketStream1Status")
+
+        definition = stream.Definition(1024*1024*1024, 64*1024*1024, "memory", True)
+        self.assertEqual(definition.max_size, 1024*1024*1024)
+        self.assertEqual(definition.stream_segment_size, 64*1024*1024)
+        self.assertEqual(definition.persistence, Persistence.Memory)
+        self.assertTrue(definition.flush_on_write)
+        self.assertEqual(stream.StatusDefinition().name, "bucketStream1Status")
+
+    def test_changes(self):
+        stream = ExportStream("bucketStream")
+        current = stream.Definition(1024*1024*1024)
+        self.assertEqual(ExportStream.Changes(current), {})
+        self.assertEqual(ExportStream.Changes(current, 1024*1024*1024, flush_on_write=True), {"flush_on_write": True})
+        current.strategy_on_full = StrategyOnFull.RejectNewData
+        self.assertEqual(ExportStream.Changes(current, 512*1024*1024, persistence="memory"),
+                         {"strategy_on_full": StrategyOnFull.OverwriteOldestData, "max_size": 512*1024*1024,
+                          "persistence": Persistence.Memory})
+
+
+if __name__ == '__main__':
+    unittest.main()
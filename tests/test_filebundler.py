@@ -0,0 +1,79 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+import unittest.mock
+import tempfile
+import tarfile
+import zipfile
+
+from src.FileBundler import FileBundler
+
+
+class TestFileBundler(unittest.TestCase):
+
+    def test_limits(self):
+        bundler = FileBundler("tar", max_bytes=100, max_files=3, max_age=60, max_file_size=50)
+        self.assertTrue(bundler.Eligible(50))
+        self.assertFalse(bundler.Eligible(51))
+        self.assertFalse(bundler.Add("a", 10))
+        self.assertFalse(bundler.Add("b", 10))
+        # full on the number of files
+        self.assertTrue(bundler.Add("c", 10))
+        self.assertEqual(bundler.Take(), ["a", "b", "c"])
+        self.assertFalse(bundler.Add("d", 50))
+        # full on the size
+        self.assertTrue(bundler.Add("e", 50))
+        self.assertEqual(bundler.Take(), ["d", "e"])
+        self.assertEqual(bundler.Take(), [])
+
+    def test_age(self):
+        bundler = FileBundler("tar", max_age=60)
+        self.assertFalse(bundler.Due())
+        with unittest.mock.patch("time.monotonic", return_value=1000):
+            bundler.Add("a", 10)
+        with unittest.mock.patch("time.monotonic", return_value=1059):
+            self.assertFalse(bundler.Due())
+        with unittest.mock.patch("time.monotonic", return_value=1060):
+            self.assertTrue(bundler.Due())
+
+    def test_write(self):
+        tmpdir = tempfile.mkdtemp()
+        members = []
+        for i in range(3):
+            f = open(tmpdir+f"/test{i}.csv", "a")
+            f.write(f"test file {i}!")
+            f.close()
+            members.append(tmpdir+f"/test{i}.csv")
+        members.append(tmpdir+"/missing.csv")
+
+        written = FileBundler("tar").Write(tmpdir+"/bundle.tar", members)
+        self.assertEqual(written, members[:3])
+        with tarfile.open(tmpdir+"/bundle.tar") as archive:
+            self.assertEqual(archive.getnames(), ["test0.csv", "test1.csv", "test2.csv"])
+            self.assertEqual(archive.extractfile("test1.csv").read(), b"test file 1!")
+
+        written = FileBundler("zip").Write(tmpdir+"/bundle.zip", members)
+        self.assertEqual(written, members[:3])
+        with zipfile.ZipFile(tmpdir+"/bundle.zip") as archive:
+            self.assertEqual(archive.namelist(), ["test0.csv", "test1.csv", "test2.csv"])
+            self.assertEqual(archive.read("test2.csv"), b"test file 2!")
+
+    def test_invalid_format(self):
+        with self.assertRaises(ValueError):
+            FileBundler("rar")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+import tempfile
+import asyncio
+import gzip
+import tarfile
+
+from src.FileBundler import FileBundler
+from src.FileCompressor import FileCompressor, codec_available, zstandard
+
+
+class TestFileCompressor(unittest.TestCase):
+
+    def test_gzip(self):
+        tmpdir = tempfile.mkdtemp()
+        content = b"timestamp,value\n" + b"".join(f"{i},{i*i}\n".encode() for i in range(100000))
+        f = open(tmpdir+"/test1.csv", "wb")
+        f.write(content)
+        f.close()
+
+        compressor = FileCompressor("gzip", workers=1)
+        self.assertEqual(compressor.Extension(), ".gz")
+        loop = asyncio.get_event_loop()
+        try:
+            size = loop.run_until_complete(compressor.Compress(tmpdir+"/test1.csv", tmpdir+"/test1.csv.gz"))
+        finally:
+            compressor.Close()
+        self.assertLess(size, len(content) / 2)
+        with gzip.open(tmpdir+"/test1.csv.gz") as f:
+            self.assertEqual(f.read(), content)
+
+    def test_codec_available(self):
+        self.assertTrue(codec_available("gzip"))
+        self.assertEqual(codec_available("zstd"), zstandard is not None)
+        if zstandard is None:
+            with self.assertRaises(ValueError):
+                FileCompressor("zstd")
+
+    @unittest.skipUnless(zstandard, "the zstandard package is not installed")
+    def test_zstd(self):
+        tmpdir = tempfile.mkdtemp()
+        f = open(tmpdir+"/test1.csv", "wb")
+        f.write(b"test file 1!" * 1000)
+        f.close()
+
+        compressor = FileCompressor("zstd", workers=1)
+        self.assertEqual(compressor.Extension(), ".zst")
+        loop = asyncio.get_event_loop()
+        try:
+            loop.run_until_complete(compressor.Compress(tmpdir+"/test1.csv", tmpdir+"/test1.csv.zst"))
+        finally:
+            compressor.Close()
+        with open(tmpdir+"/test1.csv.zst", "rb") as f:
+            self.assertEqual(zstandard.ZstdDecompressor().stream_reader(f).read(), b"test file 1!" * 1000)
+
+    def test_compressed_bundle(self):
+        tmpdir = tempfile.mkdtemp()
+        f = open(tmpdir+"/test1.csv", "a")
+        f.write("test file 1!")
+        f.close()
+        bundler = FileBundler("tar", compressor=FileCompressor("gzip"))
+        self.assertTrue(bundler.NewName().endswith(".tar.gz"))
+        bundler.Write(tmpdir+"/bundle.tar.gz", [tmpdir+"/test1.csv"])
+        with tarfile.open(tmpdir+"/bundle.tar.gz", "r:gz") as archive:
+            self.assertEqual(archive.extractfile("test1.csv").read(), b"test file 1!")
+
+    def test_invalid_codec(self):
+        with self.assertRaises(ValueError):
+            FileCompressor("lz4")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from src.FileSplitter import FileSplitter, copy_range, split_ranges
+
+
+class TestFileSplitter(unittest.TestCase):
+
+    def test_split_ranges(self):
+        tmpdir = tempfile.mkdtemp()
+        filename = tmpdir+"/test1.csv"
+        content = b"".join(f"record {i:04d}\n".encode() for i in range(100))
+        with open(filename, "wb") as f:
+            f.write(content)
+        ranges = split_ranges(filename, 100)
+        # the parts follow each other, end with a record and fit in 100 bytes
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], len(content))
+        for (start, end), (next_start, next_end) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, next_start)
+        for start, end in ranges:
+            self.assertLessEqual(end - start, 100)
+            self.assertTrue(content[start:end].endswith(b"\n"))
+        self.assertEqual(split_ranges(filename, len(content)), [(0, len(content))])
+        # without delimiter the file is cut every part_size bytes
+        self.assertEqual(split_ranges(filename, 500, None), [(0, 500), (500, 1000), (1000, 1200)])
+
+    def test_large_record(self):
+        tmpdir = tempfile.mkdtemp()
+        filename = tmpdir+"/test1.csv"
+        with open(filename, "wb") as f:
+            f.write(b"a" * 250 + b"\n" + b"b" * 10 + b"\n" + b"c" * 50)
+        # a record larger than a part makes a larger part
+        self.assertEqual(split_ranges(filename, 100), [(0, 251), (251, 312)])
+        with open(filename, "wb") as f:
+            f.write(b"a" * 250)
+        self.assertEqual(split_ranges(filename, 100), [(0, 250)])
+
+    def test_copy_range(self):
+        tmpdir = tempfile.mkdtemp()
+        filename = tmpdir+"/test1.csv"
+        content = os.urandom(3 * 1024 * 1024)
+        with open(filename, "wb") as f:
+            f.write(content)
+        copy_range(filename, tmpdir+"/part", 1000, 2 * 1024 * 1024 + 7)
+        with open(tmpdir+"/part", "rb") as f:
+            self.assertEqual(f.read(), content[1000:2 * 1024 * 1024 + 7])
+        # the data is read and written when the kernel can't copy it
+        with unittest.mock.patch("os.copy_file_range", side_effect=OSError(18, "Invalid cross-device link")):
+            copy_range(filename, tmpdir+"/part", 10, 1024 * 1024 + 10)
+        with open(tmpdir+"/part", "rb") as f:
+            self.assertEqual(f.read(), content[10:1024 * 1024 + 10])
+        with self.assertRaises(OSError):
+            copy_range(filename, tmpdir+"/part", 0, len(content) + 1)
+
+    def test_names(self):
+        splitter = FileSplitter(100)
+        self.assertTrue(splitter.Eligible(101))
+        self.assertFalse(splitter.Eligible(100))
+        self.assertTrue(splitter.NewName("/data/test1.csv").endswith("-test1.csv"))
+        self.assertEqual(FileSplitter.PartName("prefix/test1.csv", 2), "prefix/test1.csv.part00002")
+        with self.assertRaises(ValueError):
+            FileSplitter(0)
@@ -0,0 +1,70 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import json
+import tempfile
+import unittest
+import unittest.mock
+import urllib.error
+import urllib.request
+
+from src.MetricsSink import PrometheusSink, JsonFileSink, StreamSink
+from src.UploadMetrics import UploadMetrics
+
+
+class TestMetricsSink(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = UploadMetrics()
+        self.metrics.Count("uploads", 3)
+
+    def test_prometheus(self):
+        sink = PrometheusSink(port=0)
+        sink.Start()
+        try:
+            loop = asyncio.get_event_loop()
+            loop.run_until_complete(sink.Publish(self.metrics))
+            url = f"http://127.0.0.1:{sink.Port()}"
+            with urllib.request.urlopen(url + "/metrics") as response:
+                self.assertIn("file_uploader_uploads_total 3", response.read().decode())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(url + "/")
+        finally:
+            sink.Close()
+
+    def test_json(self):
+        path = tempfile.mkdtemp() + "/metrics/metrics.json"
+        sink = JsonFileSink(path)
+        sink.Start()
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(sink.Publish(self.metrics))
+        with open(path) as f:
+            self.assertEqual(json.load(f)["counters"], {"uploads": 3})
+        sink.Close()
+
+    def test_stream(self):
+        client = unittest.mock.MagicMock()
+        client.append_message = unittest.mock.AsyncMock(return_value=0)
+        sink = StreamSink(client, "bucketMetrics")
+        self.assertEqual(sink.Definition().name, "bucketMetrics")
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(sink.Publish(self.metrics))
+        stream_name, payload = client.append_message.call_args.args
+        self.assertEqual(stream_name, "bucketMetrics")
+        self.assertEqual(json.loads(payload)["counters"], {"uploads": 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
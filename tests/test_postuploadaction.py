@@ -0,0 +1,106 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from src.PostUploadAction import PostUploadAction, RetentionWindow
+
+
+class TestPostUploadAction(unittest.TestCase):
+
+    def write(self, path, content, mtime=None):
+        with open(path, "w") as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_delete_truncate(self):
+        tmpdir = tempfile.mkdtemp()
+        self.write(tmpdir+"/test1.csv", "test file 1!")
+        self.write(tmpdir+"/test2.csv", "test file 2!")
+        PostUploadAction("delete").Apply(tmpdir+"/test1.csv")
+        action = PostUploadAction("truncate")
+        action.Apply(tmpdir+"/test2.csv")
+        self.assertTrue(action.KeepsFiles())
+        self.assertEqual(os.listdir(tmpdir), ["test2.csv"])
+        self.assertEqual(os.path.getsize(tmpdir+"/test2.csv"), 0)
+        with self.assertRaises(FileNotFoundError):
+            PostUploadAction("delete").Apply(tmpdir+"/test1.csv")
+
+    def test_retain(self):
+        tmpdir = tempfile.mkdtemp()
+        self.write(tmpdir+"/test1.csv", "test file 1!")
+        inode = os.stat(tmpdir+"/test1.csv").st_ino
+        action = PostUploadAction("retain", tmpdir+"/retention")
+        self.assertFalse(action.KeepsFiles())
+        action.Apply(tmpdir+"/test1.csv")
+        # the file is not copied, the retention folder holds the same inode
+        self.assertEqual(os.listdir(tmpdir+"/retention"), ["test1.csv"])
+        self.assertEqual(os.stat(tmpdir+"/retention/test1.csv").st_ino, inode)
+        self.assertFalse(os.path.exists(tmpdir+"/test1.csv"))
+
+        # a file with the same name doesn't replace the one already retained
+        self.write(tmpdir+"/test1.csv", "test file 1 again!")
+        action.Apply(tmpdir+"/test1.csv")
+        names = sorted(os.listdir(tmpdir+"/retention"))
+        self.assertEqual(len(names), 2)
+        self.assertTrue(names[0].endswith("-test1.csv"))
+        with open(tmpdir+"/retention/test1.csv") as f:
+            self.assertEqual(f.read(), "test file 1!")
+
+    def test_archive_other_file_system(self):
+        tmpdir = tempfile.mkdtemp()
+        self.write(tmpdir+"/test1.csv", "test file 1!")
+        action = PostUploadAction("archive", tmpdir+"/archive")
+        # the file is copied when it can't be linked
+        with unittest.mock.patch("os.link", side_effect=OSError(18, "Invalid cross-device link")):
+            action.Apply(tmpdir+"/test1.csv")
+        self.assertEqual(os.listdir(tmpdir+"/archive"), ["test1.csv"])
+        self.assertFalse(os.path.exists(tmpdir+"/test1.csv"))
+        # hard links can't be replaced by a copy
+        self.write(tmpdir+"/test2.csv", "test file 2!")
+        action = PostUploadAction("retain", tmpdir+"/retention")
+        with unittest.mock.patch("os.link", side_effect=OSError(18, "Invalid cross-device link")):
+            with self.assertRaises(OSError):
+                action.Apply(tmpdir+"/test2.csv")
+        self.assertTrue(os.path.exists(tmpdir+"/test2.csv"))
+
+    def test_retention_window(self):
+        tmpdir = tempfile.mkdtemp()
+        os.mkdir(tmpdir+"/retention")
+        # files left by a previous run are part of the window
+        self.write(tmpdir+"/retention/old.csv", "x" * 10, 1000)
+        window = RetentionWindow(tmpdir+"/retention", 25)
+        self.assertEqual(window.Size(), 10)
+        self.write(tmpdir+"/retention/test1.csv", "x" * 10, 3000)
+        self.assertEqual(window.Add(tmpdir+"/retention/test1.csv"), [])
+        self.write(tmpdir+"/retention/test2.csv", "x" * 10, 2000)
+        # the oldest file is removed first
+        self.assertEqual(window.Add(tmpdir+"/retention/test2.csv"), [tmpdir+"/retention/old.csv"])
+        self.assertEqual(sorted(os.listdir(tmpdir+"/retention")), ["test1.csv", "test2.csv"])
+        self.assertEqual(window.Size(), 20)
+
+        action = PostUploadAction("retain", tmpdir+"/retention", max_bytes=25)
+        self.write(tmpdir+"/test3.csv", "x" * 10, 4000)
+        action.Apply(tmpdir+"/test3.csv")
+        self.assertEqual(sorted(os.listdir(tmpdir+"/retention")), ["test1.csv", "test3.csv"])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            PostUploadAction("shred")
+        with self.assertRaises(ValueError):
+            PostUploadAction("archive")
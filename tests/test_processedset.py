@@ -0,0 +1,85 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import random
+import unittest
+import unittest.mock
+import zlib
+
+from src.ProcessedSet import ProcessedSet
+
+
+class TestProcessedSet(unittest.TestCase):
+
+    def test_set_operations(self):
+        processed = ProcessedSet()
+        processed.update(["/data/test1.csv", "/data/test2.csv"])
+        self.assertIn("/data/test1.csv", processed)
+        self.assertNotIn("/data/test3.csv", processed)
+        processed.Compact()
+        self.assertIn("/data/test2.csv", processed)
+
+        # removing and adding back a path that is in the array
+        processed.discard("/data/test1.csv")
+        processed.discard("/data/test1.csv")
+        self.assertNotIn("/data/test1.csv", processed)
+        self.assertEqual(len(processed), 1)
+        processed.add("/data/test1.csv")
+        processed.add("/data/test1.csv")
+        self.assertIn("/data/test1.csv", processed)
+        self.assertEqual(len(processed), 2)
+
+        processed.difference_update(["/data/test1.csv", "/data/test3.csv"])
+        self.assertEqual(len(processed), 1)
+
+    def test_matches_set(self):
+        # random adds and removes, with compactions along the way
+        rng = random.Random(42)
+        processed = ProcessedSet(compact_threshold=16)
+        expected = set()
+        for i in range(5000):
+            path = f"/data/test{rng.randrange(500)}.csv"
+            if rng.random() < 0.6:
+                processed.add(path)
+                expected.add(path)
+            else:
+                processed.discard(path)
+                expected.discard(path)
+        self.assertEqual(len(processed), len(expected))
+        for i in range(500):
+            path = f"/data/test{i}.csv"
+            self.assertEqual(path in processed, path in expected)
+
+    def test_collisions(self):
+        # every path gets the same hash, they are told apart by their check
+        key = lambda path: (42, zlib.crc32(path.encode()))
+        with unittest.mock.patch.object(ProcessedSet, "_ProcessedSet__key", staticmethod(key)):
+            processed = ProcessedSet()
+            processed.update(["/data/test1.csv", "/data/test2.csv"])
+            self.assertIn("/data/test2.csv", processed)
+            self.assertNotIn("/data/test3.csv", processed)
+            self.assertEqual(len(processed), 2)
+            processed.Compact()
+            processed.discard("/data/test1.csv")
+            self.assertNotIn("/data/test1.csv", processed)
+            self.assertIn("/data/test2.csv", processed)
+            processed.add("/data/test3.csv")
+            processed.discard("/data/test2.csv")
+            self.assertEqual(len(processed), 1)
+            self.assertIn("/data/test3.csv", processed)
+            self.assertNotIn("/data/test2.csv", processed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import fcntl
+import os
+import tempfile
+import unittest
+
+from src.ReadinessDetector import ReadinessDetector
+
+SECOND = 1000000000
+
+
+class TestReadinessDetector(unittest.TestCase):
+
+    def test_quiescent(self):
+        detector = ReadinessDetector("quiescent", quiescence_period=5)
+        self.assertFalse(detector.HoldsNewest())
+        # a file that hasn't been modified for the quiescence period is complete right away
+        self.assertTrue(detector.Ready("old", 10, 100*SECOND, now=200*SECOND))
+
+        # a file being written is complete once it has been stable for the quiescence period
+        self.assertFalse(detector.Ready("new", 10, 200*SECOND, now=201*SECOND))
+        self.assertFalse(detector.Ready("new", 20, 202*SECOND, now=203*SECOND))
+        self.assertFalse(detector.Ready("new", 20, 202*SECOND, now=206*SECOND))
+        self.assertTrue(detector.Ready("new", 20, 202*SECOND, now=207*SECOND))
+
+        # mtime in the future, the file must be stable for the quiescence period from the first observation
+        self.assertFalse(detector.Ready("skewed", 10, 300*SECOND, now=200*SECOND))
+        self.assertFalse(detector.Ready("skewed", 10, 300*SECOND, now=204*SECOND))
+        self.assertTrue(detector.Ready("skewed", 10, 300*SECOND, now=205*SECOND))
+
+    def test_newest(self):
+        detector = ReadinessDetector()
+        self.assertTrue(detector.HoldsNewest())
+        self.assertTrue(detector.Ready("new", 10, 200*SECOND, now=200*SECOND))
+        self.assertFalse(ReadinessDetector(check="rename").HoldsNewest())
+
+        with self.assertRaises(ValueError):
+            ReadinessDetector("oldest")
+        with self.assertRaises(ValueError):
+            ReadinessDetector(check="size")
+
+    def test_marker(self):
+        tmpdir = tempfile.mkdtemp()
+        file = tmpdir+"/test1.csv"
+        detector = ReadinessDetector(check="marker")
+        self.assertFalse(detector.Checked(file))
+        open(file+".done", "w").close()
+        self.assertTrue(detector.Checked(file))
+        self.assertTrue(detector.IsSidecar(file+".done"))
+        self.assertFalse(detector.IsSidecar(file))
+        self.assertEqual(detector.Sidecars(file), [file+".done"])
+        self.assertEqual(ReadinessDetector().Sidecars(file), [])
+
+    def test_lock(self):
+        tmpdir = tempfile.mkdtemp()
+        file = tmpdir+"/test1.csv"
+        detector = ReadinessDetector(check="lock")
+        with open(file, "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            self.assertFalse(detector.Checked(file))
+            fcntl.flock(f, fcntl.LOCK_UN)
+            self.assertTrue(detector.Checked(file))
+        self.assertFalse(detector.Checked(tmpdir+"/missing.csv"))
+
+
+if __name__ == '__main__':
+    unittest.main()
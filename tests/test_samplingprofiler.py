@@ -0,0 +1,48 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tempfile
+import time
+import unittest
+
+from src.SamplingProfiler import SamplingProfiler
+
+
+def busy_function(duration):
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        pass
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_profile(self):
+        path = tempfile.mkdtemp() + "/profile.txt"
+        profiler = SamplingProfiler(path, interval=0.005)
+        profiler.Start()
+        busy_function(0.3)
+        profiler.Close()
+        self.assertGreater(profiler.Samples(), 0)
+
+        with open(path) as f:
+            lines = f.readlines()
+        # one collapsed stack per line, followed by the number of samples
+        stacks = [line.rsplit(" ", 1) for line in lines]
+        busy = [(stack, int(count)) for stack, count in stacks if "busy_function (test_samplingprofiler.py:" in stack]
+        self.assertGreater(len(busy), 0)
+        self.assertTrue(all(stack.startswith("MainThread;") for stack, count in busy))
+
+
+if __name__ == '__main__':
+    unittest.main()
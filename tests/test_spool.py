@@ -0,0 +1,79 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+import tempfile
+import logging
+import os
+
+from src.Spool import Spool, Manifest
+
+
+class TestSpool(unittest.TestCase):
+
+    def test_publish_recover_release(self):
+        tmpdir = tempfile.mkdtemp()
+        spool = Spool(tmpdir+"/spool", logger)
+        f = open(spool.TemporaryPath("artifact1"), "w")
+        f.write("artifact 1")
+        f.close()
+        path = spool.Publish("artifact1", "bucket", "prefix/artifact1", ["/data/test1.csv", "/data/test2.csv"])
+        self.assertEqual(path, tmpdir+"/spool/artifact1")
+        self.assertTrue(spool.Owns(path))
+        self.assertEqual(spool.Manifest(path), Manifest("bucket", "prefix/artifact1", ["/data/test1.csv", "/data/test2.csv"]))
+
+        # an artifact that was not completely written when the component stopped
+        f = open(spool.TemporaryPath("artifact2"), "w")
+        f.write("artifact 2")
+        f.close()
+
+        spool = Spool(tmpdir+"/spool", logger)
+        self.assertFalse(spool.Owns(path))
+        self.assertEqual(spool.Recover(), [(path, Manifest("bucket", "prefix/artifact1", ["/data/test1.csv", "/data/test2.csv"]))])
+        self.assertEqual(sorted(os.listdir(tmpdir+"/spool")), ["artifact1", "artifact1.manifest"])
+
+        spool.Release(path)
+        self.assertFalse(spool.Owns(path))
+        self.assertEqual(os.listdir(tmpdir+"/spool"), [])
+
+    def test_parts(self):
+        tmpdir = tempfile.mkdtemp()
+        spool = Spool(tmpdir+"/spool", logger)
+        for name in ["test1.csv.part00000", "test1.csv.part00001"]:
+            open(spool.TemporaryPath(name), "w").close()
+        paths = spool.PublishParts("test1.csv", [("test1.csv.part00000", "test1.csv.part00000"),
+                                                 ("test1.csv.part00001", "test1.csv.part00001")],
+                                   "bucket", ["/data/test1.csv"])
+        self.assertEqual(spool.Manifest(paths[0]).group, "test1.csv")
+        self.assertTrue(spool.Shared(paths[0]))
+
+        # the parts of a file that was not completely split are removed
+        open(spool.TemporaryPath("test2.csv.part00000"), "w").close()
+        spool.Publish("test2.csv.part00000", "bucket", "test2.csv.part00000", ["/data/test2.csv"], "test2.csv")
+        spool = Spool(tmpdir+"/spool", logger)
+        self.assertEqual(sorted(path for path, manifest in spool.Recover()), paths)
+
+        # the last part no longer shares its members
+        spool.Release(paths[0])
+        self.assertFalse(spool.Shared(paths[1]))
+        self.assertIn("test1.csv.parts", os.listdir(tmpdir+"/spool"))
+        spool.Release(paths[1])
+        self.assertEqual(os.listdir(tmpdir+"/spool"), [])
+
+
+logging.basicConfig(level=logging.DEBUG)
+logger=logging.getLogger()
+
+if __name__ == '__main__':
+    unittest.main()
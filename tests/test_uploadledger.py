@@ -0,0 +1,66 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+import tempfile
+
+from src.UploadLedger import UploadLedger, LedgerEntry, QUEUED, IN_PROGRESS, SUCCEEDED
+
+
+class TestUploadLedger(unittest.TestCase):
+
+    def test_persistence(self):
+        tmpdir = tempfile.mkdtemp()
+        ledger = UploadLedger(tmpdir+"/ledger.db")
+        self.assertFalse(ledger.HasStream("stream"))
+        ledger.SetStatusSequenceNumber("stream", 0)
+        ledger.Queued("/data/test1.csv", "stream", 10)
+        ledger.Queued("/data/test2.csv", "stream", 11)
+        ledger.Queued("/data/test3.csv", "stream", 12)
+        ledger.InProgress("/data/test2.csv")
+        ledger.Succeeded("/data/test3.csv")
+        ledger.SetStatusSequenceNumber("stream", 42)
+        ledger.Close()
+
+        ledger = UploadLedger(tmpdir+"/ledger.db")
+        self.assertTrue(ledger.HasStream("stream"))
+        self.assertEqual(ledger.StatusSequenceNumber("stream"), 42)
+        self.assertEqual(sorted(ledger.Entries()), [
+            LedgerEntry("/data/test1.csv", QUEUED, "stream", 10),
+            LedgerEntry("/data/test2.csv", IN_PROGRESS, "stream", 11),
+            LedgerEntry("/data/test3.csv", SUCCEEDED, "stream", 12),
+        ])
+        ledger.Forget("/data/test1.csv")
+        self.assertEqual(len(ledger.Entries()), 2)
+        ledger.ForgetStream("stream")
+        self.assertEqual(ledger.Entries(), [])
+        self.assertFalse(ledger.HasStream("stream"))
+        ledger.Close()
+
+    def test_uncommitted(self):
+        # changes that are not committed are lost when the component crashes
+        tmpdir = tempfile.mkdtemp()
+        ledger = UploadLedger(tmpdir+"/ledger.db")
+        ledger.Queued("/data/test1.csv", "stream", 10)
+        ledger.Commit()
+        ledger.Queued("/data/test2.csv", "stream", 11)
+
+        other = UploadLedger(tmpdir+"/ledger.db")
+        self.assertEqual([entry.path for entry in other.Entries()], ["/data/test1.csv"])
+        other.Close()
+        ledger.Close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+
+from src.UploadMetrics import UploadMetrics
+
+
+class TestUploadMetrics(unittest.TestCase):
+
+    def test_snapshot(self):
+        metrics = UploadMetrics(window=100)
+        metrics.Count("uploads")
+        metrics.Count("uploads", 2)
+        metrics.Gauge("in_flight_tasks", 7)
+        for i in range(1, 201):
+            metrics.Observe("upload_latency_seconds", i)
+
+        snapshot = metrics.Snapshot()
+        self.assertEqual(snapshot["counters"], {"uploads": 3})
+        self.assertEqual(snapshot["gauges"], {"in_flight_tasks": 7})
+        latency = snapshot["summaries"]["upload_latency_seconds"]
+        # the count and sum cover all the samples, the percentiles the last 100
+        self.assertEqual(latency["count"], 200)
+        self.assertEqual(latency["sum"], 20100)
+        self.assertEqual(latency["p50"], 151)
+        self.assertEqual(latency["p99"], 200)
+
+    def test_rate(self):
+        metrics = UploadMetrics()
+        metrics.Count("uploaded_bytes", 1000)
+        metrics.Rate("uploaded_bytes_per_second", "uploaded_bytes", now=10)
+        self.assertNotIn("uploaded_bytes_per_second", metrics.Snapshot()["gauges"])
+        metrics.Count("uploaded_bytes", 5000)
+        metrics.Rate("uploaded_bytes_per_second", "uploaded_bytes", now=12)
+        self.assertEqual(metrics.Snapshot()["gauges"]["uploaded_bytes_per_second"], 2500)
+
+    def test_prometheus(self):
+        metrics = UploadMetrics()
+        metrics.Count("upload_failures")
+        metrics.Gauge("status_lag", 3)
+        metrics.Observe("append_latency_seconds", 0.5)
+        metrics.Observe("scan_duration_seconds", 0.1)
+        text = metrics.Prometheus()
+        self.assertIn("# TYPE file_uploader_upload_failures_total counter\nfile_uploader_upload_failures_total 1\n", text)
+        self.assertIn("file_uploader_status_lag 3\n", text)
+        self.assertIn('file_uploader_append_latency_seconds{quantile="0.5"} 0.5\n', text)
+        self.assertIn("file_uploader_scan_duration_seconds_count 1\n", text)
+
+
+if __name__ == '__main__':
+    unittest.main()
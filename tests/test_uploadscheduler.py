@@ -0,0 +1,106 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import unittest
+
+from src.UploadScheduler import UploadScheduler
+
+
+class TestUploadScheduler(unittest.TestCase):
+
+    def push_files(self, scheduler):
+        # file, size, mtime, priority
+        for file, size, mtime, priority in [("a", 300, 1, 0), ("b", 100, 2, 0), ("c", 200, 3, 1), ("d", 50, 4, 1)]:
+            scheduler.Push(file, None, size, mtime, priority)
+
+    def test_policies(self):
+        for policy, expected in [("oldest", ["a", "b", "c", "d"]), ("smallest", ["d", "b", "c", "a"]),
+                                 ("priority", ["c", "d", "a", "b"])]:
+            scheduler = UploadScheduler(10, policy)
+            self.push_files(scheduler)
+            self.assertEqual([file for file, source in scheduler.Take()], expected)
+
+        with self.assertRaises(ValueError):
+            UploadScheduler(10, "newest")
+
+    def test_in_flight(self):
+        scheduler = UploadScheduler(2)
+        self.push_files(scheduler)
+        self.assertEqual(scheduler.Take(), [("a", None), ("b", None)])
+        self.assertEqual(scheduler.Take(), [])
+        # files in flight or already scheduled are not scheduled twice
+        self.assertFalse(scheduler.Push("a", None, 300, 1))
+        self.assertFalse(scheduler.Push("c", None, 200, 3))
+
+        self.assertTrue(scheduler.Finished("a"))
+        self.assertFalse(scheduler.Finished("a"))
+        self.assertEqual(scheduler.Take(), [("c", None)])
+        self.assertEqual(scheduler.InFlight(), 2)
+
+        # tasks appended without being scheduled take room as well
+        scheduler.Finished("b")
+        scheduler.Started("bundle")
+        self.assertEqual(scheduler.Take(), [])
+        self.assertEqual(len(scheduler), 1)
+
+    def test_discard(self):
+        scheduler = UploadScheduler(10)
+        self.push_files(scheduler)
+        scheduler.Discard("b")
+        scheduler.Discard("unknown")
+        self.assertEqual([file for file, source in scheduler.Take()], ["a", "c", "d"])
+        self.assertEqual(len(scheduler), 0)
+
+    def test_push_again(self):
+        scheduler = UploadScheduler(10)
+        self.push_files(scheduler)
+        # a file discarded and scheduled again is only taken once
+        scheduler.Discard("a")
+        self.assertTrue(scheduler.Push("a", None, 300, 5))
+        self.assertEqual(sorted(file for file, source in scheduler.Take()), ["a", "b", "c", "d"])
+        self.assertEqual(scheduler.Take(), [])
+        # files with the same key are taken in the order they were scheduled
+        for file in ["part2", "part0", "part1"]:
+            scheduler.Push(file, None, 0, 7)
+        self.assertEqual([file for file, source in scheduler.Take()], ["part2", "part0", "part1"])
+
+    def test_discard_source(self):
+        scheduler = UploadScheduler(1)
+        for file, source in [("a", "logs"), ("b", "csv"), ("c", "logs"), ("d", "csv")]:
+            scheduler.Push(file, source, 0, 0)
+        self.assertEqual(scheduler.Take(), [("a", "logs")])
+        scheduler.DiscardSource("logs")
+        # the files in flight stay in flight
+        self.assertTrue(scheduler.Scheduled("a"))
+        self.assertFalse(scheduler.Scheduled("c"))
+        self.assertEqual(len(scheduler), 2)
+
+        # a file scheduled again under another source is taken and discarded with that source only
+        scheduler = UploadScheduler(10)
+        scheduler.Push("a", "logs", 0, 1)
+        scheduler.Push("b", "logs", 0, 2)
+        scheduler.Discard("a")
+        scheduler.Discard("b")
+        scheduler.Push("a", "csv", 0, 3)
+        scheduler.Push("b", "csv", 0, 4)
+        scheduler.DiscardSource("logs")
+        self.assertEqual(len(scheduler), 2)
+        self.assertEqual(scheduler.Take(), [("a", "csv"), ("b", "csv")])
+        scheduler.Finished("a")
+        scheduler.Push("a", "csv", 0, 5)
+        self.assertEqual(scheduler.Take(), [("a", "csv")])
+
+
+if __name__ == '__main__':
+    unittest.main()
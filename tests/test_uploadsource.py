@@ -0,0 +1,63 @@
+#  Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#  
+#  Licensed under the Apache License, Version 2.0 (the "License").
+#  You may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#  
+#      http://www.apache.org/licenses/LICENSE-2.0
+#  
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import unittest
+
+from src.UploadSource import UploadSource
+
+
+class TestUploadSource(unittest.TestCase):
+
+    def test_from_config(self):
+        source = UploadSource.FromConfig({"PathName": "/data/logs/*.log", "ObjectKeyPrefix": "/logs/", "Priority": "2"},
+                                         "default-bucket", "default")
+        self.assertEqual(source.bucket_name, "default-bucket")
+        self.assertEqual(source.bucket_path, "logs")
+        self.assertEqual(source.priority, 2)
+        self.assertEqual(source.directory, "/data/logs")
+        self.assertEqual(source.pattern, "*.log")
+
+        source = UploadSource.FromConfig({"PathName": "/data/*.csv", "BucketName": "other-bucket"}, "default-bucket", "default")
+        self.assertEqual(source.bucket_name, "other-bucket")
+        self.assertEqual(source.bucket_path, "default")
+        self.assertEqual(source.priority, 0)
+
+        with self.assertRaises(ValueError):
+            UploadSource.FromConfig({"BucketName": "other-bucket"}, "default-bucket", "default")
+
+    def test_matches(self):
+        source = UploadSource("/data/logs/*.log", "bucket", "logs")
+        self.assertTrue(source.Matches("/data/logs/app.log"))
+        self.assertFalse(source.Matches("/data/logs/app.csv"))
+        self.assertFalse(source.Matches("/data/logs/.hidden.log"))
+        self.assertFalse(source.Matches("/data/other/app.log"))
+        self.assertEqual(source.Key("/data/logs/app.log"), "logs/app.log")
+
+    def test_rescan(self):
+        # created before the event loop that runs the scans, as main does with the sources of the configuration
+        source = UploadSource("/data/logs/*.log", "bucket", "logs")
+
+        async def wait():
+            source.rescan.set()
+            await asyncio.wait_for(source.rescan.wait(), 1)
+            source.rescan.clear()
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(source.rescan.wait(), 0.01)
+
+        asyncio.run(wait())
+
+
+if __name__ == '__main__':
+    unittest.main()